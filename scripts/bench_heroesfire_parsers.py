@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de parsers y writers de extract_heroesfire_wikibase.py
+
+Corre sobre un corpus fijo de páginas guardado en fixtures/heroesfire/
+(lista de héroes, páginas abilities-talents, talentos de todos los tiers,
+con y sin "Modifies Ability", y un bot-wall). Para cada parser y para los
+writers de salida (Parquet/Arrow solo si pyarrow está instalado) reporta
+páginas/segundo y memoria pico (tracemalloc).
+
+Antes de medir verifica que los parsers sigan devolviendo los registros
+guardados en el corpus. Después compara contra la línea base y sale con
+código 1 si algún benchmark es más lento o usa más memoria que la línea
+base por más de --threshold.
+
+Uso:
+    python bench_heroesfire_parsers.py
+    python bench_heroesfire_parsers.py --parser selectolax
+    python bench_heroesfire_parsers.py --save-baseline
+    python bench_heroesfire_parsers.py --rebuild-fixtures --cache-dir .cache/heroesfire
+
+La línea base depende de la máquina: al cambiar de equipo hay que
+regenerarla con --save-baseline.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from extract_heroesfire_wikibase import (
+    ArrowIpcTalentsWriter,
+    BASE,
+    BOT_WALL_PHRASE,
+    HEROES_LIST_URL,
+    HTML_PARSERS,
+    HeroMeta,
+    HtmlCache,
+    JsonArrayWriter,
+    JsonlWriter,
+    ParsedPage,
+    ParquetTalentsWriter,
+    Talent,
+    TalentsCsvWriter,
+    build_hero_record,
+    check_html_parser,
+    looks_like_bot_wall,
+    new_page,
+    parse_hero_meta_from_abilities_talents,
+    parse_heroes_list,
+    parse_talent_page,
+    parse_talent_urls_from_abilities_talents,
+)
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "heroesfire"
+INDEX_FILE = "index.json"
+BASELINE_FILE = "bench_baseline.json"
+
+HERO_URL = f"{BASE}/hots/wiki/heroes/{{}}/abilities-talents"
+TALENT_URL = f"{BASE}/hots/wiki/talents/{{}}"
+
+# Páginas del corpus: (tipo, slug, url)
+FIXTURE_PAGES: List[Tuple[str, str, str]] = [
+    ("heroes_list", "heroes", HEROES_LIST_URL),
+    ("abilities_talents", "abathur", HERO_URL.format("abathur")),
+    ("abilities_talents", "alarak", HERO_URL.format("alarak")),
+    ("abilities_talents", "gazlowe", HERO_URL.format("gazlowe")),
+    # Un talento por tier, con y sin "Modifies Ability"
+    ("talent", "envenomed-nest", TALENT_URL.format("envenomed-nest")),
+    ("talent", "chaos-reigns", TALENT_URL.format("chaos-reigns")),
+    ("talent", "vile-nest", TALENT_URL.format("vile-nest")),
+    ("talent", "evolve-monstrosity-talent", TALENT_URL.format("evolve-monstrosity-talent")),
+    ("talent", "bombard-strain", TALENT_URL.format("bombard-strain")),
+    ("talent", "lethal-onslaught", TALENT_URL.format("lethal-onslaught")),
+    ("talent", "hivemind", TALENT_URL.format("hivemind")),
+    ("talent", "extended-lightning", TALENT_URL.format("extended-lightning")),
+    # Compartido entre héroes / sin tier
+    ("talent", "bolt-of-the-storm-talent", TALENT_URL.format("bolt-of-the-storm-talent")),
+    ("talent", "big-game-hunter", TALENT_URL.format("big-game-hunter")),
+]
+
+# Lo que devuelve el sitio cuando pide verificación (sin contenido real)
+BOT_WALL_HTML = f"""<!DOCTYPE html>
+<html>
+<head><title>HeroesFire</title></head>
+<body>
+<div class="vote-box">
+<p>{BOT_WALL_PHRASE}</p>
+<form method="post" action="/verify"><button type="submit">Verify</button></form>
+</div>
+</body>
+</html>
+"""
+
+# Héroes sintéticos que se escriben en cada corrida de los writers
+WRITER_HEROES = 100
+
+
+# ----------------------------
+# Corpus
+# ----------------------------
+
+
+def page_record(kind: str, slug: str, url: str, page: ParsedPage):
+    """Registro que se congela en el corpus para cada tipo de página"""
+    if kind == "heroes_list":
+        return parse_heroes_list(page)
+    if kind == "abilities_talents":
+        return {
+            "meta": parse_hero_meta_from_abilities_talents(page, url, slug).to_dict(),
+            "talent_urls": parse_talent_urls_from_abilities_talents(page, url),
+        }
+    if kind == "talent":
+        return parse_talent_page(page, url).to_dict()
+    return {"bot_wall": looks_like_bot_wall(page.html), "real_content": page.has_real_content()}
+
+
+def rebuild_fixtures(cache_dir: Path) -> None:
+    """Copia las páginas de FIXTURE_PAGES desde el cache HTML y congela sus registros"""
+    cache = HtmlCache(cache_dir, read_only=True)
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    index = []
+    pages = [(kind, slug, url, cache.get(url)) for kind, slug, url in FIXTURE_PAGES]
+    pages.append(("bot_wall", "bot-wall", TALENT_URL.format("bot-wall"), BOT_WALL_HTML))
+    cache.close()
+
+    for kind, slug, url, html in pages:
+        if html is None:
+            print(f"[!] {url} no está en {cache_dir}")
+            sys.exit(2)
+        name = f"{kind}-{slug}.html"
+        (FIXTURES_DIR / name).write_text(html, encoding="utf-8")
+        index.append(
+            {
+                "file": name,
+                "kind": kind,
+                "slug": slug,
+                "url": url,
+                # Ida y vuelta por JSON: las tuplas quedan como listas
+                "expected": json.loads(
+                    json.dumps(
+                        page_record(kind, slug, url, new_page(html, url, "html.parser")),
+                        ensure_ascii=False,
+                    )
+                ),
+            }
+        )
+        print(f"  [fixture] {name}")
+
+    (FIXTURES_DIR / INDEX_FILE).write_text(
+        json.dumps(index, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+    )
+    print(f"[✓] {len(index)} páginas en {FIXTURES_DIR}")
+
+
+def load_fixtures() -> List[Dict]:
+    index_path = FIXTURES_DIR / INDEX_FILE
+    if not index_path.exists():
+        print(f"[!] No hay corpus en {FIXTURES_DIR} (ver --rebuild-fixtures)")
+        sys.exit(2)
+    fixtures = json.loads(index_path.read_text(encoding="utf-8"))
+    for fx in fixtures:
+        fx["html"] = (FIXTURES_DIR / fx["file"]).read_text(encoding="utf-8")
+    return fixtures
+
+
+def check_fixtures(fixtures: List[Dict], parser: str) -> int:
+    """Cantidad de páginas cuyo registro ya no coincide con el del corpus"""
+    diffs = 0
+    for fx in fixtures:
+        page = new_page(fx["html"], fx["url"], parser)
+        got = page_record(fx["kind"], fx["slug"], fx["url"], page)
+        if json.loads(json.dumps(got, ensure_ascii=False)) != fx["expected"]:
+            print(f"  [diff] {fx['file']}")
+            diffs += 1
+    return diffs
+
+
+# ----------------------------
+# Benchmarks
+# ----------------------------
+
+
+def parser_bench(fn: Callable, kinds: Tuple[str, ...]) -> Callable:
+    def build(fixtures: List[Dict], parser: str) -> Tuple[int, Callable[[], None]]:
+        items = [fx for fx in fixtures if fx["kind"] in kinds]
+
+        def run() -> None:
+            # Página nueva cada vez: el tiempo incluye construir el árbol
+            for fx in items:
+                fn(new_page(fx["html"], fx["url"], parser), fx)
+
+        return len(items), run
+
+    return build
+
+
+def writer_bench(writer_cls) -> Callable:
+    def build(fixtures: List[Dict], parser: str) -> Tuple[int, Callable[[], None]]:
+        talents = [
+            Talent.from_dict(fx["expected"]) for fx in fixtures if fx["kind"] == "talent"
+        ]
+        heroes = []
+        for fx in fixtures:
+            if fx["kind"] != "abilities_talents":
+                continue
+            # Los talentos del corpus se reparten entre los héroes del corpus
+            meta = HeroMeta.from_dict(fx["expected"]["meta"])
+            heroes.append(build_hero_record(fx["slug"], fx["url"], meta, talents))
+        heroes = (heroes * (WRITER_HEROES // len(heroes) + 1))[:WRITER_HEROES]
+        out = Path(tempfile.gettempdir()) / f"hf-bench-{os.getpid()}-{writer_cls.__name__}"
+
+        def run() -> None:
+            writer = writer_cls(out)
+            for hero in heroes:
+                writer.write_hero(hero)
+            writer.close()
+            out.unlink()
+
+        return len(heroes), run
+
+    return build
+
+
+BENCHMARKS: Tuple[Tuple[str, Callable], ...] = (
+    ("parse_heroes_list", parser_bench(lambda p, fx: parse_heroes_list(p), ("heroes_list",))),
+    (
+        "parse_hero_meta_from_abilities_talents",
+        parser_bench(
+            lambda p, fx: parse_hero_meta_from_abilities_talents(p, fx["url"], fx["slug"]),
+            ("abilities_talents",),
+        ),
+    ),
+    (
+        "parse_talent_urls_from_abilities_talents",
+        parser_bench(
+            lambda p, fx: parse_talent_urls_from_abilities_talents(p, fx["url"]),
+            ("abilities_talents",),
+        ),
+    ),
+    (
+        "parse_talent_page",
+        parser_bench(lambda p, fx: parse_talent_page(p, fx["url"]), ("talent",)),
+    ),
+    (
+        "bot_wall_check",
+        parser_bench(
+            lambda p, fx: looks_like_bot_wall(p.html) and p.has_real_content(),
+            ("talent", "bot_wall"),
+        ),
+    ),
+    ("JsonArrayWriter", writer_bench(JsonArrayWriter)),
+    ("JsonlWriter", writer_bench(JsonlWriter)),
+    ("TalentsCsvWriter", writer_bench(TalentsCsvWriter)),
+)
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pass
+else:
+    BENCHMARKS += (
+        ("ParquetTalentsWriter", writer_bench(ParquetTalentsWriter)),
+        ("ArrowIpcTalentsWriter", writer_bench(ArrowIpcTalentsWriter)),
+    )
+
+
+def measure(run: Callable[[], None], items: int, min_time: float) -> Tuple[float, float]:
+    """
+    Devuelve (items/segundo, memoria pico en KB). La velocidad sale de la
+    mejor vuelta: es la medida menos sensible a ruido de otros procesos.
+    """
+    run()  # calentamiento
+    best = float("inf")
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        t0 = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - t0)
+
+    # Memoria aparte: tracemalloc distorsiona los tiempos. Sin basura
+    # pendiente, el pico no depende de cuándo corra el GC.
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return items / best, peak / 1024
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Benchmark de parsers y writers sobre el corpus fijo de páginas."
+    )
+    ap.add_argument(
+        "--parser", default="html.parser", choices=HTML_PARSERS, help="Backend HTML"
+    )
+    ap.add_argument(
+        "--min-time",
+        type=float,
+        default=2.0,
+        help="Segundos mínimos de medición por benchmark",
+    )
+    ap.add_argument(
+        "--threshold",
+        type=float,
+        default=0.40,
+        help=(
+            "Regresión tolerada respecto de la línea base (0.40 = 40%%). Alcanza "
+            "para detectar un parser el doble de lento sin saltar por ruido"
+        ),
+    )
+    ap.add_argument(
+        "--baseline",
+        default=str(FIXTURES_DIR / BASELINE_FILE),
+        help="Archivo JSON con la línea base",
+    )
+    ap.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Guarda los resultados como nueva línea base para este backend",
+    )
+    ap.add_argument(
+        "--only", default="", help="Benchmarks a correr, separados por coma"
+    )
+    ap.add_argument(
+        "--rebuild-fixtures",
+        action="store_true",
+        help="Regenera el corpus desde el cache HTML (--cache-dir) y sale",
+    )
+    ap.add_argument(
+        "--cache-dir", default=".cache/heroesfire", help="Cache HTML para --rebuild-fixtures"
+    )
+    args = ap.parse_args()
+
+    if args.rebuild_fixtures:
+        rebuild_fixtures(Path(args.cache_dir))
+        return
+
+    check_html_parser(args.parser)
+    fixtures = load_fixtures()
+    print(f"[*] Corpus: {len(fixtures)} páginas en {FIXTURES_DIR}")
+
+    diffs = check_fixtures(fixtures, args.parser)
+    if diffs:
+        print(f"[!] {diffs} páginas ya no producen el registro del corpus")
+        sys.exit(1)
+
+    baseline_path = Path(args.baseline)
+    baselines = (
+        json.loads(baseline_path.read_text(encoding="utf-8"))
+        if baseline_path.exists()
+        else {}
+    )
+    base = baselines.get(args.parser, {})
+
+    wanted = {b.strip() for b in args.only.split(",") if b.strip()}
+    results: Dict[str, Dict[str, float]] = {}
+    regressions: List[str] = []
+
+    print(f"\n{'benchmark':<42}{'items':>6}{'items/s':>11}{'pico KB':>10}{'vs base':>9}")
+    for name, build in BENCHMARKS:
+        if wanted and name not in wanted:
+            continue
+        items, run = build(fixtures, args.parser)
+        rate, peak_kb = measure(run, items, args.min_time)
+        results[name] = {"per_sec": round(rate, 1), "peak_kb": round(peak_kb, 1)}
+
+        delta = ""
+        ref = base.get(name)
+        if ref:
+            ratio = rate / ref["per_sec"]
+            delta = f"{(ratio - 1) * 100:+.0f}%"
+            if ratio < 1 - args.threshold:
+                regressions.append(f"{name}: {rate:.1f} items/s vs {ref['per_sec']} base")
+            if peak_kb > ref["peak_kb"] * (1 + args.threshold) and peak_kb - ref["peak_kb"] > 64:
+                regressions.append(f"{name}: {peak_kb:.0f} KB pico vs {ref['peak_kb']:.0f} base")
+        print(f"{name:<42}{items:>6}{rate:>11.1f}{peak_kb:>10.0f}{delta:>9}")
+
+    if args.save_baseline:
+        baselines[args.parser] = {**base, **results}
+        baseline_path.write_text(
+            json.dumps(baselines, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+        )
+        print(f"\n[✓] Línea base de {args.parser} guardada en {baseline_path}")
+        return
+
+    if not base:
+        print(f"\n[!] Sin línea base para {args.parser} (ver --save-baseline)")
+        return
+    if regressions:
+        print(f"\n[!] Regresiones de más de {args.threshold:.0%}:")
+        for r in regressions:
+            print(f"  - {r}")
+        sys.exit(1)
+    print(f"\n[✓] Sin regresiones respecto de la línea base ({args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Prueba de punta a punta del crawler contra el servidor local, con fallas
+
+Arma un cache HTML temporal con el corpus de fixtures/heroesfire/ (o sirve
+un cache existente con --cache-dir), levanta heroesfire_standin_server.py
+con ráfagas de 503 y 429 con Retry-After, y corre el main() completo de
+extract_heroesfire_wikibase.py dos veces: en serie y con --concurrency N.
+
+Verifica que:
+- las dos corridas escriban heroes.json y talents.csv idénticos byte a byte
+- las dos hayan tenido que reintentar (las fallas llegaron al Fetcher)
+- fallen las mismas URLs en las dos (las que no están en el corpus: 404,
+  que no se reintentan)
+
+Uso:
+    python check_heroesfire_e2e.py
+    python check_heroesfire_e2e.py --concurrency 8 -- --transport http2
+    python check_heroesfire_e2e.py --cache-dir .cache/heroesfire --heroes abathur,alarak
+
+Los argumentos después de "--" pasan tal cual a las dos corridas.
+Sale con código 1 si alguna verificación falla.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from typing import Dict, List
+
+import extract_heroesfire_wikibase as hf
+from heroesfire_standin_server import add_fault_args, faults_from_args, start_server
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "heroesfire"
+OUTPUTS = ("heroes.json", "talents.csv")
+
+
+def build_fixture_cache(root: Path) -> List[str]:
+    """Carga el corpus en un HtmlCache y devuelve los slugs de héroes que tiene"""
+    fixtures = json.loads((FIXTURES_DIR / "index.json").read_text(encoding="utf-8"))
+    cache = hf.HtmlCache(root)
+    heroes = []
+    for fx in fixtures:
+        html = (FIXTURES_DIR / fx["file"]).read_text(encoding="utf-8")
+        cache.put(fx["url"], html)
+        if fx["kind"] == "abilities_talents":
+            heroes.append(fx["slug"])
+    cache.close()
+    return heroes
+
+
+def run_crawler(
+    base_url: str, out: Path, heroes: str, concurrency: int, extra: List[str]
+) -> hf.Metrics:
+    argv = [
+        "--base-url",
+        base_url,
+        "--out",
+        str(out),
+        "--no-cache",
+        "--min-sleep",
+        "0",
+        "--max-sleep",
+        "0",
+        "--skip-failed",
+        "--concurrency",
+        str(concurrency),
+        *(["--heroes", heroes] if heroes else []),
+        *extra,
+    ]
+    with redirect_stdout(StringIO()):
+        return hf.main(argv)
+
+
+def main():
+    argv = sys.argv[1:]
+    extra: List[str] = []
+    if "--" in argv:
+        i = argv.index("--")
+        argv, extra = argv[:i], argv[i + 1 :]
+
+    ap = argparse.ArgumentParser(
+        description="Crawl serie vs. concurrente contra el servidor local con fallas."
+    )
+    ap.add_argument(
+        "--concurrency", type=int, default=4, help="Concurrencia de la segunda corrida"
+    )
+    ap.add_argument(
+        "--heroes",
+        default="",
+        help="Slugs a crawlear (default: los héroes del corpus de fixtures)",
+    )
+    add_fault_args(ap)
+    # Fallas deterministas: una 503 cada 10 requests y algunos 429 (semilla fija)
+    ap.set_defaults(cache_dir="", burst_5xx_every=10, burst_len=1, rate_429=0.02, seed=7)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="hf-e2e-") as tmp:
+        tmp_path = Path(tmp)
+        heroes = args.heroes
+        if args.cache_dir:
+            cache_dir = Path(args.cache_dir)
+        else:
+            cache_dir = tmp_path / "cache"
+            corpus_heroes = build_fixture_cache(cache_dir)
+            heroes = heroes or ",".join(corpus_heroes)
+            print(f"[*] Corpus de fixtures: {len(corpus_heroes)} héroes ({heroes})")
+
+        server = start_server(cache_dir, faults_from_args(args))
+        print(f"[*] Servidor: {server.base_url} ({server.faults})")
+        runs: Dict[str, hf.Metrics] = {}
+        try:
+            for name, concurrency in (("serie", 1), ("concurrente", args.concurrency)):
+                print(f"[*] Corrida {name} (--concurrency {concurrency})...")
+                runs[name] = run_crawler(
+                    server.base_url, tmp_path / name, heroes, concurrency, extra
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+        print(f"[*] Servidor: {dict(server.stats)}")
+
+        errors: List[str] = []
+        serial, concurrent = (tmp_path / name for name in runs)
+        heroes_out = json.loads((serial / "heroes.json").read_text(encoding="utf-8"))
+        if not heroes_out:
+            errors.append("la corrida en serie no escribió ningún héroe")
+        for name in OUTPUTS:
+            if (serial / name).read_bytes() != (concurrent / name).read_bytes():
+                errors.append(f"{name} difiere entre la corrida en serie y la concurrente")
+
+        for name, metrics in runs.items():
+            retries = int(metrics.get("retries"))
+            causes = ", ".join(
+                f"{int(metrics.get('retries', cause=c))} {c}" for c in ("429", "5xx")
+            )
+            print(
+                f"  {name:<12} {int(metrics.get('requests')):5d} requests, "
+                f"{retries} reintentos ({causes}), {int(metrics.get('failures'))} fallidos"
+            )
+            if not retries:
+                errors.append(f"la corrida {name} no reintentó nada: las fallas no llegaron")
+        failures = [int(metrics.get("failures")) for metrics in runs.values()]
+        if failures[0] != failures[1]:
+            errors.append(f"fallaron {failures[0]} URLs en serie y {failures[1]} concurrente")
+
+    if errors:
+        for e in errors:
+            print(f"[!] {e}")
+        sys.exit(1)
+    talents = sum(len(h["talents"]) for h in heroes_out)
+    print(
+        f"[✓] {len(heroes_out)} héroes y {talents} talentos idénticos en serie y con "
+        f"--concurrency {args.concurrency}, con reintentos en las dos corridas"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Harness diferencial de backends HTML para extract_heroesfire_wikibase.py
+
+Pasa cada página del cache HTML por todos los parsers (lista de héroes,
+meta + links de abilities-talents, página de talento) con cada backend
+(--parser) y verifica que los registros sean idénticos a los de html.parser.
+También reporta el tiempo por página de cada backend.
+
+Además verifica que LinkExtractor (los links sin construir árbol) devuelva
+los mismos href que el soup de html.parser, con la página entera y por
+pedazos de bytes que cortan tags y caracteres UTF-8 a la mitad.
+
+Uso:
+    python check_heroesfire_parsers.py --cache-dir .cache/heroesfire
+    python check_heroesfire_parsers.py --parsers lxml,selectolax --limit 200
+
+Sale con código 1 si algún backend produce un registro distinto.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from extract_heroesfire_wikibase import (
+    BASE,
+    HTML_PARSERS,
+    HtmlCache,
+    LinkExtractor,
+    new_page,
+    parse_hero_page,
+    parse_heroes_list,
+    parse_talent_page,
+)
+
+REFERENCE = "html.parser"
+
+# Las páginas del cache no guardan su URL: se usan URLs fijas de ejemplo
+HERO_PAGE_URL = f"{BASE}/hots/wiki/heroes/sample/abilities-talents"
+TALENT_PAGE_URL = f"{BASE}/hots/wiki/talents/sample"
+
+CHECKS: Tuple[Tuple[str, Callable], ...] = (
+    ("heroes_list", lambda page: parse_heroes_list(page)),
+    ("hero_page", lambda page: parse_hero_page(page, HERO_PAGE_URL, "sample")),
+    ("talent_page", lambda page: parse_talent_page(page, TALENT_PAGE_URL)),
+)
+
+
+def available_parsers(wanted: List[str]) -> List[str]:
+    out = []
+    for name in wanted:
+        module = {"lxml": "lxml", "selectolax": "selectolax.lexbor"}.get(name)
+        if module:
+            try:
+                __import__(module)
+            except ImportError:
+                print(f"[!] {name} no está instalado, se omite")
+                continue
+        out.append(name)
+    return out
+
+
+# Pedazos chicos y de tamaño impar: cortan tags, atributos y caracteres UTF-8
+STREAM_CHUNK = 997
+
+
+def check_link_extractor(pages: List[Tuple[str, str]]) -> int:
+    """Páginas cuyos href sin árbol no coinciden con los del soup"""
+    diffs = 0
+    for key, html in pages:
+        page = new_page(html, parser=REFERENCE)
+        expected = [a["href"].strip() for a in page.soup.find_all("a", href=True)]
+
+        whole = LinkExtractor()
+        whole.feed(html)
+        whole.close()
+
+        data = html.encode("utf-8")
+        streamed = LinkExtractor()
+        found: List[str] = []
+        for i in range(0, len(data), STREAM_CHUNK):
+            streamed.feed(data[i : i + STREAM_CHUNK])
+            found.extend(streamed.new_hrefs())
+        streamed.close()
+        found.extend(streamed.new_hrefs())
+
+        for name, got in (("entera", whole.hrefs), ("por pedazos", found)):
+            if got != expected:
+                diffs += 1
+                print(f"  [diff] LinkExtractor ({name}) {key}")
+    return diffs
+
+
+def run_backend(parser: str, pages: List[Tuple[str, str]]) -> Tuple[Dict, Dict[str, float]]:
+    """Devuelve ({(key, check): registro}, {check: segundos totales})"""
+    records: Dict[Tuple[str, str], object] = {}
+    timings: Dict[str, float] = {name: 0.0 for name, _ in CHECKS}
+    for key, html in pages:
+        for name, fn in CHECKS:
+            # Página nueva por check: el tiempo incluye construir el árbol
+            t0 = time.perf_counter()
+            records[(key, name)] = fn(new_page(html, parser=parser))
+            timings[name] += time.perf_counter() - t0
+    return records, timings
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Verifica que todos los backends HTML produzcan los mismos registros."
+    )
+    ap.add_argument(
+        "--cache-dir", default=".cache/heroesfire", help="Directorio cache HTML"
+    )
+    ap.add_argument(
+        "--parsers",
+        default=",".join(HTML_PARSERS),
+        help="Backends a comparar, separados por coma",
+    )
+    ap.add_argument(
+        "--limit", type=int, default=0, help="Limita cantidad de páginas (0 = todas)"
+    )
+    args = ap.parse_args()
+
+    cache = HtmlCache(Path(args.cache_dir), read_only=True)
+    pages: List[Tuple[str, str]] = []
+    for key, _, html in cache.iter_pages():
+        pages.append((key, html))
+        if args.limit > 0 and len(pages) >= args.limit:
+            break
+    cache.close()
+    if not pages:
+        print(f"[!] No hay páginas en {args.cache_dir}")
+        sys.exit(2)
+    print(f"[*] {len(pages)} páginas en {args.cache_dir}")
+
+    wanted = [p.strip() for p in args.parsers.split(",") if p.strip()]
+    if REFERENCE not in wanted:
+        wanted.insert(0, REFERENCE)
+    parsers = available_parsers(wanted)
+
+    results: Dict[str, Tuple[Dict, Dict[str, float]]] = {}
+    for parser in parsers:
+        print(f"[*] Parseando con {parser}...")
+        results[parser] = run_backend(parser, pages)
+
+    print("[*] Verificando LinkExtractor...")
+    mismatches = check_link_extractor(pages)
+
+    reference, _ = results[REFERENCE]
+    for parser in parsers:
+        if parser == REFERENCE:
+            continue
+        records, _ = results[parser]
+        diffs = [key for key, rec in records.items() if rec != reference[key]]
+        mismatches += len(diffs)
+        for key, check in diffs[:10]:
+            print(f"  [diff] {parser} {check} {key}")
+        if len(diffs) > 10:
+            print(f"  ... y {len(diffs) - 10} más")
+
+    print()
+    header = f"{'backend':<12}" + "".join(f"{name:>14}" for name, _ in CHECKS) + f"{'speedup':>10}"
+    print(header + "   (ms/página)")
+    base_total = sum(results[REFERENCE][1].values())
+    for parser in parsers:
+        _, timings = results[parser]
+        row = f"{parser:<12}" + "".join(
+            f"{timings[name] / len(pages) * 1000:>14.2f}" for name, _ in CHECKS
+        )
+        total = sum(timings.values())
+        row += f"{base_total / total if total else 0:>9.1f}x"
+        print(row)
+
+    if mismatches:
+        print(f"\n[!] {mismatches} registros distintos a {REFERENCE}")
+        sys.exit(1)
+    print(f"\n[✓] Todos los backends producen registros idénticos a {REFERENCE}")
+
+
+if __name__ == "__main__":
+    main()
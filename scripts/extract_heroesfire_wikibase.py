@@ -13,19 +13,55 @@ Mejoras:
 """
 
 import argparse
+import codecs
 import csv
+import gzip
 import hashlib
+import io
 import json
+import mmap
+import os
 import random
 import re
+import shutil
+import sqlite3
+import struct
+import sys
+import threading
 import time
-from dataclasses import dataclass
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, replace
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from functools import cached_property
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
-from urllib.parse import urljoin
-
-import requests
-from bs4 import BeautifulSoup
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+from urllib.parse import urljoin, urlparse
+
+# requests, bs4 y asyncio (que trae ssl y socket) se importan donde se usan:
+# los subcomandos que no van a la red ni parsean HTML (export, cache)
+# arrancan sin cargarlos
+if TYPE_CHECKING:
+    import requests
+    from bs4 import BeautifulSoup, Tag
 
 
 BASE = "https://www.heroesfire.com"
@@ -54,18 +90,23 @@ USER_AGENTS = [
 # ----------------------------
 
 
+WS_RE = re.compile(r"\s+")
+IMAGE_PREFIX_RE = re.compile(r"^(Image)+")
+IMAGE_LABEL_RE = re.compile(r"^Image:\s*")
+
+
 def norm_lines(text: str) -> List[str]:
     lines: List[str] = []
     for ln in text.splitlines():
-        ln = re.sub(r"\s+", " ", ln).strip()
+        ln = WS_RE.sub(" ", ln).strip()
         if ln:
             lines.append(ln)
     return lines
 
 
 def clean_wikibase_line(ln: str) -> str:
-    ln = re.sub(r"^(Image)+", "", ln).strip()
-    ln = re.sub(r"^Image:\s*", "", ln).strip()
+    ln = IMAGE_PREFIX_RE.sub("", ln).strip()
+    ln = IMAGE_LABEL_RE.sub("", ln).strip()
     return ln
 
 
@@ -73,15 +114,38 @@ def sha1(s: str) -> str:
     return hashlib.sha1(s.encode("utf-8")).hexdigest()
 
 
-def sleep_human(min_s: float, max_s: float, variance: float = 0.3) -> None:
-    """Sleep más humanizado con variación gaussiana"""
+def sleep_human(min_s: float, max_s: float, variance: float = 0.3) -> float:
+    """Sleep más humanizado con variación gaussiana; devuelve los segundos dormidos"""
     if max_s <= 0:
-        return
+        return 0.0
     base = random.uniform(min_s, max_s)
     # Añade variación gaussiana para hacer delays menos predecibles
     jitter = random.gauss(0, variance)
     delay = max(min_s * 0.5, base + jitter)
     time.sleep(delay)
+    return delay
+
+
+# Detalle de la consola (--verbosity): 0 = solo avisos, errores y resúmenes;
+# 1 = una línea por héroe y los reintentos; 2 = una línea por URL
+_verbosity = 2
+
+
+def set_verbosity(level: int) -> None:
+    global _verbosity
+    _verbosity = level
+
+
+def log(msg: str, level: int = 2) -> None:
+    if level <= _verbosity:
+        print(msg)
+
+
+def set_base_url(url: str) -> None:
+    """Apunta el crawler a otro host (p.ej. heroesfire_standin_server.py)"""
+    global BASE, HEROES_LIST_URL
+    BASE = url.rstrip("/")
+    HEROES_LIST_URL = f"{BASE}/hots/wiki/heroes"
 
 
 # ----------------------------
@@ -89,20 +153,29 @@ def sleep_human(min_s: float, max_s: float, variance: float = 0.3) -> None:
 # ----------------------------
 
 
-def pick_meta_image(soup: BeautifulSoup, base_url: str) -> Optional[str]:
-    for attrs in (
-        {"property": "og:image"},
-        {"name": "twitter:image"},
-        {"property": "og:image:url"},
-        {"name": "twitter:image:src"},
-    ):
-        tag = soup.find("meta", attrs=attrs)
+META_IMAGE_ATTRS = (
+    ("property", "og:image"),
+    ("name", "twitter:image"),
+    ("property", "og:image:url"),
+    ("name", "twitter:image:src"),
+)
+
+
+def pick_meta_image(soup: "BeautifulSoup", base_url: str) -> Optional[str]:
+    # Una sola pasada por los <meta>: el primero de cada tipo, en orden de prioridad
+    first: Dict[Tuple[str, str], "Tag"] = {}
+    for tag in soup.find_all("meta"):
+        for key in META_IMAGE_ATTRS:
+            if key not in first and tag.get(key[0]) == key[1]:
+                first[key] = tag
+    for key in META_IMAGE_ATTRS:
+        tag = first.get(key)
         if tag and tag.get("content"):
             return urljoin(base_url, tag["content"].strip())
     return None
 
 
-def pick_first_reasonable_img(soup: BeautifulSoup, base_url: str) -> Optional[str]:
+def pick_first_reasonable_img(soup: "BeautifulSoup", base_url: str) -> Optional[str]:
     for img in soup.find_all("img"):
         src = (img.get("src") or "").strip()
         if not src:
@@ -117,537 +190,5540 @@ def looks_like_bot_wall(html: str) -> bool:
     return BOT_WALL_PHRASE.lower() in html.lower()
 
 
-# ----------------------------
-# Fetcher mejorado
-# ----------------------------
-
-
-@dataclass
-class Fetcher:
-    min_sleep: float
-    max_sleep: float
-    timeout: float
-    cache_dir: Optional[Path]
-    no_cache: bool
-    max_retries: int = 5
-
-    def __post_init__(self):
-        self.sess = requests.Session()
-        self._update_headers()
-        self.request_count = 0
+class LinkExtractor(HTMLParser):
+    """
+    href de los <a> en una sola pasada del tokenizer de html.parser, sin
+    construir árbol. Es el mismo tokenizer que usa BeautifulSoup con
+    html.parser, así los valores (entidades, atributos repetidos) salen
+    iguales a los de ParsedPage.hrefs().
+
+    Acepta la página por pedazos, str o bytes UTF-8 (un carácter cortado
+    entre dos pedazos se completa con el siguiente): new_hrefs() devuelve los
+    links encontrados desde la llamada anterior, así se pueden seguir antes
+    de que termine la descarga.
+    """
 
-    def _update_headers(self):
-        """Actualiza headers con UA aleatorio y headers más completos"""
-        self.sess.headers.update(
-            {
-                "User-Agent": random.choice(USER_AGENTS),
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.9,es;q=0.8",
-                "Accept-Encoding": "gzip, deflate, br",
-                "DNT": "1",
-                "Connection": "keep-alive",
-                "Upgrade-Insecure-Requests": "1",
-                "Sec-Fetch-Dest": "document",
-                "Sec-Fetch-Mode": "navigate",
-                "Sec-Fetch-Site": "none",
-                "Sec-Fetch-User": "?1",
-                "Cache-Control": "max-age=0",
-            }
-        )
+    def __init__(self, prefix: str = ""):
+        super().__init__(convert_charrefs=True)
+        self.prefix = prefix
+        self.hrefs: List[str] = []
+        self._taken = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
 
-    def _get_cache_path(self, url: str) -> Optional[Path]:
-        if not self.cache_dir or self.no_cache:
-            return None
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
-        return self.cache_dir / f"{sha1(url)}.html"
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag != "a":
+            return
+        href = None
+        # Como en bs4, el último atributo repetido gana; <a href> vale ""
+        for name, value in attrs:
+            if name == "href":
+                href = value or ""
+        if href is not None:
+            href = href.strip()
+            if href.startswith(self.prefix):
+                self.hrefs.append(href)
 
-    def get(self, url: str) -> str:
-        cache_path = self._get_cache_path(url)
+    def feed(self, data: Union[str, bytes]) -> None:
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        super().feed(data)
 
-        # Intenta cache primero
-        if cache_path and cache_path.exists():
-            print(f"  [cache] {url}")
-            return cache_path.read_text(encoding="utf-8", errors="ignore")
+    def close(self) -> None:
+        tail = self._decoder.decode(b"", final=True)
+        if tail:
+            super().feed(tail)
+        super().close()
 
-        # Rotar UA cada 10 requests
-        self.request_count += 1
-        if self.request_count % 10 == 0:
-            self._update_headers()
+    def new_hrefs(self) -> List[str]:
+        found = self.hrefs[self._taken :]
+        self._taken = len(self.hrefs)
+        return found
 
-        last_err = None
-        for attempt in range(1, self.max_retries + 1):
-            try:
-                # Delay antes del request (excepto primer intento)
-                if attempt > 1:
-                    backoff = min(15.0, 1.5 * (2 ** (attempt - 2)))
-                    print(
-                        f"  [retry {attempt}/{self.max_retries}] esperando {backoff:.1f}s..."
-                    )
-                    time.sleep(backoff)
 
-                # Request
-                resp = self.sess.get(url, timeout=self.timeout, allow_redirects=True)
+def extract_hrefs(html: Union[str, bytes], prefix: str = "") -> List[str]:
+    extractor = LinkExtractor(prefix)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.hrefs
 
-                # Manejo de status codes
-                if resp.status_code == 429:
-                    print(f"  [429] Rate limit - esperando más...")
-                    time.sleep(random.uniform(5, 10))
-                    continue
 
-                if resp.status_code in (500, 502, 503, 504):
-                    print(f"  [{resp.status_code}] Error del servidor")
-                    continue
+HTML_PARSERS = ("html.parser", "lxml", "selectolax")
 
-                resp.raise_for_status()
-                html = resp.text
-
-                # Detecta bot wall de forma más inteligente
-                if looks_like_bot_wall(html):
-                    # Verifica si es un bloqueo real buscando contenido válido
-                    soup_check = BeautifulSoup(html, "html.parser")
-                    # Si tiene h1, h2 o contenido real, probablemente está ok
-                    has_real_content = (
-                        soup_check.find("h1")
-                        or soup_check.find("h2")
-                        or len(soup_check.find_all("p")) > 3
-                    )
+# Backend por defecto de new_page(); lo fija main() con --parser
+_html_parser = "html.parser"
 
-                    if not has_real_content or len(html) < 30_000:
-                        print(
-                            f"  [!] Bot wall REAL detectado (len={len(html)}, content={has_real_content})"
-                        )
-                        # Cambiar IP/UA y esperar más
-                        self._update_headers()
-                        wait_time = random.uniform(5, 10) * attempt
-                        print(f"  [!] Rotando headers y esperando {wait_time:.1f}s...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        # Página con contenido real pero tiene el texto del bot wall como parte del sitio
-                        print(
-                            f"  [ok] Bot wall phrase presente pero contenido válido detectado"
-                        )
 
-                # Éxito - guardar en cache
-                if cache_path:
-                    cache_path.write_text(html, encoding="utf-8", errors="ignore")
+def set_html_parser(name: str) -> None:
+    global _html_parser
+    if name not in HTML_PARSERS:
+        raise ValueError(f"Parser HTML desconocido: {name}")
+    _html_parser = name
 
-                # Delay cortés antes del siguiente request
-                sleep_human(self.min_sleep, self.max_sleep)
-                return html
 
-            except requests.exceptions.Timeout as e:
-                last_err = e
-                print(f"  [timeout] Intento {attempt}/{self.max_retries}")
+class ParsedPage:
+    """
+    Una página HTML con sus vistas derivadas (soup, líneas normalizadas,
+    índice de headings) calculadas de forma lazy y una sola vez.
 
-            except requests.exceptions.RequestException as e:
-                last_err = e
-                print(f"  [error] {type(e).__name__}: {e}")
+    La comparten el chequeo de bot wall de Fetcher y todos los parsers, así
+    una página descargada se parsea como máximo una vez. Los parsers solo usan
+    los métodos de esta clase, no el soup: así SelectolaxPage puede cambiar
+    el backend sin tocarlos.
+    """
 
-            except Exception as e:
-                last_err = e
-                print(f"  [error inesperado] {e}")
+    HEADING_TAGS = ("h1", "h2", "h4")
+
+    def __init__(self, html: str, url: Optional[str] = None, parser: str = "html.parser"):
+        self.html = html
+        self.url = url
+        self.parser = parser
+
+    @cached_property
+    def content_sha1(self) -> str:
+        # Mismo hash que guarda HtmlCache para el cuerpo de la página
+        return hashlib.sha1(self.html.encode("utf-8", errors="ignore")).hexdigest()
+
+    @cached_property
+    def soup(self) -> "BeautifulSoup":
+        from bs4 import BeautifulSoup
+
+        return BeautifulSoup(self.html, self.parser)
+
+    def text(self) -> str:
+        return self.soup.get_text("\n")
+
+    @cached_property
+    def lines(self) -> List[str]:
+        return [clean_wikibase_line(x) for x in norm_lines(self.text())]
+
+    @cached_property
+    def headings(self) -> Dict[str, List["Tag"]]:
+        index: Dict[str, List["Tag"]] = {name: [] for name in self.HEADING_TAGS}
+        for tag in self.soup.find_all(self.HEADING_TAGS):
+            index[tag.name].append(tag)
+        return index
+
+    def heading_texts(self, name: str) -> List[str]:
+        return [h.get_text(" ", strip=True).strip() for h in self.headings[name]]
+
+    def heading_links(self, name: str) -> List[Tuple[str, Optional[str]]]:
+        """(texto del heading, texto de su primer <a> o None) por cada heading"""
+        out: List[Tuple[str, Optional[str]]] = []
+        for h in self.headings[name]:
+            a = h.find("a")
+            out.append(
+                (
+                    h.get_text(" ", strip=True).strip(),
+                    a.get_text(" ", strip=True).strip() if a else None,
+                )
+            )
+        return out
+
+    def hrefs(self, prefix: str = "") -> List[str]:
+        """href de los <a>, recortados; con prefix, solo los que empiezan así"""
+        if "soup" not in self.__dict__:
+            # Sin árbol construido no hace falta armarlo: el tokenizer solo es
+            # ~4x más rápido que el soup (con html.parser o lxml)
+            return extract_hrefs(self.html, prefix)
+        hrefs = (a["href"].strip() for a in self.soup.find_all("a", href=True))
+        return [h for h in hrefs if h.startswith(prefix)]
+
+    def image_url(self, base_url: str) -> Optional[str]:
+        return pick_meta_image(self.soup, base_url) or pick_first_reasonable_img(
+            self.soup, base_url
+        )
 
-        # Todos los intentos fallaron
-        raise RuntimeError(
-            f"Fallo al descargar {url} después de {self.max_retries} intentos: {last_err}"
+    def has_real_content(self) -> bool:
+        # Si tiene h1, h2 o contenido real, probablemente está ok
+        return bool(
+            self.headings["h1"]
+            or self.headings["h2"]
+            or len(self.soup.find_all("p")) > 3
         )
 
 
-# ----------------------------
-# Heroes list parsing
-# ----------------------------
+class SelectolaxPage(ParsedPage):
+    """
+    ParsedPage sobre selectolax (Lexbor), sin BeautifulSoup.
+    Reproduce la semántica de get_text() de bs4 para que los registros sean idénticos.
+    """
 
+    # Igual que en bs4, el contenido de estos tags no cuenta como texto
+    NON_TEXT_TAGS = ["script", "style", "template"]
+
+    def __init__(self, html: str, url: Optional[str] = None):
+        super().__init__(html, url, "selectolax")
+
+    @cached_property
+    def tree(self):
+        from selectolax.lexbor import LexborHTMLParser
+
+        tree = LexborHTMLParser(self.html)
+        tree.strip_tags(self.NON_TEXT_TAGS)
+        return tree
+
+    @property
+    def soup(self) -> "BeautifulSoup":
+        raise AttributeError("SelectolaxPage no construye un BeautifulSoup")
+
+    @staticmethod
+    def _node_text(node) -> str:
+        # Equivale a get_text(" ", strip=True): textos recortados, sin vacíos
+        parts = []
+        for n in node.traverse(include_text=True):
+            if n.tag == "-text":
+                t = n.text_content.strip()
+                if t:
+                    parts.append(t)
+        return " ".join(parts)
+
+    def text(self) -> str:
+        root = self.tree.root
+        return root.text(deep=True, separator="\n", strip=False) if root else ""
+
+    @cached_property
+    def headings(self) -> Dict[str, list]:
+        index: Dict[str, list] = {name: [] for name in self.HEADING_TAGS}
+        for node in self.tree.css(", ".join(self.HEADING_TAGS)):
+            index[node.tag].append(node)
+        return index
+
+    def heading_texts(self, name: str) -> List[str]:
+        return [self._node_text(h).strip() for h in self.headings[name]]
+
+    def heading_links(self, name: str) -> List[Tuple[str, Optional[str]]]:
+        out: List[Tuple[str, Optional[str]]] = []
+        for h in self.headings[name]:
+            a = h.css_first("a")
+            out.append(
+                (
+                    self._node_text(h).strip(),
+                    self._node_text(a).strip() if a is not None else None,
+                )
+            )
+        return out
+
+    def hrefs(self, prefix: str = "") -> List[str]:
+        hrefs = ((a.attributes.get("href") or "").strip() for a in self.tree.css("a[href]"))
+        return [h for h in hrefs if h.startswith(prefix)]
+
+    def image_url(self, base_url: str) -> Optional[str]:
+        first: Dict[Tuple[str, str], Dict] = {}
+        for node in self.tree.css("meta"):
+            attrs = node.attributes
+            for key in META_IMAGE_ATTRS:
+                if key not in first and attrs.get(key[0]) == key[1]:
+                    first[key] = attrs
+        for key in META_IMAGE_ATTRS:
+            attrs = first.get(key)
+            if attrs and attrs.get("content"):
+                return urljoin(base_url, attrs["content"].strip())
+
+        for img in self.tree.css("img"):
+            src = (img.attributes.get("src") or "").strip()
+            if not src:
+                continue
+            full = urljoin(base_url, src)
+            if full.startswith("http"):
+                return full
+        return None
+
+    def has_real_content(self) -> bool:
+        return bool(
+            self.headings["h1"] or self.headings["h2"] or len(self.tree.css("p")) > 3
+        )
 
-def parse_heroes_list(html: str) -> List[Tuple[str, str]]:
-    soup = BeautifulSoup(html, "html.parser")
-    heroes: Dict[str, str] = {}
 
-    for a in soup.find_all("a", href=True):
-        href = a["href"].strip()
-        if not href.startswith("/hots/wiki/heroes/"):
-            continue
-        if href.rstrip("/") == "/hots/wiki/heroes":
-            continue
-        if any(x in href for x in ("/abilities-talents", "/guides", "/discussion")):
-            continue
+def check_html_parser(name: str) -> None:
+    """Falla temprano si el backend elegido no está instalado"""
+    module = {"lxml": "lxml", "selectolax": "selectolax.lexbor"}.get(name)
+    if not module:
+        return
+    try:
+        __import__(module)
+    except ImportError:
+        raise SystemExit(
+            f"[!] El parser '{name}' requiere instalar el paquete: pip install {name}"
+        )
 
-        slug = href.rstrip("/").split("/")[-1]
-        url = urljoin(BASE, href)
-        heroes[slug] = url
 
-    return sorted(
-        [(slug, url) for slug, url in heroes.items()], key=lambda x: x[0].lower()
-    )
+def new_page(html: str, url: Optional[str] = None, parser: Optional[str] = None) -> ParsedPage:
+    """Crea la ParsedPage del backend elegido (por defecto, el de --parser)"""
+    parser = parser or _html_parser
+    if parser == "selectolax":
+        return SelectolaxPage(html, url)
+    return ParsedPage(html, url, parser)
 
 
-def build_abilities_talents_url(hero_url: str) -> str:
-    return hero_url.rstrip("/") + "/abilities-talents"
+def as_page(doc: Union[str, ParsedPage], url: Optional[str] = None) -> ParsedPage:
+    return doc if isinstance(doc, ParsedPage) else new_page(doc, url)
 
 
 # ----------------------------
-# Hero meta parsing
+# Cache HTML
 # ----------------------------
 
+CACHE_COMPRESSIONS = ("auto", "zstd", "gzip", "none")
+CACHE_SUFFIXES = {
+    "zstd": ".html.zst",
+    "zstd+dict": ".html.zst",
+    "gzip": ".html.gz",
+    "none": ".html",
+}
 
-def _find_label_value(lines: List[str], label: str) -> Optional[str]:
-    pat = re.compile(rf"\b{re.escape(label)}:\s*(.+)$", flags=re.I)
-    for ln in lines:
-        m = pat.search(ln)
-        if m:
-            return m.group(1).strip()
-    return None
 
+class CacheEntry(NamedTuple):
+    path: Optional[str]
+    codec: str
+    content_sha1: Optional[str]
+    fetched_at: float
+    etag: Optional[str]
+    last_modified: Optional[str]
 
-def parse_hero_meta_from_abilities_talents(
-    html: str, page_url: str, hero_slug: str
-) -> Dict:
-    soup = BeautifulSoup(html, "html.parser")
-    all_text = soup.get_text("\n")
-    lines = [clean_wikibase_line(x) for x in norm_lines(all_text)]
 
-    name = None
-    h1 = soup.find("h1")
-    if h1:
-        t = h1.get_text(" ", strip=True)
-        m = re.match(r"^(.*?)\s+Abilities\s*&\s*Talents", t, flags=re.I)
-        if m:
-            name = m.group(1).strip()
+def _import_zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
 
-    if not name:
-        for h2 in soup.find_all("h2"):
-            t = h2.get_text(" ", strip=True).strip()
-            if not t or t in IGNORE_HEADINGS:
-                continue
-            if len(t) <= 30:
-                name = t
-                break
 
-    if not name:
-        name = hero_slug.replace("-", " ").title()
+def decode_cache_body(codec: str, data: bytes, zstd=None, zdict=None) -> bytes:
+    """Descomprime un cuerpo del cache (HtmlCache o CachePack) según su codec"""
+    if codec in ("zstd", "zstd+dict"):
+        if not zstd:
+            raise RuntimeError("Entrada del cache en zstd pero zstandard no está instalado")
+        d = zstd.ZstdDecompressor(dict_data=zdict if codec == "zstd+dict" else None)
+        return d.decompress(data)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    return bytes(data)
 
-    title = _find_label_value(lines, "Title")
-    role = _find_label_value(lines, "Role")
-    franchise = _find_label_value(lines, "Franchise")
-    price = _find_label_value(lines, "Price")
 
-    stats: Dict[str, str] = {}
-    description = None
-    try:
-        idx = lines.index("Statistics")
-        i = idx + 1
-        while i < len(lines):
-            ln = lines[i]
-            if ln in (
-                "Builds & Guides",
-                "Abilities & Talents",
-                "Discussion",
-            ) or ln.startswith("HotS Wikibase Navigation"):
-                break
-            m = re.match(r"^([A-Za-z .'/\-]+)\s+(.+)$", ln)
-            if m and len(m.group(1)) <= 18:
-                stats[m.group(1).strip()] = m.group(2).strip()
-                i += 1
+class HtmlCache:
+    """
+    Cache HTML en disco.
+
+    - Layout sharded de dos niveles: ab/cd/<sha1(url)>.html.zst
+    - Cuerpos comprimidos con zstd (con un diccionario entrenado sobre las
+      propias páginas, que comparten casi todo el boilerplate) o gzip. Cada
+      diccionario se guarda como zstd.<dict_id>.dict y nunca se pisa: varios
+      procesos pueden compartir el directorio y cada cuerpo se descomprime
+      con el diccionario cuyo id trae su frame zstd
+    - Manifest SQLite (URL -> path, tamaño, fetched_at, hash del contenido):
+      lookups O(1) sin escanear directorios
+    - Límite de tamaño opcional con evicción LRU
+    - Validadores HTTP (ETag / Last-Modified) por página para revalidar con 304
+
+    Los archivos planos <sha1>.html del layout anterior se siguen leyendo
+    tal cual; migrate_legacy() los pasa al layout nuevo.
+
+    Con read_only=True (harnesses, servidor local, 'cache export') no se
+    escribe nada en el directorio: el manifest se abre en modo solo lectura
+    y, si no existe, se usa uno vacío en memoria.
+    """
+
+    MANIFEST = "manifest.sqlite"
+    # Diccionario único de versiones anteriores; se registra por su id al abrir
+    LEGACY_DICT_FILE = "zstd.dict"
+    DICT_GLOB = "zstd.*.dict"
+    # Nombre de un archivo del layout plano: el sha1 de la URL
+    LEGACY_KEY = re.compile(r"^[0-9a-f]{40}$")
+    DICT_SIZE = 112_640
+    # Páginas zstd necesarias antes de entrenar el diccionario
+    DICT_TRAIN_MIN = 100
+    ZSTD_LEVEL = 10
+    GZIP_LEVEL = 6
+    EVICT_TO = 0.9
+
+    def __init__(
+        self,
+        root: Path,
+        compression: str = "auto",
+        max_bytes: int = 0,
+        read_only: bool = False,
+    ):
+        self.root = root
+        self.read_only = read_only
+        if not read_only:
+            self.root.mkdir(parents=True, exist_ok=True)
+        self._zstd = _import_zstd()
+        if compression == "auto":
+            compression = "zstd" if self._zstd else "gzip"
+        if compression == "zstd" and not self._zstd:
+            raise SystemExit(
+                "[!] --cache-compression zstd requiere instalar: pip install zstandard"
+            )
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+
+        manifest = self.root / self.MANIFEST
+        if read_only and manifest.exists():
+            self.db = sqlite3.connect(
+                f"file:{manifest}?mode=ro", uri=True, timeout=30, check_same_thread=False
+            )
+        elif read_only:
+            self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        else:
+            self.db = sqlite3.connect(str(manifest), timeout=30, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+        # En modo solo lectura estos CREATE ... IF NOT EXISTS no escriben nada
+        # (el manifest ya los tiene) o van al manifest en memoria
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                path TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                raw_size INTEGER NOT NULL,
+                content_sha1 TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        if not read_only:
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)"
+            )
+        # Los manifests más viejos no tienen meta: en solo lectura va como temporal
+        meta_schema = "main" if not read_only or self._has_table("meta") else "temp"
+        self.db.execute(
+            f"CREATE TABLE IF NOT EXISTS {meta_schema}.meta "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        # Manifests creados antes de guardar validadores HTTP / id del diccionario
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(pages)")}
+        missing = [
+            (column, kind)
+            for column, kind in (("etag", "TEXT"), ("last_modified", "TEXT"), ("dict_id", "INTEGER"))
+            if column not in columns
+        ]
+        if missing and read_only:
+            # Sin poder hacer ALTER: una vista temporal (tapa a main.pages) con
+            # las columnas que faltan en NULL
+            nulls = ", ".join(f"NULL AS {column}" for column, _ in missing)
+            self.db.execute(f"CREATE TEMP VIEW pages AS SELECT *, {nulls} FROM main.pages")
+        elif missing:
+            for column, kind in missing:
+                self.db.execute(f"ALTER TABLE pages ADD COLUMN {column} {kind}")
+        self.db.commit()
+        self.total_bytes = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM pages"
+        ).fetchone()[0]
+
+        # Diccionarios por id (se cargan al primer uso) y el que se usa al comprimir
+        self._dicts: Dict[int, object] = {}
+        self._zdict = None
+        if self._zstd:
+            self._register_legacy_dict()
+            self._adopt_dict()
+
+    def _has_table(self, name: str) -> bool:
+        return (
+            self.db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+            ).fetchone()
+            is not None
+        )
+
+    # -- compresión --
+
+    def _encode(self, raw: bytes) -> Tuple[str, bytes]:
+        if self.compression == "zstd":
+            if self._zdict is not None:
+                c = self._zstd.ZstdCompressor(level=self.ZSTD_LEVEL, dict_data=self._zdict)
+                return "zstd+dict", c.compress(raw)
+            return "zstd", self._zstd.ZstdCompressor(level=self.ZSTD_LEVEL).compress(raw)
+        if self.compression == "gzip":
+            return "gzip", gzip.compress(raw, self.GZIP_LEVEL)
+        return "none", raw
+
+    def _decode(self, codec: str, data: bytes) -> bytes:
+        if codec in ("zstd", "zstd+dict"):
+            # El frame dice con qué diccionario se comprimió: sirve aunque otro
+            # proceso haya recomprimido el archivo después de leer la fila
+            dict_id = self.frame_dict_id(data)
+            codec = "zstd+dict" if dict_id else "zstd"
+            return decode_cache_body(codec, data, self._zstd, self._dict(dict_id))
+        return decode_cache_body(codec, data)
+
+    def frame_dict_id(self, data: bytes) -> int:
+        """Id del diccionario de un cuerpo zstd (0 = sin diccionario)"""
+        return self._zstd.get_frame_parameters(data).dict_id if self._zstd else 0
+
+    # -- diccionarios --
+
+    def _dict_path(self, dict_id: int) -> Path:
+        return self.root / f"zstd.{dict_id}.dict"
+
+    def _dict(self, dict_id: int):
+        """Diccionario con ese id (None si es 0 o no está en disco)"""
+        if not dict_id:
+            return None
+        zdict = self._dicts.get(dict_id)
+        if zdict is None:
+            path = self._dict_path(dict_id)
+            if not path.exists():
+                return None
+            zdict = self._dicts[dict_id] = self._zstd.ZstdCompressionDict(path.read_bytes())
+        return zdict
+
+    def _write_dict(self, zdict) -> int:
+        """Guarda un diccionario bajo su id (si ya existe no se toca) y devuelve el id"""
+        dict_id = zdict.dict_id()
+        path = self._dict_path(dict_id)
+        if not path.exists():
+            _write_atomic(path, zdict.as_bytes())
+        self._dicts[dict_id] = zdict
+        return dict_id
+
+    def _register_legacy_dict(self) -> None:
+        """El zstd.dict de versiones anteriores pasa a zstd.<id>.dict"""
+        legacy = self.root / self.LEGACY_DICT_FILE
+        if not legacy.exists():
+            return
+        zdict = self._zstd.ZstdCompressionDict(legacy.read_bytes())
+        if self.read_only:
+            # Se usa sin migrarlo (las filas viejas tienen dict_id NULL)
+            self._dicts[zdict.dict_id()] = self._zdict = zdict
+            return
+        dict_id = self._write_dict(zdict)
+        with self._lock:
+            self.db.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('zstd_dict_id', ?)",
+                (str(dict_id),),
+            )
+            self.db.execute(
+                "UPDATE pages SET dict_id = ? WHERE codec = 'zstd+dict' AND dict_id IS NULL",
+                (dict_id,),
+            )
+            self.db.commit()
+
+    def _adopt_dict(self) -> bool:
+        """Usa el diccionario que figura en el manifest (entrenado acá o por otro proceso)"""
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE key = 'zstd_dict_id'"
+        ).fetchone()
+        zdict = self._dict(int(row[0])) if row else None
+        if zdict is not None:
+            self._zdict = zdict
+        return zdict is not None
+
+    # -- API --
+
+    @staticmethod
+    def key(url: str) -> str:
+        return sha1(url)
+
+    def _legacy_path(self, key: str) -> Path:
+        return self.root / f"{key}.html"
+
+    @classmethod
+    def legacy_files(cls, root: Path) -> List[Path]:
+        """Los <sha1>.html planos de root, ordenados; ignora otros .html sueltos"""
+        if not root.is_dir():
+            return []
+        return sorted(p for p in root.glob("*.html") if cls.LEGACY_KEY.match(p.stem))
+
+    def entry(self, url: str) -> Optional[CacheEntry]:
+        """Metadatos de una URL sin leer el cuerpo (None si no está en cache)"""
+        key = self.key(url)
+        with self._lock:
+            row = self.db.execute(
+                """
+                SELECT path, codec, content_sha1, fetched_at, etag, last_modified
+                FROM pages WHERE key = ?
+                """,
+                (key,),
+            ).fetchone()
+        if row:
+            return CacheEntry(*row)
+        legacy = self._legacy_path(key)
+        if legacy.exists():
+            # Layout plano: sin manifest, la fecha de descarga es la del archivo
+            return CacheEntry(None, "none", None, legacy.stat().st_mtime, None, None)
+        return None
+
+    def __contains__(self, url: str) -> bool:
+        return self.entry(url) is not None
+
+    def get(self, url: str) -> Optional[str]:
+        key = self.key(url)
+        with self._lock:
+            row = self.db.execute(
+                "SELECT path, codec FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                path, codec = row
+                try:
+                    data = (self.root / path).read_bytes()
+                except FileNotFoundError:
+                    # El archivo desapareció: se olvida la entrada
+                    if not self.read_only:
+                        self._delete(key)
+                    return None
+                try:
+                    raw = self._decode(codec, data)
+                except Exception as e:
+                    # Diccionario faltante o cuerpo corrupto: cuenta como miss
+                    log(f"  [cache] No se pudo leer {path}: {e}", 1)
+                    return None
+                if not self.read_only:
+                    self.db.execute(
+                        "UPDATE pages SET last_access = ? WHERE key = ?", (time.time(), key)
+                    )
+                    self.db.commit()
+                return raw.decode("utf-8", errors="ignore")
+
+        legacy = self._legacy_path(key)
+        if legacy.exists():
+            return legacy.read_text(encoding="utf-8", errors="ignore")
+        return None
+
+    def put(
+        self,
+        url: Optional[str],
+        html: str,
+        key: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        fetched_at: Optional[float] = None,
+    ) -> None:
+        if self.read_only:
+            raise RuntimeError(f"El cache {self.root} está abierto en modo solo lectura")
+        key = key or self.key(url)
+        raw = html.encode("utf-8", errors="ignore")
+        if self.compression == "zstd" and self._zdict is None:
+            # El diccionario se entrena en train_dict(); acá solo se adopta
+            # el que ya exista (p.ej. entrenado por otro proceso)
+            with self._lock:
+                self._adopt_dict()
+        codec, data = self._encode(raw)
+        rel = f"{key[:2]}/{key[2:4]}/{key}{CACHE_SUFFIXES[codec]}"
+        _write_atomic(self.root / rel, data)
+
+        now = time.time()
+        with self._lock:
+            old = self.db.execute(
+                "SELECT path, size FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if old:
+                self.total_bytes -= old[1]
+                if old[0] != rel:
+                    (self.root / old[0]).unlink(missing_ok=True)
+            self.db.execute(
+                """
+                INSERT OR REPLACE INTO pages
+                    (key, url, path, codec, size, raw_size, content_sha1,
+                     fetched_at, last_access, etag, last_modified, dict_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    key,
+                    url,
+                    rel,
+                    codec,
+                    len(data),
+                    len(raw),
+                    hashlib.sha1(raw).hexdigest(),
+                    fetched_at or now,
+                    now,
+                    etag,
+                    last_modified,
+                    self._zdict.dict_id() if codec == "zstd+dict" else None,
+                ),
+            )
+            self.db.commit()
+            self.total_bytes += len(data)
+            if self.max_bytes:
+                # Otros procesos pueden estar escribiendo en el mismo directorio:
+                # el límite es sobre el total del manifest, no lo escrito acá
+                self.total_bytes = self.db.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM pages"
+                ).fetchone()[0]
+
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def touch(self, url: str) -> None:
+        """Marca una página como recién validada (respuesta 304)"""
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                "UPDATE pages SET fetched_at = ?, last_access = ? WHERE key = ?",
+                (now, now, self.key(url)),
+            )
+            self.db.commit()
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT path, size FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return
+            (self.root / row[0]).unlink(missing_ok=True)
+            self.db.execute("DELETE FROM pages WHERE key = ?", (key,))
+            self.db.commit()
+            self.total_bytes -= row[1]
+
+    def evict(self) -> int:
+        """
+        Borra las entradas usadas hace más tiempo hasta quedar bajo el 90% de
+        max_bytes (el margen evita evictar en cada put)
+        """
+        evicted = 0
+        target = int(self.max_bytes * self.EVICT_TO)
+        with self._lock:
+            # Otro proceso puede haber escrito: se recalcula antes de borrar
+            self.total_bytes = self.db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM pages"
+            ).fetchone()[0]
+            while self.max_bytes and self.total_bytes > target:
+                rows = self.db.execute(
+                    "SELECT key FROM pages ORDER BY last_access ASC LIMIT 64"
+                ).fetchall()
+                if not rows:
+                    break
+                for (key,) in rows:
+                    self._delete(key)
+                    evicted += 1
+                    if self.total_bytes <= target:
+                        break
+        if evicted:
+            log(f"  [cache] {evicted} páginas eliminadas por límite de tamaño (LRU)", 1)
+        return evicted
+
+    def train_dict(self) -> int:
+        """
+        Paso de fin de corrida (nunca desde put(), que corre en el event loop
+        con --concurrency): entrena el diccionario zstd una vez que hay
+        suficientes páginas, o adopta el que entrenó otro proceso, y
+        recomprime las páginas que quedaron sin diccionario. Todo ocurre con
+        el lock de escritura del manifest tomado, así que entre procesos que
+        comparten el directorio entrena uno solo. Devuelve las recomprimidas.
+        """
+        if not self._zstd:
+            return 0
+        with self._lock:
+            if self._zdict is None and not self._adopt_dict():
+                count = self.db.execute(
+                    "SELECT COUNT(*) FROM pages WHERE codec = 'zstd'"
+                ).fetchone()[0]
+                if count < self.DICT_TRAIN_MIN:
+                    return 0
+            self.db.commit()
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                # Otro proceso pudo entrenar mientras se esperaba el lock
+                trained = self._zdict is None and not self._adopt_dict()
+                rows = self.db.execute(
+                    "SELECT key, path, size FROM pages WHERE codec = 'zstd'"
+                ).fetchall()
+                bodies: Dict[str, bytes] = {}
+                for key, path, _ in rows:
+                    try:
+                        bodies[key] = self._decode("zstd", (self.root / path).read_bytes())
+                    except FileNotFoundError:
+                        pass
+                if trained:
+                    samples = list(bodies.values())[:1000]
+                    zdict = self._zstd.train_dictionary(self.DICT_SIZE, samples)
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('zstd_dict_id', ?)",
+                        (str(self._write_dict(zdict)),),
+                    )
+                    self._zdict = zdict
+                # Se reescriben cuerpo y fila en el lugar: fetched_at y
+                # last_access quedan como estaban y no se evicta a mitad de camino
+                dict_id = self._zdict.dict_id()
+                c = self._zstd.ZstdCompressor(level=self.ZSTD_LEVEL, dict_data=self._zdict)
+                for key, path, size in rows:
+                    raw = bodies.get(key)
+                    if raw is None:
+                        continue
+                    data = c.compress(raw)
+                    _write_atomic(self.root / path, data)
+                    self.db.execute(
+                        """
+                        UPDATE pages SET codec = 'zstd+dict', size = ?, dict_id = ?
+                        WHERE key = ?
+                        """,
+                        (len(data), dict_id, key),
+                    )
+                    self.total_bytes += len(data) - size
+                self.db.commit()
+            except BaseException:
+                self.db.rollback()
+                raise
+        if trained:
+            log(f"  [cache] Diccionario zstd entrenado con {len(samples)} páginas", 1)
+        if bodies:
+            log(f"  [cache] {len(bodies)} páginas recomprimidas con el diccionario zstd", 1)
+        return len(bodies)
+
+    def iter_pages(self) -> Iterator[Tuple[str, Optional[str], str]]:
+        """(key, url o None, html) de todas las páginas, incluidas las del layout plano"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT key, url, path, codec FROM pages ORDER BY key"
+            ).fetchall()
+        seen = set()
+        for key, url, path, codec in rows:
+            seen.add(key)
+            try:
+                data = (self.root / path).read_bytes()
+            except FileNotFoundError:
                 continue
-            if not description and len(ln) > 80 and "Copyright" not in ln:
-                description = ln
-            i += 1
-    except ValueError:
-        pass
+            yield key, url, self._decode(codec, data).decode("utf-8", errors="ignore")
+        for legacy in self.legacy_files(self.root):
+            if legacy.stem not in seen:
+                yield legacy.stem, None, legacy.read_text(encoding="utf-8", errors="ignore")
+
+    def migrate_legacy(self) -> int:
+        """Pasa los <sha1>.html planos al layout sharded comprimido (y los borra)"""
+        migrated = 0
+        for legacy in self.legacy_files(self.root):
+            key = legacy.stem
+            if self.db.execute("SELECT 1 FROM pages WHERE key = ?", (key,)).fetchone() is None:
+                # El layout plano no guardaba la URL: queda solo la key (sha1 de la URL)
+                self.put(None, legacy.read_text(encoding="utf-8", errors="ignore"), key=key)
+            legacy.unlink()
+            migrated += 1
+        return migrated
+
+    def export_entries(self) -> List[Tuple]:
+        """
+        Páginas para CachePack.export, ordenadas por key: (key, url, path o
+        None, codec, raw_size, content_sha1, fetched_at, etag, last_modified,
+        dict_id). Las del layout plano van con path None (se leen al exportar).
+        """
+        with self._lock:
+            rows = self.db.execute(
+                """
+                SELECT key, url, path, codec, raw_size, content_sha1, fetched_at,
+                       etag, last_modified, dict_id
+                FROM pages
+                """
+            ).fetchall()
+        seen = {row[0] for row in rows}
+        for legacy in self.legacy_files(self.root):
+            if legacy.stem not in seen:
+                rows.append(
+                    (
+                        legacy.stem, None, None, "none", None, None,
+                        legacy.stat().st_mtime, None, None, None,
+                    )
+                )
+        return sorted(rows)
+
+    def import_pack(self, pack: "CachePack") -> Tuple[int, int]:
+        """
+        Agrega las páginas de un pack; una página que ya está en cache con
+        una descarga igual o más nueva se deja. Devuelve (importadas, salteadas).
+        """
+        imported = skipped = 0
+        for key, url, entry, html in pack.iter_pages():
+            with self._lock:
+                row = self.db.execute(
+                    "SELECT fetched_at FROM pages WHERE key = ?", (key,)
+                ).fetchone()
+            if row and row[0] >= entry.fetched_at:
+                skipped += 1
+                continue
+            self.put(
+                url,
+                html,
+                key=key,
+                etag=entry.etag,
+                last_modified=entry.last_modified,
+                fetched_at=entry.fetched_at,
+            )
+            imported += 1
+        return imported, skipped
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
+
+
+class CachePack:
+    """
+    El cache HTML en un solo archivo, para compartir un crawl entre máquinas
+    o con CI ("cache export" / "cache import") o leerlo directo con
+    --cache-pack. Layout (little-endian):
+
+    - HEADER fijo: magic, versión, cantidad de páginas y posición/largo de
+      los metadatos y del diccionario zstd
+    - índice fijo, un RECORD por página ordenado por key: key (sha1 de la
+      URL), offset y largo del cuerpo, tamaño sin comprimir, codec,
+      fetched_at y sha1 del contenido
+    - cuerpos contiguos, comprimidos tal como estaban en el cache
+    - metadatos JSON por página ([url, etag, last_modified]) y el diccionario
+
+    Se lee por mmap: un lookup es una búsqueda binaria sobre el índice y el
+    cuerpo sale del mismo mapeo, sin abrir un archivo por página.
+    """
 
-    portrait_url = pick_meta_image(soup, page_url) or pick_first_reasonable_img(
-        soup, page_url
-    )
+    MAGIC = b"HFCPACK\0"
+    VERSION = 1
+    HEADER = struct.Struct("<8sIIQQQQ")
+    RECORD = struct.Struct("<20sQIIBd20s")
+    CODECS = ("none", "gzip", "zstd", "zstd+dict")
 
-    return {
-        "name": name,
-        "url": page_url,
-        "slug": hero_slug,
-        "title": title,
-        "role": role,
-        "franchise": franchise,
-        "price": price,
-        "portrait_image_url": portrait_url,
-        "stats": stats,
-        "description": description,
-    }
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = path.open("rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            header = self.HEADER.unpack_from(self._mm, 0)
+        except (ValueError, struct.error):
+            self._file.close()
+            raise ValueError(f"{path} no es un pack de cache")
+        magic, version, self.count, self._meta_at, self._meta_len, dict_at, dict_len = header
+        if magic != self.MAGIC or version != self.VERSION:
+            self.close()
+            raise ValueError(f"{path} no es un pack de cache (versión {self.VERSION})")
+        self._zstd = _import_zstd()
+        self._zdict = None
+        if dict_len and self._zstd:
+            self._zdict = self._zstd.ZstdCompressionDict(
+                bytes(self._mm[dict_at : dict_at + dict_len])
+            )
+
+    @cached_property
+    def _meta(self) -> List[List[Optional[str]]]:
+        return json.loads(self._mm[self._meta_at : self._meta_at + self._meta_len])
+
+    def _find(self, key: str) -> int:
+        """Posición de la key en el índice (-1 si no está)"""
+        target = bytes.fromhex(key)
+        lo, hi = 0, self.count
+        base, size = self.HEADER.size, self.RECORD.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at = base + mid * size
+            probe = self._mm[at : at + 20]
+            if probe < target:
+                lo = mid + 1
+            elif probe > target:
+                hi = mid
+            else:
+                return mid
+        return -1
 
+    def _record(self, i: int) -> Tuple:
+        return self.RECORD.unpack_from(self._mm, self.HEADER.size + i * self.RECORD.size)
 
-# ----------------------------
-# Talent links parsing
-# ----------------------------
+    def _entry(self, i: int) -> CacheEntry:
+        _, _, _, _, codec, fetched_at, content_sha1 = self._record(i)
+        _, etag, last_modified = self._meta[i]
+        return CacheEntry(
+            None, self.CODECS[codec], content_sha1.hex(), fetched_at, etag, last_modified
+        )
 
+    def _body(self, i: int) -> bytes:
+        _, offset, size, _, codec, _, _ = self._record(i)
+        data = memoryview(self._mm)[offset : offset + size]
+        try:
+            return decode_cache_body(self.CODECS[codec], data, self._zstd, self._zdict)
+        finally:
+            data.release()
 
-def parse_talent_urls_from_abilities_talents(html: str, page_url: str) -> List[str]:
-    soup = BeautifulSoup(html, "html.parser")
-    urls: Set[str] = set()
+    def entry(self, url: str) -> Optional[CacheEntry]:
+        i = self._find(HtmlCache.key(url))
+        return self._entry(i) if i >= 0 else None
 
-    for a in soup.find_all("a", href=True):
-        href = a["href"].strip()
-        if href.startswith("/hots/wiki/talents/"):
-            urls.add(urljoin(page_url, href))
+    def __contains__(self, url: str) -> bool:
+        return self._find(HtmlCache.key(url)) >= 0
 
-    return sorted(urls)
+    def get(self, url: str) -> Optional[str]:
+        i = self._find(HtmlCache.key(url))
+        if i < 0:
+            return None
+        return self._body(i).decode("utf-8", errors="ignore")
+
+    def iter_pages(self) -> Iterator[Tuple[str, Optional[str], CacheEntry, str]]:
+        """(key, url o None, entrada, html) de todas las páginas, en orden de key"""
+        for i in range(self.count):
+            key = self._record(i)[0].hex()
+            html = self._body(i).decode("utf-8", errors="ignore")
+            yield key, self._meta[i][0], self._entry(i), html
+
+    def close(self) -> None:
+        self.__dict__.pop("_meta", None)
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    @classmethod
+    def export(cls, cache: HtmlCache, path: Path) -> Tuple[int, int]:
+        """
+        Empaqueta el cache en path (atómico). Los cuerpos se copian tal cual,
+        salvo los que estaban sin comprimir. Devuelve (páginas, bytes).
+        """
+        entries = cache.export_entries()
+        tmp = path.with_name(path.name + ".tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        records: List[bytes] = []
+        meta: List[List[Optional[str]]] = []
+        with tmp.open("wb") as f:
+            # El índice se reserva para todas las páginas; si alguna
+            # desapareció del disco, sus slots quedan sin usar al final
+            f.seek(cls.HEADER.size + len(entries) * cls.RECORD.size)
+            for key, url, rel, codec, raw_size, content_sha1, fetched_at, etag, lm, dict_id in entries:
+                try:
+                    if rel is None:
+                        # Layout plano: mismo hash que calcula Fetcher.cached_sha1
+                        data = (cache.root / f"{key}.html").read_text(
+                            encoding="utf-8", errors="ignore"
+                        ).encode("utf-8")
+                        raw_size, content_sha1 = len(data), hashlib.sha1(data).hexdigest()
+                    else:
+                        data = (cache.root / rel).read_bytes()
+                except FileNotFoundError:
+                    continue
+                if codec == "none":
+                    # Las páginas sin comprimir (layout plano) viajan comprimidas
+                    codec, data = cache._encode(data)
+                elif (
+                    codec == "zstd+dict"
+                    and cache._zdict is not None
+                    and dict_id != cache._zdict.dict_id()
+                ):
+                    # El pack lleva un solo diccionario: lo comprimido con otro
+                    # se recomprime con el actual
+                    codec, data = cache._encode(cache._decode(codec, data))
+                records.append(
+                    cls.RECORD.pack(
+                        bytes.fromhex(key),
+                        f.tell(),
+                        len(data),
+                        raw_size,
+                        cls.CODECS.index(codec),
+                        fetched_at,
+                        bytes.fromhex(content_sha1),
+                    )
+                )
+                meta.append([url, etag, lm])
+                f.write(data)
+
+            meta_blob = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            meta_at = f.tell()
+            f.write(meta_blob)
+            dict_blob = cache._zdict.as_bytes() if cache._zdict is not None else b""
+            dict_at = f.tell()
+            f.write(dict_blob)
+            size = f.tell()
+
+            f.seek(0)
+            f.write(
+                cls.HEADER.pack(
+                    cls.MAGIC,
+                    cls.VERSION,
+                    len(records),
+                    meta_at,
+                    len(meta_blob),
+                    dict_at,
+                    len(dict_blob),
+                )
+            )
+            f.write(b"".join(records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return len(records), size
 
 
 # ----------------------------
-# Talent page parsing
+# Modelo de registros
 # ----------------------------
 
-
-def _extract_talent_name(soup: BeautifulSoup) -> Optional[str]:
-    for h2 in soup.find_all("h2"):
-        t = h2.get_text(" ", strip=True).strip()
-        if not t or t in IGNORE_HEADINGS:
-            continue
-        return t
-
-    h1 = soup.find("h1")
-    if h1:
-        t = h1.get_text(" ", strip=True).strip()
-        t = re.sub(r"^HotS Talent:\s*", "", t, flags=re.I).strip()
-        if t and t not in IGNORE_HEADINGS:
-            return t
-
-    return None
+# Clases inmutables con __slots__: un talento compartido por varios héroes
+# (o guardado en el LRU de TalentStore) se reutiliza tal cual, sin copiarlo,
+# y cada instancia ocupa bastante menos que el dict equivalente. to_dict()
+# conserva el orden de claves de la salida JSON y from_dict() lee registros
+# ya serializados (cache, salidas anteriores).
+
+
+@dataclass(frozen=True, slots=True)
+class Modifies:
+    """Habilidad que modifica un talento ("Modifies Ability")"""
+
+    ability: str
+    hotkey: str
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"ability": self.ability, "hotkey": self.hotkey}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Mapping]) -> Optional["Modifies"]:
+        return cls(data.get("ability"), data.get("hotkey")) if data else None
+
+
+@dataclass(frozen=True, slots=True)
+class Talent:
+    name: Optional[str]
+    url: str
+    slug: str
+    tier_index: Optional[int]
+    tier: Optional[int]
+    hero: Optional[str]
+    description: Optional[str]
+    icon_image_url: Optional[str]
+    modifies: Optional[Modifies]
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "url": self.url,
+            "slug": self.slug,
+            "tier_index": self.tier_index,
+            "tier": self.tier,
+            "hero": self.hero,
+            "description": self.description,
+            "icon_image_url": self.icon_image_url,
+            "modifies": self.modifies.to_dict() if self.modifies else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "Talent":
+        return cls(
+            data.get("name"),
+            data.get("url"),
+            data.get("slug"),
+            data.get("tier_index"),
+            data.get("tier"),
+            data.get("hero"),
+            data.get("description"),
+            data.get("icon_image_url"),
+            Modifies.from_dict(data.get("modifies")),
+        )
 
 
-def _extract_hero_owner_from_h4(soup: BeautifulSoup) -> Optional[str]:
-    for h4 in soup.find_all("h4"):
-        txt = h4.get_text(" ", strip=True).strip()
-        if not txt:
-            continue
+@dataclass(frozen=True, slots=True)
+class HeroMeta:
+    name: str
+    url: str
+    slug: str
+    title: Optional[str]
+    role: Optional[str]
+    franchise: Optional[str]
+    price: Optional[str]
+    portrait_image_url: Optional[str]
+    # Solo lectura: se comparte entre el registro y sus serializaciones
+    stats: Mapping[str, str]
+    description: Optional[str]
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "url": self.url,
+            "slug": self.slug,
+            "title": self.title,
+            "role": self.role,
+            "franchise": self.franchise,
+            "price": self.price,
+            "portrait_image_url": self.portrait_image_url,
+            "stats": self.stats,
+            "description": self.description,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "HeroMeta":
+        return cls(
+            data.get("name"),
+            data.get("url"),
+            data.get("slug"),
+            data.get("title"),
+            data.get("role"),
+            data.get("franchise"),
+            data.get("price"),
+            data.get("portrait_image_url"),
+            data.get("stats") or {},
+            data.get("description"),
+        )
 
-        a = h4.find("a")
-        if a:
-            at = a.get_text(" ", strip=True).strip()
-            if at.lower().endswith("'s"):
-                return at[:-2].strip()
 
-        m = re.match(r"^(.+?)'s\s+.+$", txt)
-        if m:
-            return m.group(1).strip()
+@dataclass(frozen=True, slots=True)
+class HeroRecord:
+    """Un héroe terminado: lo que reciben los writers de salida"""
+
+    slug: str
+    hero: HeroMeta
+    abilities_talents_url: str
+    talents: Tuple[Talent, ...]
+
+    def to_dict(self) -> Dict:
+        return {
+            "slug": self.slug,
+            "hero": self.hero.to_dict(),
+            "abilities_talents_url": self.abilities_talents_url,
+            "talents": [t.to_dict() for t in self.talents],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "HeroRecord":
+        return cls(
+            data.get("slug"),
+            HeroMeta.from_dict(data.get("hero") or {}),
+            data.get("abilities_talents_url"),
+            tuple(Talent.from_dict(t) for t in data.get("talents") or ()),
+        )
 
-    return None
+    def csv_rows(self) -> List[Tuple]:
+        """Filas de la tabla de talentos, en el orden de TALENTS_CSV_FIELDS"""
+        h = self.hero
+        return [
+            (
+                h.name,
+                self.slug,
+                h.role,
+                h.franchise,
+                t.tier,
+                t.tier_index,
+                t.name,
+                t.slug,
+                t.url,
+                t.icon_image_url,
+                t.description,
+                t.modifies.ability if t.modifies else None,
+                t.modifies.hotkey if t.modifies else None,
+            )
+            for t in self.talents
+        ]
+
+
+def _record_json(value):
+    """default= de json.dumps para los registros del modelo"""
+    if isinstance(value, (Modifies, Talent, HeroMeta, HeroRecord)):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} no es serializable a JSON")
+
+
+# Registros del cache que vuelven a armarse como clases del modelo, por
+# nombre del parser que los produjo (el resto queda como JSON plano)
+RECORD_DECODERS: Dict[str, Callable] = {
+    "parse_talent_page": Talent.from_dict,
+    "parse_hero_page": lambda data: (HeroMeta.from_dict(data[0]), data[1]),
+}
 
 
-def parse_talent_page(html: str, url: str) -> Dict:
-    soup = BeautifulSoup(html, "html.parser")
+def encode_record(value) -> bytes:
+    """Registro de un parser como JSON comprimido con zlib"""
+    return zlib.compress(
+        json.dumps(
+            value, ensure_ascii=False, separators=(",", ":"), default=_record_json
+        ).encode("utf-8")
+    )
 
-    name = _extract_talent_name(soup)
-    owner = _extract_hero_owner_from_h4(soup)
 
-    lines = [clean_wikibase_line(x) for x in norm_lines(soup.get_text("\n"))]
+def decode_record(kind: str, data: bytes):
+    """Inversa de encode_record; kind es el nombre del parser (RECORD_DECODERS)"""
+    value = json.loads(zlib.decompress(data))
+    decode = RECORD_DECODERS.get(kind)
+    return decode(value) if decode else value
 
-    tier_index = None
-    for ln in lines:
-        m = re.match(r"^Tier\s+(\d+)$", ln, flags=re.I)
-        if m:
-            tier_index = int(m.group(1))
-            break
 
-    tier_level = TIER_TO_LEVEL.get(tier_index) if tier_index else None
+# ----------------------------
+# Cache de registros parseados
+# ----------------------------
 
-    description_lines: List[str] = []
-    stop_phrases = {
-        "modifies ability",
-        "see also:",
-        "quick comment",
-        "hots wikibase navigation",
-    }
+# Subir al cambiar cualquier parser: invalida los registros ya cacheados
+PARSER_VERSION = "1"
 
-    start_idx = 0
-    if tier_index is not None:
-        for i, ln in enumerate(lines):
-            if re.match(r"^Tier\s+\d+$", ln, flags=re.I):
-                start_idx = i + 1
-                break
 
-    owner_line_pat = None
-    if name:
-        owner_line_pat = re.compile(rf"^(.+?)'s\s+{re.escape(name)}$", flags=re.I)
+class RecordCache:
+    """
+    Cache de los registros que devuelven los parsers (parse_hero_page,
+    parse_talent_page), indexado por (hash del HTML, PARSER_VERSION, argumentos).
 
-    for ln in lines[start_idx : start_idx + 60]:
-        low = ln.strip().lower()
-        if low in stop_phrases or any(low.startswith(x) for x in stop_phrases):
-            break
-        if not ln or ln in IGNORE_HEADINGS:
-            continue
-        if name and ln.strip().lower() == name.strip().lower():
-            continue
-        if owner_line_pat and owner_line_pat.match(ln.strip()):
-            continue
-        if re.match(r"^.+\s+\([QWERDZ]\)$", ln.strip()):
-            continue
+    Con el cache HTML caliente, un rerun no vuelve a parsear ninguna página:
+    solo hace falta parsear de nuevo cuando cambian los parsers. Los registros
+    se guardan como JSON comprimido con zlib en SQLite y vuelven como clases
+    del modelo según RECORD_DECODERS.
+    """
 
-        ln = clean_wikibase_line(ln)
+    FILE = "records.sqlite"
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                version TEXT NOT NULL,
+                data BLOB NOT NULL
+            )
+            """
+        )
+        # Registros de versiones anteriores del parser ya no se pueden usar
+        self.db.execute("DELETE FROM records WHERE version != ?", (PARSER_VERSION,))
+        self.db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(kind: str, content_sha1: str, args: Tuple) -> str:
+        return sha1(json.dumps([kind, PARSER_VERSION, content_sha1, *args]))
+
+    def get(self, key: str):
+        with self._lock:
+            row = self.db.execute(
+                "SELECT kind, data FROM records WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return decode_record(*row)
 
-        if re.match(r"^(Mana|Cooldown|Range|Charges|Cast time):", ln, flags=re.I):
-            break
+    def put(self, key: str, kind: str, value) -> None:
+        data = encode_record(value)
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO records (key, kind, version, data) VALUES (?, ?, ?, ?)",
+                (key, kind, PARSER_VERSION, data),
+            )
+            self.db.commit()
 
-        description_lines.append(ln)
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
 
-    talent_description = (
-        " ".join(description_lines).strip() if description_lines else None
-    )
-    if talent_description:
-        talent_description = re.sub(r"\s+", " ", talent_description).strip()
 
-    icon_url = pick_meta_image(soup, url) or pick_first_reasonable_img(soup, url)
+class TalentStore:
+    """
+    Talentos parseados por URL, compartidos entre corridas y entre procesos
+    (SQLite en WAL), con un LRU en memoria de a lo sumo max_items entradas.
 
-    modifies = None
-    for idx, ln in enumerate(lines):
-        if ln.strip().lower() == "modifies ability":
-            for ln2 in lines[idx + 1 : idx + 20]:
-                m = re.match(r"^(.+?)\s+\(([A-Z])\)$", ln2.strip())
-                if m:
-                    modifies = {
-                        "ability": m.group(1).strip(),
-                        "hotkey": m.group(2).strip(),
-                    }
-                    break
-            break
+    Cada registro guarda el hash del HTML del que salió y solo se reutiliza
+    mientras la copia en cache de esa página sea la misma (o si se guardó en
+    esta misma corrida). En memoria se guarda el Talent mismo: es inmutable,
+    así que cada get lo devuelve sin copiar ni volver a decodificar.
+    """
 
-    return {
-        "name": name,
-        "url": url,
-        "slug": url.rstrip("/").split("/")[-1],
-        "tier_index": tier_index,
-        "tier": tier_level,
-        "hero": owner,
-        "description": talent_description,
-        "icon_image_url": icon_url,
-        "modifies": modifies,
-    }
+    FILE = "talents.sqlite"
+    LRU_ITEMS = 512
+
+    def __init__(self, path: Optional[Path], max_items: int = LRU_ITEMS):
+        self._lock = threading.Lock()
+        self.max_items = max_items
+        self._lru: "OrderedDict[str, Tuple[str, Talent]]" = OrderedDict()
+        # URLs guardadas en esta corrida: válidas aunque no haya copia en cache
+        self._session: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self.db: Optional[sqlite3.Connection] = None
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS talents (
+                url TEXT PRIMARY KEY,
+                slug TEXT NOT NULL,
+                content_sha1 TEXT NOT NULL,
+                version TEXT NOT NULL,
+                data BLOB NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self.db.execute("DELETE FROM talents WHERE version != ?", (PARSER_VERSION,))
+        self.db.commit()
+
+    def _remember(self, url: str, item: Tuple[str, Talent]) -> None:
+        self._lru[url] = item
+        self._lru.move_to_end(url)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def get(self, url: str, content_sha1: Optional[str]) -> Optional[Talent]:
+        """content_sha1: hash del HTML vigente en cache (None si no hay copia)"""
+        with self._lock:
+            item = self._lru.get(url)
+            if item is not None:
+                self._lru.move_to_end(url)
+            elif self.db is not None:
+                row = self.db.execute(
+                    "SELECT content_sha1, data FROM talents WHERE url = ?", (url,)
+                ).fetchone()
+                if row:
+                    item = (row[0], Talent.from_dict(json.loads(zlib.decompress(row[1]))))
+                    self._remember(url, item)
+        if item is None or not (url in self._session or item[0] == content_sha1):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return item[1]
+
+    def put(self, url: str, content_sha1: str, record: Talent) -> None:
+        with self._lock:
+            self._remember(url, (content_sha1, record))
+            self._session.add(url)
+            if self.db is None:
+                return
+            self.db.execute(
+                """
+                INSERT OR REPLACE INTO talents
+                    (url, slug, content_sha1, version, data, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    url,
+                    url.rstrip("/").split("/")[-1],
+                    content_sha1,
+                    PARSER_VERSION,
+                    zlib.compress(
+                        json.dumps(
+                            record.to_dict(), ensure_ascii=False, separators=(",", ":")
+                        ).encode("utf-8")
+                    ),
+                    time.time(),
+                ),
+            )
+            self.db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self.db is not None:
+                self.db.close()
 
 
 # ----------------------------
-# Output helpers
+# Journal de crawl
 # ----------------------------
 
 
-def write_json(path: Path, data) -> None:
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+class CrawlJournal:
+    """
+    Estado persistente del crawl a nivel de URL: cada URL descubierta (lista
+    de héroes, página de habilidades, talento) con su estado, intentos, último
+    error y un puntero a su registro parseado (la clave en RecordCache).
 
+    Sin resume, el journal se vacía al empezar una corrida nueva. Con resume,
+    las URLs 'done' se sirven desde el cache de registros sin descargar ni
+    parsear, y solo se procesan las pendientes y las fallidas.
 
-def write_jsonl(path: Path, rows: List[Dict]) -> None:
-    with path.open("w", encoding="utf-8") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    Las URLs son las pedidas (las descubiertas), no el destino de un redirect.
+    El journal por defecto es uno por salida (default_path), así que dos
+    corridas simultáneas con distinto --out no se vacían el estado entre sí.
+    """
 
+    FILE_PATTERN = "crawl-*.sqlite"
+    STATUSES = ("pending", "done", "failed")
+
+    @classmethod
+    def default_path(cls, cache_dir: Path, out: str) -> Path:
+        """<cache-dir>/crawl-<hash de la ruta de salida>.sqlite"""
+        return cache_dir / f"crawl-{sha1(str(Path(out).resolve()))[:12]}.sqlite"
+
+    @classmethod
+    def latest(cls, cache_dir: Path) -> Optional[Path]:
+        """El journal usado más recientemente en el cache (para --progress sin --out)"""
+        paths = list(cache_dir.glob(cls.FILE_PATTERN)) if cache_dir.is_dir() else []
+        return max(paths, key=lambda p: p.stat().st_mtime) if paths else None
+
+    def __init__(self, path: Path, resume: bool = False):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.resume = resume
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                hero TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                result TEXT,
+                updated_at REAL
+            )
+            """
+        )
+        if not resume:
+            self.db.execute("DELETE FROM urls")
+        self.db.commit()
+
+    def discover(self, urls: List[str], kind: str, hero: Optional[str] = None) -> None:
+        """Registra URLs nuevas como 'pending' (las ya conocidas no cambian)"""
+        with self._lock:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO urls (url, kind, hero) VALUES (?, ?, ?)",
+                [(u, kind, hero) for u in urls],
+            )
+            self.db.commit()
+
+    def _finish(
+        self, url: str, status: str, error: Optional[str], result: Optional[str]
+    ) -> None:
+        with self._lock:
+            self.db.execute(
+                """
+                UPDATE urls SET attempts = attempts + (status != 'done'), status = ?,
+                    last_error = ?, result = ?, updated_at = ?
+                WHERE url = ?
+                """,
+                (status, error, result, time.time(), url),
+            )
+            self.db.commit()
+
+    def done(self, url: str, result: Optional[str] = None) -> None:
+        self._finish(url, "done", None, result)
+
+    def fail(self, url: str, error: str) -> None:
+        self._finish(url, "failed", error, None)
+
+    def result(self, url: str) -> Optional[str]:
+        """Puntero al registro de una URL terminada, si lo hay"""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT result FROM urls WHERE url = ? AND status = 'done'", (url,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def progress(self) -> Dict[str, Dict[str, int]]:
+        """{kind: {status: cantidad}}"""
+        out: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT kind, status, COUNT(*) FROM urls GROUP BY kind, status"
+            ).fetchall()
+        for kind, status, n in rows:
+            out.setdefault(kind, dict.fromkeys(self.STATUSES, 0))[status] = n
+        return out
+
+    def failed(self) -> List[Tuple[str, int, str]]:
+        with self._lock:
+            return self.db.execute(
+                "SELECT url, attempts, last_error FROM urls "
+                "WHERE status = 'failed' ORDER BY rowid"
+            ).fetchall()
+
+    def report(self) -> None:
+        print(f"[*] Journal de crawl ({self.path}):")
+        for kind, counts in self.progress().items():
+            total = sum(counts.values())
+            detail = ", ".join(f"{counts[st]} {st}" for st in self.STATUSES)
+            print(f"  {kind:<12} {total:>5} URLs: {detail}")
+        failed = self.failed()
+        for url, attempts, error in failed[:10]:
+            print(f"  - {url} ({attempts} intentos): {(error or '')[:120]}")
+        if len(failed) > 10:
+            print(f"  ... y {len(failed) - 10} más")
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
+
+
+# ----------------------------
+# Métricas
+# ----------------------------
 
-def write_talents_csv(path: Path, heroes_rows: List[Dict], mode: str = "w") -> None:
+# Límites superiores (segundos) de los buckets de latencia por fase
+PHASE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Fases que se miden con Metrics.time() / observe(). parse_pool incluye la
+# espera en la cola del ParsePool, no solo el parseo en el worker.
+PHASES = (
+    "cache_read",
+    "network",
+    "politeness",
+    "backoff",
+    "parse",
+    "parse_pool",
+    "write",
+)
+
+
+class Histogram:
+    """Histograma de latencias con buckets fijos (estilo Prometheus)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = PHASE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        i = 0
+        while i < len(self.buckets) and seconds > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Cota superior del bucket donde cae el cuantil q"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum_s": round(self.sum, 6),
+            "min_s": round(self.min, 6) if self.count else 0.0,
+            "max_s": round(self.max, 6),
+            "p50_s": self.quantile(0.5),
+            "p95_s": self.quantile(0.95),
+            "buckets": {
+                **{str(b): n for b, n in zip(self.buckets, self.counts)},
+                "+Inf": self.counts[-1],
+            },
+        }
+
+
+class Metrics:
     """
-    Escribe CSV de talentos.
-    mode: 'w' para sobrescribir, 'a' para append
+    Contadores (con etiquetas opcionales) e histogramas de latencia por fase
+    de una corrida. Thread-safe: lo usan el Fetcher, los hilos del modo
+    async y los callbacks del ParsePool.
     """
-    fieldnames = [
-        "hero_name",
-        "hero_slug",
-        "hero_role",
-        "hero_franchise",
-        "tier",
-        "tier_index",
-        "talent_name",
-        "talent_slug",
-        "talent_url",
-        "talent_icon_image_url",
-        "talent_description",
-        "modifies_ability",
-        "modifies_hotkey",
-    ]
-
-    write_header = mode == "w" or not path.exists()
 
-    with path.open(mode, encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
+    PREFIX = "heroesfire"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        # Todas las fases aparecen en el reporte, aunque no se hayan usado
+        self.phases: Dict[str, Histogram] = {name: Histogram() for name in PHASES}
+        self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def get(self, name: str, **labels: str) -> float:
+        """Valor de un contador; sin etiquetas, la suma de todas sus series"""
+        with self._lock:
+            if labels:
+                return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+            return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    def observe(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.phases.get(phase)
+            if hist is None:
+                hist = self.phases[phase] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def time(self, phase: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - t0)
+
+    def seconds(self, phase: str) -> float:
+        with self._lock:
+            hist = self.phases.get(phase)
+            return hist.sum if hist else 0.0
+
+    def summary(self) -> str:
+        """Resumen de una línea para la consola"""
+        retries = ", ".join(
+            f"{int(v)} {dict(labels).get('cause')}"
+            for (name, labels), v in sorted(self.counters.items())
+            if name == "retries"
+        )
+        return (
+            f"{int(self.get('requests'))} requests, "
+            f"{int(self.get('cache_hits'))} desde cache, "
+            f"{int(self.get('not_modified'))} 304, "
+            f"{int(self.get('retries'))} reintentos ({retries or 'ninguno'}), "
+            f"{int(self.get('failures'))} fallidos, "
+            f"{self.get('bytes_received') / 1e6:.1f} MB; "
+            f"red {self.seconds('network'):.1f}s, "
+            f"cortesía {self.seconds('politeness'):.1f}s, "
+            f"backoff {self.seconds('backoff'):.1f}s, "
+            f"parseo {self.seconds('parse'):.1f}s, "
+            f"escritura {self.seconds('write'):.1f}s"
+        )
+
+    def to_dict(self) -> Dict:
+        counters: Dict[str, Union[float, Dict[str, float]]] = {}
+        with self._lock:
+            for (name, labels), v in sorted(self.counters.items()):
+                if labels:
+                    series = counters.setdefault(name, {})
+                    series[",".join(f"{k}={val}" for k, val in labels)] = v
+                else:
+                    counters[name] = v
+            phases = {name: hist.to_dict() for name, hist in sorted(self.phases.items())}
+        return {"counters": counters, "phases": phases}
+
+    def write_report(self, path: Path, **extra) -> None:
+        """Reporte JSON de la corrida (extra: datos de main como args y totales)"""
+        finished = time.time()
+        report = {
+            "started_at": self.started_at,
+            "finished_at": finished,
+            "wall_s": round(finished - self.started_at, 3),
+            **extra,
+            **self.to_dict(),
+        }
+        _write_atomic(path, json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+
+    def write_prometheus(self, path: Path) -> None:
+        """Textfile para el textfile collector de node_exporter"""
+        p = self.PREFIX
+        out: List[str] = []
+        with self._lock:
+            names = sorted({name for name, _ in self.counters})
+            for name in names:
+                out.append(f"# TYPE {p}_{name}_total counter")
+                for (n, labels), v in sorted(self.counters.items()):
+                    if n == name:
+                        out.append(f"{p}_{name}_total{_prom_labels(labels)} {_prom_value(v)}")
+            out.append(f"# TYPE {p}_phase_seconds histogram")
+            for phase, hist in sorted(self.phases.items()):
+                cumulative = 0
+                for bound, n in zip(hist.buckets, hist.counts):
+                    cumulative += n
+                    labels = (("le", f"{bound:g}"), ("phase", phase))
+                    out.append(f"{p}_phase_seconds_bucket{_prom_labels(labels)} {cumulative}")
+                labels = (("le", "+Inf"), ("phase", phase))
+                out.append(f"{p}_phase_seconds_bucket{_prom_labels(labels)} {hist.count}")
+                out.append(f'{p}_phase_seconds_sum{{phase="{phase}"}} {hist.sum:.6f}')
+                out.append(f'{p}_phase_seconds_count{{phase="{phase}"}} {hist.count}')
+        out.append(f"# TYPE {p}_run_timestamp_seconds gauge")
+        out.append(f"{p}_run_timestamp_seconds {time.time():.0f}")
+        _write_atomic(path, "\n".join(out) + "\n")
+
+
+def _prom_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _prom_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def _write_atomic(path: Path, data: Union[str, bytes]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Temporal único por proceso e hilo: dos escritores del mismo archivo
+    # (p.ej. workers que comparten el cache) no se pisan el .tmp
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    if isinstance(data, bytes):
+        tmp.write_bytes(data)
+    else:
+        tmp.write_text(data, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# ----------------------------
+# Ritmo adaptativo (AIMD)
+# ----------------------------
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Segundos que pide esperar un header Retry-After (delta o fecha HTTP)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, when.timestamp() - time.time())
+
+
+class AdaptiveRate:
+    """
+    Control de ritmo AIMD compartido por todos los requests de un Fetcher.
+
+    Cada respuesta sana sube el ritmo en INCREASE * max_rps y la ventana de
+    requests en vuelo en ~1 por ventana completa (suba aditiva). Un 429,
+    5xx, timeout o bot wall multiplica ambos por DECREASE, y una latencia
+    sostenida muy por encima de la de base por SLOW_DECREASE (baja
+    multiplicativa). Las fallas de una misma ráfaga cuentan como un solo
+    recorte. Un Retry-After bloquea todos los turnos hasta que vence.
+
+    Nunca supera max_rps ni max_concurrency; arranca en max_rps / 4 con un
+    solo request en vuelo.
+    """
+
+    # Suba por respuesta sana, como fracción del techo: ~100 respuestas de
+    # piso a techo
+    INCREASE = 0.01
+    DECREASE = 0.5
+    SLOW_DECREASE = 0.8
+    # Piso: un request cada 20s
+    MIN_RPS = 0.05
+    # Los intervalos se estiran al azar hasta un 30%, nunca se acortan
+    JITTER = 0.3
+    # Latencia "alta": SLOW_FACTOR veces la de base, y al menos SLOW_MIN_S
+    SLOW_FACTOR = 4.0
+    SLOW_MIN_S = 1.0
+    # Causas de reintento que indican sobrecarga (un 404 no baja el ritmo)
+    CONGESTION = ("429", "5xx", "bot_wall", "timeout")
+
+    def __init__(
+        self, max_rps: float, max_concurrency: int = 1, metrics: Optional[Metrics] = None
+    ):
+        self.max_rps = max(self.MIN_RPS, max_rps)
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate = max(self.MIN_RPS, self.max_rps / 4)
+        self.window = 1.0
+        self.metrics = metrics
+        self.cuts = 0
+        self._next_slot = 0.0
+        self._blocked_until = 0.0
+        self._last_cut = 0.0
+        # Media móvil de la latencia y su mínimo (latencia de base)
+        self._latency: Optional[float] = None
+        self._base_latency: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """Requests en vuelo permitidos ahora"""
+        return int(self.window)
+
+    def reserve(self) -> float:
+        """Reserva el próximo turno; devuelve los segundos a esperar"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._blocked_until)
+            self._next_slot = slot + random.uniform(1.0, 1.0 + self.JITTER) / self.rate
+        return slot - now
+
+    def blocked_for(self) -> float:
+        """Segundos que faltan para que venza el último Retry-After"""
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    def on_success(self, latency: float) -> None:
+        with self._lock:
+            if self._latency is None:
+                self._latency = latency
+            else:
+                self._latency = 0.8 * self._latency + 0.2 * latency
+            if self._base_latency is None or self._latency < self._base_latency:
+                self._base_latency = self._latency
+            if self._latency > max(self.SLOW_MIN_S, self.SLOW_FACTOR * self._base_latency):
+                self._cut("latency", self.SLOW_DECREASE)
+                return
+            self.rate = min(self.max_rps, self.rate + self.INCREASE * self.max_rps)
+            self.window = min(self.max_concurrency, self.window + 1.0 / self.window)
+
+    def on_failure(self, cause: str, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            if retry_after:
+                self._blocked_until = max(
+                    self._blocked_until, time.monotonic() + retry_after
+                )
+            if cause in self.CONGESTION:
+                self._cut(cause, self.DECREASE)
+
+    def _cut(self, cause: str, factor: float) -> None:
+        # Un recorte por "vuelta" de la ventana: los requests que ya estaban
+        # en vuelo cuando empezó la sobrecarga no vuelven a recortar
+        now = time.monotonic()
+        if now - self._last_cut < max(1.0, self.window / self.rate):
+            return
+        self._last_cut = now
+        self.rate = max(self.MIN_RPS, self.rate * factor)
+        self.window = max(1.0, self.window * factor)
+        self.cuts += 1
+        if self.metrics:
+            self.metrics.inc("rate_cuts", cause=cause)
+        log(
+            f"  [ritmo] {cause}: bajando a {self.rate:.2f} req/s, "
+            f"{self.limit} en vuelo",
+            1,
+        )
+
+    def summary(self) -> str:
+        return (
+            f"{self.rate:.2f} req/s (techo {self.max_rps:g}), "
+            f"{self.limit}/{self.max_concurrency} en vuelo, {self.cuts} recortes"
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "rate": round(self.rate, 3),
+            "max_rps": self.max_rps,
+            "window": self.limit,
+            "max_concurrency": self.max_concurrency,
+            "cuts": self.cuts,
+            "latency_ewma": self._latency,
+            "base_latency": self._base_latency,
+        }
+
+
+# ----------------------------
+# Transportes HTTP
+# ----------------------------
+
+# Headers de conexión de HTTP/1.1 que HTTP/2 prohíbe (RFC 9113 §8.2.2)
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"}
+
+TRANSPORTS = ("requests", "http2")
+
+
+class RequestsTransport:
+    """
+    HTTP/1.1 con requests: una sesión por hilo (requests.Session no es
+    thread-safe) con una conexión keep-alive por host. En modo async cada
+    request en vuelo ocupa un hilo de un pool propio de max_connections hilos,
+    que es el tope de conexiones (el executor por defecto de asyncio tiene
+    min(32, CPUs + 4) hilos y recortaba --concurrency en silencio).
+    """
+
+    name = "requests"
+
+    def __init__(self, max_connections: int):
+        self.max_connections = max(1, max_connections)
+        self._local = threading.local()
+        self._sessions: List["requests.Session"] = []
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _session(self) -> "requests.Session":
+        sess = getattr(self._local, "sess", None)
+        if sess is None:
+            import requests
+
+            sess = requests.Session()
+            # Un hilo hace un request por vez: nunca usa más de una conexión por host
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=1)
+            sess.mount("https://", adapter)
+            sess.mount("http://", adapter)
+            self._local.sess = sess
+            with self._lock:
+                self._sessions.append(sess)
+        return sess
+
+    def get(self, url: str, headers: Dict[str, str], timeout: float) -> "requests.Response":
+        return self._session().get(
+            url, headers=headers, timeout=timeout, allow_redirects=True
+        )
+
+    async def aget(
+        self, url: str, headers: Dict[str, str], timeout: float
+    ) -> "requests.Response":
+        import asyncio
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_connections, thread_name_prefix="hf-http"
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.get, url, headers, timeout)
+
+    def close(self) -> None:
+        with self._lock:
+            for sess in self._sessions:
+                sess.close()
+            self._sessions.clear()
+
+    async def aclose(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def _import_httpx():
+    try:
+        import h2  # noqa: F401  (httpx lo necesita para http2=True)
+        import httpx
+    except ImportError:
+        return None
+    return httpx
+
+
+def check_http2() -> None:
+    """Falla temprano si se pide --transport http2 sin httpx[http2] instalado"""
+    if _import_httpx() is None:
+        raise SystemExit(
+            "[!] --transport http2 requiere instalar el paquete: pip install 'httpx[http2]'"
+        )
+
+
+class HttpxResponse:
+    """
+    Respuesta de httpx con la interfaz de requests.Response que usa el
+    Fetcher: url como str, el texto decodificado con la misma regla de
+    charset que requests y raise_for_status() con sus excepciones.
+    """
+
+    __slots__ = (
+        "_resp",
+        "status_code",
+        "headers",
+        "content",
+        "elapsed",
+        "url",
+        "wire_bytes",
+    )
+
+    def __init__(self, resp):
+        self._resp = resp
+        self.status_code: int = resp.status_code
+        self.headers = resp.headers
+        self.content: bytes = resp.content
+        self.elapsed = resp.elapsed
+        self.url = str(resp.url)
+        # Bytes recibidos por la red (antes de descomprimir gzip/br)
+        self.wire_bytes: int = resp.num_bytes_downloaded
+
+    @property
+    def text(self) -> str:
+        import requests
+
+        # requests usa ISO-8859-1 para text/* sin charset; si no hay ninguno
+        # queda el que detecte httpx
+        encoding = requests.utils.get_encoding_from_headers(self.headers)
+        if encoding:
+            try:
+                return self.content.decode(encoding, errors="replace")
+            except LookupError:
+                pass
+        return self._resp.text
+
+    def raise_for_status(self) -> None:
+        import requests
+
+        if 400 <= self.status_code < 600:
+            kind = "Client" if self.status_code < 500 else "Server"
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} {kind} Error: {self._resp.reason_phrase} for url: {self.url}"
+            )
+
+
+def _wire_size(resp) -> int:
+    """
+    Bytes transferidos de una respuesta, no el cuerpo ya descomprimido:
+    wire_bytes en httpx, lo leído del socket por urllib3 en requests y, si
+    no se sabe, Content-Length o el largo del contenido.
+    """
+    size = getattr(resp, "wire_bytes", None)
+    if size is None:
+        try:
+            size = resp.raw.tell()
+        except (AttributeError, OSError, ValueError):
+            size = None
+    if not size:
+        try:
+            size = int(resp.headers.get("Content-Length") or 0)
+        except ValueError:
+            size = 0
+    return size or len(resp.content)
+
+
+class Http2Transport:
+    """
+    HTTP/2 con httpx: los requests a un mismo host van multiplexados como
+    streams de una sola conexión en lugar de abrir una por request en vuelo.
+    max_connections acota el pool completo (una conexión por host basta).
+
+    Sobre https el protocolo se negocia por ALPN (con HTTP/1.1 de respaldo);
+    sobre http, p.ej. el servidor local, se habla HTTP/2 directo (h2c con
+    prior knowledge), que es lo único que httpx soporta sin TLS.
+
+    Los errores de httpx se traducen a las excepciones de requests para que
+    los reintentos del Fetcher no cambien.
+    """
+
+    name = "http2"
+
+    def __init__(self, max_connections: int, base_url: Optional[str] = None):
+        self.httpx = _import_httpx()
+        self.max_connections = max(1, max_connections)
+        self.http1 = (base_url or BASE).startswith("https://")
+        self._client = None
+        self._aclient = None
+
+    def _options(self) -> Dict:
+        httpx = self.httpx
+        return {
+            "http2": True,
+            "http1": self.http1,
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            "follow_redirects": True,
+        }
+
+    @staticmethod
+    def _headers(headers: Dict[str, str]) -> Dict[str, str]:
+        return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+    @contextmanager
+    def _translate_errors(self):
+        import requests
+
+        httpx = self.httpx
+        try:
+            yield
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e) or type(e).__name__) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e) or type(e).__name__) from e
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(str(e) or type(e).__name__) from e
+
+    def get(self, url: str, headers: Dict[str, str], timeout: float) -> HttpxResponse:
+        if self._client is None:
+            self._client = self.httpx.Client(**self._options())
+        with self._translate_errors():
+            resp = self._client.get(url, headers=self._headers(headers), timeout=timeout)
+        return HttpxResponse(resp)
+
+    async def aget(self, url: str, headers: Dict[str, str], timeout: float) -> HttpxResponse:
+        # El cliente async queda atado al loop que lo crea: se cierra con
+        # aclose() antes de que termine asyncio.run (ver AsyncFetcher.closing)
+        if self._aclient is None:
+            self._aclient = self.httpx.AsyncClient(**self._options())
+        with self._translate_errors():
+            resp = await self._aclient.get(url, headers=self._headers(headers), timeout=timeout)
+        return HttpxResponse(resp)
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+
+def make_transport(
+    name: str, max_connections: int = 0, concurrency: int = 1, base_url: Optional[str] = None
+):
+    """
+    Transporte HTTP del Fetcher según --transport. Sin max_connections, requests
+    abre una conexión por request en vuelo y http2 una por host (hasta 4).
+    """
+    if name == "http2":
+        check_http2()
+        return Http2Transport(max_connections or 4, base_url)
+    return RequestsTransport(max_connections or concurrency)
+
+
+# ----------------------------
+# Fetcher mejorado
+# ----------------------------
+
+
+class CacheMiss(RuntimeError):
+    """Con --offline, una página que no está en el cache ni en el pack"""
+
+
+class ClientError(RuntimeError):
+    """Respuesta 4xx (salvo 429): reintentar no la arregla, falla de una"""
+
+
+@dataclass
+class Fetcher:
+    min_sleep: float
+    max_sleep: float
+    timeout: float
+    cache_dir: Optional[Path]
+    no_cache: bool
+    max_retries: int = 5
+    cache_compression: str = "auto"
+    cache_max_bytes: int = 0
+    # Segundos que una copia en cache se considera vigente (None = siempre)
+    max_age: Optional[float] = None
+    # Revalidar copias vencidas con If-None-Match / If-Modified-Since
+    revalidate: bool = False
+    # Techo de req/s del ritmo adaptativo (0 = sleeps fijos de min/max_sleep)
+    adaptive_rps: float = 0.0
+    # Métricas compartidas con otro Fetcher (p.ej. el de imágenes)
+    metrics: Optional[Metrics] = None
+    # Pack de solo lectura que se consulta después del cache en disco
+    cache_pack: Optional[Path] = None
+    # Nunca ir a la red: un miss falla enseguida (CacheMiss)
+    offline: bool = False
+    # Transporte HTTP (TRANSPORTS) y tamaño de su pool de conexiones
+    # (0 = una por request en vuelo con requests, hasta 4 hosts con http2)
+    transport: str = "requests"
+    max_connections: int = 0
+
+    def __post_init__(self):
+        self.headers: Dict[str, str] = {}
+        self.http = make_transport(
+            self.transport, self.max_connections, getattr(self, "concurrency", 1)
+        )
+        self._update_headers()
+        self.request_count = 0
+        if self.metrics is None:
+            self.metrics = Metrics()
+        self.pacer: Optional[AdaptiveRate] = None
+        if self.adaptive_rps > 0:
+            self.pacer = AdaptiveRate(
+                self.adaptive_rps, getattr(self, "concurrency", 1), self.metrics
+            )
+        self.cache: Optional[HtmlCache] = None
+        if self.cache_dir and not self.no_cache:
+            self.cache = HtmlCache(
+                self.cache_dir,
+                compression=self.cache_compression,
+                max_bytes=self.cache_max_bytes,
+            )
+        self.pack: Optional[CachePack] = CachePack(self.cache_pack) if self.cache_pack else None
+
+    def _cached(
+        self, url: str
+    ) -> Tuple[Optional[Union[HtmlCache, CachePack]], Optional[CacheEntry]]:
+        """Copia de una URL: primero la del cache en disco, después la del pack"""
+        for store in (self.cache, self.pack):
+            if store is not None:
+                entry = store.entry(url)
+                if entry is not None:
+                    return store, entry
+        return None, None
+
+    def _update_headers(self):
+        """Actualiza headers con UA aleatorio y headers más completos"""
+        self.headers.update(
+            {
+                "User-Agent": random.choice(USER_AGENTS),
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.9,es;q=0.8",
+                "Accept-Encoding": "gzip, deflate, br",
+                "DNT": "1",
+                "Connection": "keep-alive",
+                "Upgrade-Insecure-Requests": "1",
+                "Sec-Fetch-Dest": "document",
+                "Sec-Fetch-Mode": "navigate",
+                "Sec-Fetch-Site": "none",
+                "Sec-Fetch-User": "?1",
+                "Cache-Control": "max-age=0",
+            }
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        """Espera exponencial antes de un reintento (0 en el primer intento)"""
+        # Con ritmo adaptativo el recorte de ritmo reemplaza al backoff fijo
+        if attempt <= 1 or self.pacer:
+            return 0.0
+        backoff = min(15.0, 1.5 * (2 ** (attempt - 2)))
+        log(f"  [retry {attempt}/{self.max_retries}] esperando {backoff:.1f}s...", 1)
+        return backoff
+
+    def _retry_wait(self, resp: "requests.Response", attempt: int) -> Optional[float]:
+        """
+        Espera antes de reintentar un 429 / 5xx, o None si la respuesta no es
+        de ese tipo. Retry-After se respeta siempre: con ritmo adaptativo
+        bloquea todos los turnos, si no es el mínimo a esperar.
+        """
+        if resp.status_code == 429:
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            self._failed_attempt("429", attempt, retry_after)
+            if self.pacer:
+                log(f"  [429] Rate limit (Retry-After: {retry_after})", 1)
+                return 0.0
+            wait_time = max(retry_after or 0.0, random.uniform(5, 10))
+            log(f"  [429] Rate limit - esperando {wait_time:.1f}s...", 1)
+            return wait_time
+
+        if resp.status_code in (500, 502, 503, 504):
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            self._failed_attempt("5xx", attempt, retry_after)
+            log(f"  [{resp.status_code}] Error del servidor", 1)
+            return 0.0 if self.pacer else retry_after or 0.0
+
+        return None
+
+    def _check_response(
+        self, resp: "requests.Response", attempt: int, url: str
+    ) -> Tuple[Optional[ParsedPage], float]:
+        """
+        Evalúa una respuesta HTTP.
+        Devuelve (página, 0) si es válida, o (None, espera) si hay que reintentar.
+        """
+        # Revalidación: la copia en cache sigue vigente
+        if resp.status_code == 304:
+            return self._not_modified(resp, url), 0.0
+
+        # Manejo de status codes
+        wait_time = self._retry_wait(resp, attempt)
+        if wait_time is not None:
+            return None, wait_time
+
+        if 400 <= resp.status_code < 500:
+            raise ClientError(f"HTTP {resp.status_code} en {url}")
+        resp.raise_for_status()
+        self.metrics.inc("bytes_received", _wire_size(resp))
+        html = resp.text
+        page = new_page(html, resp.url)
+
+        # Detecta bot wall de forma más inteligente
+        if looks_like_bot_wall(html):
+            # Verifica si es un bloqueo real buscando contenido válido
+            # (el soup queda en la página y lo reutilizan los parsers, por eso
+            # cuenta como parseo)
+            with self.metrics.time("parse"):
+                has_real_content = page.has_real_content()
+
+            if not has_real_content or len(html) < 30_000:
+                self.metrics.inc("bot_walls")
+                self._failed_attempt("bot_wall", attempt)
+                log(
+                    f"  [!] Bot wall REAL detectado (len={len(html)}, content={has_real_content})",
+                    1,
+                )
+                # Cambiar IP/UA y esperar más
+                self._update_headers()
+                wait_time = random.uniform(5, 10) * attempt
+                log(f"  [!] Rotando headers y esperando {wait_time:.1f}s...", 1)
+                return None, wait_time
+            else:
+                # Página con contenido real pero tiene el texto del bot wall como parte del sitio
+                log(f"  [ok] Bot wall phrase presente pero contenido válido detectado")
+
+        if self.pacer:
+            self.pacer.on_success(resp.elapsed.total_seconds())
+        return page, 0.0
+
+    def _is_stale(self, entry: CacheEntry) -> bool:
+        if self.offline:
+            # Sin red no hay con qué reemplazarla: se sirve aunque esté vencida
+            return False
+        if self.max_age is None:
+            return self.revalidate
+        return time.time() - entry.fetched_at > self.max_age
+
+    def cached_sha1(self, url: str) -> Optional[str]:
+        """
+        Hash del HTML que get_page serviría desde el cache sin ir a la red, o
+        None si la URL no está en cache o está vencida.
+        """
+        store, entry = self._cached(url)
+        if entry is None or self._is_stale(entry):
+            return None
+        if entry.content_sha1:
+            return entry.content_sha1
+        # Layout plano: el hash no está en el manifest, se calcula del archivo
+        html = store.get(url)
+        if html is None:
+            return None
+        return hashlib.sha1(html.encode("utf-8", errors="ignore")).hexdigest()
+
+    def _read_cache(self, url: str) -> Tuple[Optional[str], Dict[str, str]]:
+        """
+        Devuelve (html, {}) si hay una copia vigente en cache, o (None, headers)
+        si hay que ir a la red. Con --revalidate, los headers son los
+        condicionales (If-None-Match / If-Modified-Since) de la copia vencida.
+        """
+        if not (self.cache or self.pack):
+            return None, {}
+        store, entry = self._cached(url)
+        if entry is None:
+            self.metrics.inc("cache_misses")
+            return None, {}
+
+        if not self._is_stale(entry):
+            with self.metrics.time("cache_read"):
+                html = store.get(url)
+            if html is not None:
+                self.metrics.inc("cache_hits")
+                log(f"  [cache] {url}")
+            else:
+                self.metrics.inc("cache_misses")
+            return html, {}
+
+        self.metrics.inc("cache_misses")
+        conditional: Dict[str, str] = {}
+        if self.revalidate:
+            if entry.etag:
+                conditional["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                conditional["If-Modified-Since"] = entry.last_modified
+        return None, conditional
+
+    def _not_modified(self, resp: "requests.Response", url: str) -> ParsedPage:
+        """Página de un 304: la copia en cache, marcada como recién validada"""
+        store, _ = self._cached(url)
+        html = store.get(url) if store else None
+        if html is None:
+            raise RuntimeError("304 sin copia en cache")
+        if store is self.cache:
+            self.cache.touch(url)
+        self.metrics.inc("not_modified")
+        if self.pacer:
+            self.pacer.on_success(resp.elapsed.total_seconds())
+        log(f"  [304] {url}")
+        return new_page(html, url)
+
+    def _write_cache(self, url: str, html: str, resp: "requests.Response") -> None:
+        if self.cache:
+            self.cache.put(
+                url,
+                html,
+                etag=resp.headers.get("ETag"),
+                last_modified=resp.headers.get("Last-Modified"),
+            )
+
+    def _sleep(self, seconds: float) -> None:
+        """Espera de backoff / reintento"""
+        time.sleep(seconds)
+        self.metrics.observe("backoff", seconds)
+
+    def _failed_attempt(
+        self, cause: str, attempt: int, retry_after: Optional[float] = None
+    ) -> None:
+        # Solo cuenta como reintento si queda otro intento
+        if attempt < self.max_retries:
+            self.metrics.inc("retries", cause=cause)
+        else:
+            self.metrics.inc("failures", cause=cause)
+        if self.pacer:
+            self.pacer.on_failure(cause, retry_after)
+
+    def _pace(self) -> None:
+        """Espera el turno del ritmo adaptativo (y cualquier Retry-After vigente)"""
+        with self.metrics.time("politeness"):
+            delay = self.pacer.reserve()
+            while delay > 0:
+                time.sleep(delay)
+                delay = self.pacer.blocked_for()
+
+    def _next_request(self) -> None:
+        # Rotar UA cada 10 requests
+        self.request_count += 1
+        if self.request_count % 10 == 0:
+            self._update_headers()
+
+    def _offline_miss(self, url: str) -> CacheMiss:
+        self.metrics.inc("failures", cause="offline")
+        return CacheMiss(f"--offline: {url} no está en cache")
+
+    def _give_up(self, url: str, last_err: Optional[Exception]) -> RuntimeError:
+        return RuntimeError(
+            f"Fallo al descargar {url} después de {self.max_retries} intentos: {last_err}"
+        )
+
+    def close(self) -> None:
+        """Cierra las conexiones del transporte"""
+        self.http.close()
+
+    def get(self, url: str) -> str:
+        return self.get_page(url).html
+
+    def get_page(self, url: str) -> ParsedPage:
+        # Intenta cache primero
+        cached, conditional = self._read_cache(url)
+        if cached is not None:
+            return new_page(cached, url)
+        if self.offline:
+            raise self._offline_miss(url)
+
+        # Recién acá hace falta requests (sus excepciones): con todo en cache
+        # o --offline no se importa
+        import requests
+
+        self._next_request()
+
+        last_err = None
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                # Delay antes del request (excepto primer intento)
+                backoff = self._backoff(attempt)
+                if backoff:
+                    self._sleep(backoff)
+                if self.pacer:
+                    self._pace()
+
+                # Request
+                self.metrics.inc("requests")
+                with self.metrics.time("network"):
+                    resp = self.http.get(
+                        url, {**self.headers, **conditional}, self.timeout
+                    )
+
+                page, wait_time = self._check_response(resp, attempt, url)
+                if page is None:
+                    if wait_time:
+                        self._sleep(wait_time)
+                    continue
+
+                # 304: hit de cache, sin cuerpo ni sleep de cortesía
+                if resp.status_code == 304:
+                    return page
+
+                # Éxito - guardar en cache
+                self._write_cache(url, page.html, resp)
+
+                # Delay cortés antes del siguiente request (con ritmo
+                # adaptativo, el turno se espera antes de cada request)
+                if not self.pacer:
+                    slept = sleep_human(self.min_sleep, self.max_sleep)
+                    if slept:
+                        self.metrics.observe("politeness", slept)
+                return page
+
+            except ClientError:
+                self._failed_attempt("error", self.max_retries)
+                raise
+
+            except requests.exceptions.Timeout as e:
+                last_err = e
+                self._failed_attempt("timeout", attempt)
+                log(f"  [timeout] Intento {attempt}/{self.max_retries}", 1)
+
+            except requests.exceptions.RequestException as e:
+                last_err = e
+                self._failed_attempt("error", attempt)
+                log(f"  [error] {type(e).__name__}: {e}", 1)
+
+            except Exception as e:
+                last_err = e
+                self._failed_attempt("error", attempt)
+                log(f"  [error inesperado] {e}", 1)
+
+        # Todos los intentos fallaron
+        raise self._give_up(url, last_err)
+
+
+# ----------------------------
+# Fetcher asíncrono (modo --concurrency)
+# ----------------------------
+
+
+class RateBudget:
+    """
+    Presupuesto de requests/segundo compartido por todos los requests en vuelo.
+
+    En lugar de dormir después de cada request, cada request reserva un turno:
+    los turnos quedan separados por un intervalo aleatorio en [min_s, max_s],
+    así que el ritmo agregado es ~1 / media(min_s, max_s) req/s sin importar
+    cuántos requests haya en paralelo.
+    """
+
+    def __init__(self, min_s: float, max_s: float):
+        import asyncio
+
+        self.min_s = max(0.0, min_s)
+        self.max_s = max(self.min_s, max_s)
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def requests_per_second(self) -> float:
+        mean = (self.min_s + self.max_s) / 2
+        return 1.0 / mean if mean > 0 else float("inf")
+
+    async def acquire(self) -> Optional[Tuple[float, float]]:
+        """Espera el turno; devuelve la reserva (turno, intervalo) para refund"""
+        import asyncio
+
+        if self.max_s <= 0:
+            return None
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            interval = random.uniform(self.min_s, self.max_s)
+            self._next_slot = slot + interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return slot, interval
+
+    async def refund(self, reservation: Tuple[float, float]) -> None:
+        """
+        Devuelve un turno que no consumió presupuesto (p.ej. un 304), solo si
+        sigue siendo la última reserva: si otro request ya reservó el turno
+        siguiente, el próximo quedaría encima de ese.
+        """
+        slot, interval = reservation
+        async with self._lock:
+            if self._next_slot == slot + interval:
+                self._next_slot = max(time.monotonic(), slot)
+
+
+@dataclass
+class AsyncFetcher(Fetcher):
+    """
+    Variante concurrente de Fetcher: misma cache, reintentos y detección de bot wall,
+    pero con hasta `concurrency` requests en vuelo y un RateBudget compartido
+    en lugar de sleep_human por request. Con adaptive_rps, el AdaptiveRate
+    reemplaza al RateBudget y `concurrency` pasa a ser el techo de su ventana.
+    """
+
+    concurrency: int = 4
+
+    def __post_init__(self):
+        import asyncio
+
+        super().__post_init__()
+        self.budget = RateBudget(self.min_sleep, self.max_sleep)
+        self._sem = asyncio.Semaphore(max(1, self.concurrency))
+        self._window = asyncio.Condition()
+        self._inflight = 0
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Lugar para un request en vuelo: fijo, o la ventana del AdaptiveRate"""
+        if not self.pacer:
+            async with self._sem:
+                yield
+            return
+        async with self._window:
+            await self._window.wait_for(lambda: self._inflight < self.pacer.limit)
+            self._inflight += 1
+        try:
+            yield
+        finally:
+            async with self._window:
+                self._inflight -= 1
+                self._window.notify_all()
+
+    async def closing(self, coro):
+        """
+        Corre coro y cierra el cliente async del transporte en el mismo loop
+        (asyncio.run(fetcher.closing(...)))
+        """
+        try:
+            return await coro
+        finally:
+            await self.http.aclose()
+
+    def _failed_attempt(
+        self, cause: str, attempt: int, retry_after: Optional[float] = None
+    ) -> None:
+        super()._failed_attempt(cause, attempt, retry_after)
+        # Con la cola compartida, un Retry-After frena a todos los workers
+        if retry_after and isinstance(self.budget, SharedRateBudget):
+            self.budget.defer(retry_after)
+
+    async def _asleep(self, seconds: float) -> None:
+        import asyncio
+
+        await asyncio.sleep(seconds)
+        self.metrics.observe("backoff", seconds)
+
+    async def _apace(self) -> Optional[Tuple[float, float]]:
+        """Turno del request: AdaptiveRate o RateBudget (devuelve su reserva, si hay)"""
+        import asyncio
+
+        with self.metrics.time("politeness"):
+            if not self.pacer:
+                return await self.budget.acquire()
+            delay = self.pacer.reserve()
+            # Un Retry-After que llegó mientras se esperaba corre el turno
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self.pacer.blocked_for()
+        return None
+
+    async def aget(self, url: str) -> str:
+        return (await self.aget_page(url)).html
+
+    async def aget_page(self, url: str) -> ParsedPage:
+        import asyncio
+
+        # El cache (descompresión, SQLite, evicción) corre fuera del event loop:
+        # si no, frena los requests en vuelo y los turnos del RateBudget
+        cached, conditional = await asyncio.to_thread(self._read_cache, url)
+        if cached is not None:
+            return new_page(cached, url)
+        if self.offline:
+            raise self._offline_miss(url)
+
+        import requests
+
+        self._next_request()
+
+        last_err = None
+        async with self._slot():
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    backoff = self._backoff(attempt)
+                    if backoff:
+                        await self._asleep(backoff)
+
+                    reservation = await self._apace()
+
+                    self.metrics.inc("requests")
+                    with self.metrics.time("network"):
+                        resp = await self.http.aget(
+                            url, {**self.headers, **conditional}, self.timeout
+                        )
+
+                    if resp.status_code == 304:
+                        page = await asyncio.to_thread(self._not_modified, resp, url)
+                        if reservation:
+                            await self.budget.refund(reservation)
+                        return page
+
+                    page, wait_time = self._check_response(resp, attempt, url)
+                    if page is None:
+                        if wait_time:
+                            await self._asleep(wait_time)
+                        continue
+
+                    await asyncio.to_thread(self._write_cache, url, page.html, resp)
+                    return page
+
+                except ClientError:
+                    self._failed_attempt("error", self.max_retries)
+                    raise
+
+                except requests.exceptions.Timeout as e:
+                    last_err = e
+                    self._failed_attempt("timeout", attempt)
+                    log(f"  [timeout] Intento {attempt}/{self.max_retries}", 1)
+
+                except requests.exceptions.RequestException as e:
+                    last_err = e
+                    self._failed_attempt("error", attempt)
+                    log(f"  [error] {type(e).__name__}: {e}", 1)
+
+                except Exception as e:
+                    last_err = e
+                    self._failed_attempt("error", attempt)
+                    log(f"  [error inesperado] {e}", 1)
+
+        raise self._give_up(url, last_err)
+
+    async def aget_bytes(
+        self, url: str, conditional: Optional[Dict[str, str]] = None
+    ) -> Optional[Tuple[bytes, Mapping[str, str]]]:
+        """
+        Descarga binaria (imágenes) con los mismos reintentos, ritmo y
+        métricas que aget_page, sin cache HTML ni detección de bot wall.
+        Devuelve (bytes, headers), o None si el servidor responde 304.
+        Un 4xx (salvo 429) falla sin reintentar.
+        """
+        import requests
+
+        self._next_request()
+
+        last_err = None
+        fatal: Optional[Exception] = None
+        async with self._slot():
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    backoff = self._backoff(attempt)
+                    if backoff:
+                        await self._asleep(backoff)
+
+                    reservation = await self._apace()
+
+                    self.metrics.inc("requests")
+                    with self.metrics.time("network"):
+                        resp = await self.http.aget(
+                            url, {**self.headers, **(conditional or {})}, self.timeout
+                        )
+
+                    if resp.status_code == 304:
+                        if reservation:
+                            await self.budget.refund(reservation)
+                        self.metrics.inc("not_modified")
+                        return None
+
+                    wait_time = self._retry_wait(resp, attempt)
+                    if wait_time is not None:
+                        if wait_time:
+                            await self._asleep(wait_time)
+                        continue
+
+                    if 400 <= resp.status_code < 500:
+                        # Reintentar no arregla un 404
+                        self._failed_attempt("error", self.max_retries)
+                        fatal = RuntimeError(f"HTTP {resp.status_code} en {url}")
+                        break
+                    resp.raise_for_status()
+                    content_type = resp.headers.get("Content-Type", "")
+                    if not content_type.startswith("image/"):
+                        # Tampoco se arregla reintentando (una página en lugar de la imagen)
+                        self._failed_attempt("error", self.max_retries)
+                        fatal = RuntimeError(f"Content-Type inesperado en {url}: {content_type}")
+                        break
+
+                    self.metrics.inc("bytes_received", _wire_size(resp))
+                    if self.pacer:
+                        self.pacer.on_success(resp.elapsed.total_seconds())
+                    return resp.content, resp.headers
+
+                except requests.exceptions.Timeout as e:
+                    last_err = e
+                    self._failed_attempt("timeout", attempt)
+                    log(f"  [timeout] Intento {attempt}/{self.max_retries}", 1)
+
+                except requests.exceptions.RequestException as e:
+                    last_err = e
+                    self._failed_attempt("error", attempt)
+                    log(f"  [error] {type(e).__name__}: {e}", 1)
+
+                except Exception as e:
+                    last_err = e
+                    self._failed_attempt("error", attempt)
+                    log(f"  [error inesperado] {e}", 1)
+
+        if fatal:
+            raise fatal
+        raise self._give_up(url, last_err)
+
+
+# ----------------------------
+# Heroes list parsing
+# ----------------------------
+
+
+def parse_heroes_list(html: Union[str, ParsedPage]) -> List[Tuple[str, str]]:
+    page = as_page(html)
+    heroes: Dict[str, str] = {}
+
+    for href in page.hrefs("/hots/wiki/heroes/"):
+        if href.rstrip("/") == "/hots/wiki/heroes":
+            continue
+        if any(x in href for x in ("/abilities-talents", "/guides", "/discussion")):
+            continue
+
+        slug = href.rstrip("/").split("/")[-1]
+        url = urljoin(BASE, href)
+        heroes[slug] = url
+
+    return sorted(
+        [(slug, url) for slug, url in heroes.items()], key=lambda x: x[0].lower()
+    )
+
+
+def build_abilities_talents_url(hero_url: str) -> str:
+    return hero_url.rstrip("/") + "/abilities-talents"
+
+
+# ----------------------------
+# Hero meta parsing
+# ----------------------------
+
+HERO_LABELS = ("Title", "Role", "Franchise", "Price")
+HERO_LABEL_RES = {
+    label: re.compile(rf"\b{re.escape(label)}:\s*(.+)$", flags=re.I)
+    for label in HERO_LABELS
+}
+HERO_H1_RE = re.compile(r"^(.*?)\s+Abilities\s*&\s*Talents", flags=re.I)
+HERO_STAT_RE = re.compile(r"^([A-Za-z .'/\-]+)\s+(.+)$")
+HERO_STATS_END = ("Builds & Guides", "Abilities & Talents", "Discussion")
+
+
+def _scan_hero_lines(
+    lines: List[str],
+) -> Tuple[Dict[str, Optional[str]], Dict[str, str], Optional[str]]:
+    """
+    Una sola pasada por las líneas de la página del héroe:
+    etiquetas (Title/Role/...), bloque de Statistics y descripción.
+    """
+    labels: Dict[str, Optional[str]] = {label: None for label in HERO_LABELS}
+    missing = set(HERO_LABELS)
+    stats: Dict[str, str] = {}
+    description = None
+    # None = aún no aparece "Statistics"; True = dentro del bloque; False = terminado
+    in_stats: Optional[bool] = None
+
+    for ln in lines:
+        for label in tuple(missing):
+            m = HERO_LABEL_RES[label].search(ln)
+            if m:
+                labels[label] = m.group(1).strip()
+                missing.discard(label)
+
+        if in_stats is None:
+            if ln == "Statistics":
+                in_stats = True
+        elif in_stats:
+            if ln in HERO_STATS_END or ln.startswith("HotS Wikibase Navigation"):
+                in_stats = False
+            else:
+                m = HERO_STAT_RE.match(ln)
+                if m and len(m.group(1)) <= 18:
+                    stats[m.group(1).strip()] = m.group(2).strip()
+                elif not description and len(ln) > 80 and "Copyright" not in ln:
+                    description = ln
+
+        if not missing and in_stats is False:
+            break
+
+    return labels, stats, description
+
+
+def parse_hero_meta_from_abilities_talents(
+    html: Union[str, ParsedPage], page_url: str, hero_slug: str
+) -> HeroMeta:
+    page = as_page(html, page_url)
+
+    name = None
+    h1_texts = page.heading_texts("h1")
+    if h1_texts:
+        m = HERO_H1_RE.match(h1_texts[0])
+        if m:
+            name = m.group(1).strip()
+
+    if not name:
+        for t in page.heading_texts("h2"):
+            if not t or t in IGNORE_HEADINGS:
+                continue
+            if len(t) <= 30:
+                name = t
+                break
+
+    if not name:
+        name = hero_slug.replace("-", " ").title()
+
+    labels, stats, description = _scan_hero_lines(page.lines)
+
+    portrait_url = page.image_url(page_url)
+
+    return HeroMeta(
+        name=name,
+        url=page_url,
+        slug=hero_slug,
+        title=labels["Title"],
+        role=labels["Role"],
+        franchise=labels["Franchise"],
+        price=labels["Price"],
+        portrait_image_url=portrait_url,
+        stats=stats,
+        description=description,
+    )
+
+
+# ----------------------------
+# Talent links parsing
+# ----------------------------
+
+
+def parse_talent_urls_from_abilities_talents(
+    html: Union[str, ParsedPage], page_url: str
+) -> List[str]:
+    page = as_page(html, page_url)
+    urls: Set[str] = set()
+
+    for href in page.hrefs("/hots/wiki/talents/"):
+        urls.add(urljoin(page_url, href))
+
+    return sorted(urls)
+
+
+# ----------------------------
+# Talent page parsing
+# ----------------------------
+
+TALENT_H1_PREFIX_RE = re.compile(r"^HotS Talent:\s*", flags=re.I)
+OWNER_H4_RE = re.compile(r"^(.+?)'s\s+.+$")
+TIER_RE = re.compile(r"^Tier\s+(\d+)$", flags=re.I)
+DESCRIPTION_STOP_RE = re.compile(
+    r"^(modifies ability|see also:|quick comment|hots wikibase navigation)"
+)
+ABILITY_LINE_RE = re.compile(r"^.+\s+\([QWERDZ]\)$")
+ABILITY_STATS_RE = re.compile(r"^(Mana|Cooldown|Range|Charges|Cast time):", flags=re.I)
+MODIFIES_RE = re.compile(r"^(.+?)\s+\(([A-Z])\)$")
+DESCRIPTION_WINDOW = 60
+MODIFIES_WINDOW = 19
+
+
+def _extract_talent_name(page: ParsedPage) -> Optional[str]:
+    for t in page.heading_texts("h2"):
+        if not t or t in IGNORE_HEADINGS:
+            continue
+        return t
+
+    h1_texts = page.heading_texts("h1")
+    if h1_texts:
+        t = TALENT_H1_PREFIX_RE.sub("", h1_texts[0]).strip()
+        if t and t not in IGNORE_HEADINGS:
+            return t
+
+    return None
+
+
+def _extract_hero_owner_from_h4(page: ParsedPage) -> Optional[str]:
+    for txt, at in page.heading_links("h4"):
+        if not txt:
+            continue
+
+        if at is not None:
+            if at.lower().endswith("'s"):
+                return at[:-2].strip()
+
+        m = OWNER_H4_RE.match(txt)
+        if m:
+            return m.group(1).strip()
+
+    return None
+
+
+def _scan_talent_lines(
+    lines: List[str], name: Optional[str]
+) -> Tuple[Optional[int], List[str], Optional[Modifies]]:
+    """
+    Una sola pasada por las líneas de la página del talento: tier, descripción
+    y "Modifies Ability".
+
+    La descripción son hasta DESCRIPTION_WINDOW líneas después de la primera
+    línea "Tier N" (o desde el inicio si no hay tier); si el tier aparece tarde,
+    lo acumulado hasta ahí se descarta y la ventana vuelve a empezar.
+    """
+    name_low = name.strip().lower() if name else None
+    owner_line_pat = (
+        re.compile(rf"^(.+?)'s\s+{re.escape(name)}$", flags=re.I) if name else None
+    )
+
+    tier_index: Optional[int] = None
+    description_lines: List[str] = []
+    desc_start = 0
+    desc_done = False
+    modifies: Optional[Modifies] = None
+    modifies_at: Optional[int] = None
+    modifies_done = False
+
+    for i, ln in enumerate(lines):
+        if tier_index is None:
+            m = TIER_RE.match(ln)
+            if m:
+                tier_index = int(m.group(1))
+                description_lines = []
+                desc_start = i + 1
+                desc_done = False
+                continue
+
+        if not desc_done:
+            if i >= desc_start + DESCRIPTION_WINDOW:
+                desc_done = True
+            else:
+                low = ln.lower()
+                if DESCRIPTION_STOP_RE.match(low):
+                    desc_done = True
+                elif not ln or ln in IGNORE_HEADINGS:
+                    pass
+                elif name_low and low == name_low:
+                    pass
+                elif owner_line_pat and owner_line_pat.match(ln):
+                    pass
+                elif ABILITY_LINE_RE.match(ln):
+                    pass
+                else:
+                    cleaned = clean_wikibase_line(ln)
+                    if ABILITY_STATS_RE.match(cleaned):
+                        desc_done = True
+                    else:
+                        description_lines.append(cleaned)
+
+        if modifies_at is None:
+            if ln.lower() == "modifies ability":
+                modifies_at = i
+        elif not modifies_done:
+            if i > modifies_at + MODIFIES_WINDOW:
+                modifies_done = True
+            else:
+                m = MODIFIES_RE.match(ln)
+                if m:
+                    modifies = Modifies(m.group(1).strip(), m.group(2).strip())
+                    modifies_done = True
+
+        if tier_index is not None and desc_done and modifies_done:
+            break
+
+    return tier_index, description_lines, modifies
+
+
+def parse_talent_page(html: Union[str, ParsedPage], url: str) -> Talent:
+    page = as_page(html, url)
+
+    name = _extract_talent_name(page)
+    owner = _extract_hero_owner_from_h4(page)
+
+    tier_index, description_lines, modifies = _scan_talent_lines(page.lines, name)
+    tier_level = TIER_TO_LEVEL.get(tier_index) if tier_index else None
+
+    talent_description = (
+        " ".join(description_lines).strip() if description_lines else None
+    )
+    if talent_description:
+        talent_description = WS_RE.sub(" ", talent_description).strip()
+
+    icon_url = page.image_url(url)
+
+    return Talent(
+        name=name,
+        url=url,
+        slug=url.rstrip("/").split("/")[-1],
+        tier_index=tier_index,
+        tier=tier_level,
+        hero=owner,
+        description=talent_description,
+        icon_image_url=icon_url,
+        modifies=modifies,
+    )
+
+
+# ----------------------------
+# Output helpers
+# ----------------------------
+
+
+def write_json(path: Path, data) -> None:
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def write_jsonl(path: Path, rows: List[Dict]) -> None:
+    with path.open("w", encoding="utf-8") as f:
+        for r in rows:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+TALENTS_CSV_FIELDS = [
+    "hero_name",
+    "hero_slug",
+    "hero_role",
+    "hero_franchise",
+    "tier",
+    "tier_index",
+    "talent_name",
+    "talent_slug",
+    "talent_url",
+    "talent_icon_image_url",
+    "talent_description",
+    "modifies_ability",
+    "modifies_hotkey",
+]
+
+
+def write_talents_csv(path: Path, heroes_rows: List[HeroRecord], mode: str = "w") -> None:
+    """
+    Escribe CSV de talentos.
+    mode: 'w' para sobrescribir, 'a' para append
+    """
+    write_header = mode == "w" or not path.exists()
+
+    with path.open(mode, encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
         if write_header:
-            w.writeheader()
+            w.writerow(TALENTS_CSV_FIELDS)
+
+        for hero in heroes_rows:
+            w.writerows(hero.csv_rows())
+
+
+# Columnas del héroe que se repiten en cada talento: en Parquet/Arrow van
+# con dictionary encoding; tier y tier_index van como enteros
+TALENTS_DICT_FIELDS = ("hero_name", "hero_slug", "hero_role", "hero_franchise")
+TALENTS_INT_FIELDS = ("tier", "tier_index")
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def check_pyarrow(fmt: str) -> None:
+    """Falla temprano si se pide Parquet/Arrow sin pyarrow instalado"""
+    if _import_pyarrow() is None:
+        raise SystemExit(
+            f"[!] El formato '{fmt}' requiere instalar el paquete: pip install pyarrow"
+        )
+
+
+def talents_arrow_schema(pa):
+    """Schema Arrow de la tabla de talentos (mismas columnas que el CSV)"""
+    fields = []
+    for name in TALENTS_CSV_FIELDS:
+        if name in TALENTS_DICT_FIELDS:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        elif name in TALENTS_INT_FIELDS:
+            fields.append(pa.field(name, pa.int8()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def read_talents_table(path: Path, columns: Optional[List[str]] = None):
+    """Lee un talents.parquet / talents.arrow como pyarrow.Table"""
+    pa = _import_pyarrow()
+    if path.suffix.lower() == ".parquet":
+        return pa.parquet.read_table(path, columns=columns)
+    with pa.memory_map(str(path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns else table
+
+
+# ----------------------------
+# Streaming writers
+# ----------------------------
+
+
+def _same_file(a: Path, b: Path, chunk: int = 1 << 20) -> bool:
+    """True si los dos archivos existen y tienen exactamente los mismos bytes"""
+    try:
+        if a.stat().st_size != b.stat().st_size:
+            return False
+        with a.open("rb") as fa, b.open("rb") as fb:
+            while True:
+                ca, cb = fa.read(chunk), fb.read(chunk)
+                if ca != cb:
+                    return False
+                if not ca:
+                    return True
+    except OSError:
+        return False
+
+
+class StreamingWriter(ABC):
+    """
+    Escribe un héroe a la vez en <archivo>.tmp y al cerrar lo renombra
+    atómicamente al destino. close() se llama también si el crawl se
+    interrumpe, así que el archivo final siempre es válido (aunque parcial).
+
+    Con append=True, el contenido existente del destino se copia primero.
+    """
+
+    BINARY = False
+
+    def __init__(self, path: Path, append: bool = False):
+        self.path = path
+        self.tmp = path.with_name(path.name + ".tmp")
+        self.count = 0
+        self.closed = False
+        self.unchanged = False
+        if self.BINARY:
+            self.f = self.tmp.open("wb")
+        else:
+            self.f = self.tmp.open("w", encoding="utf-8", newline="")
+        self._begin(append and path.exists())
+
+    def _begin(self, append: bool) -> None:
+        pass
+
+    @abstractmethod
+    def _write(self, hero: HeroRecord) -> None:
+        """Serializa un héroe en self.f (cada formato define el suyo)"""
+
+    def _end(self) -> None:
+        pass
+
+    def write_hero(self, hero: HeroRecord) -> None:
+        self._write(hero)
+        self.count += 1
+        # Cada héroe queda en disco apenas termina
+        self.f.flush()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._end()
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+        # Sin cambios: se deja el archivo anterior (y su fecha) para que los
+        # pasos siguientes no reconstruyan nada
+        if _same_file(self.tmp, self.path):
+            self.tmp.unlink()
+            self.unchanged = True
+            return
+        os.replace(self.tmp, self.path)
+
+
+class JsonArrayWriter(StreamingWriter):
+    """Mismo formato que write_json (indent=2), escrito incrementalmente"""
+
+    def _begin(self, append: bool) -> None:
+        self.f.write("[")
+        if append:
+            try:
+                existing = json.loads(self.path.read_text(encoding="utf-8"))
+            except ValueError:
+                existing = []
+            # Los héroes existentes se copian tal cual, sin pasar por el modelo
+            for hero in existing if isinstance(existing, list) else []:
+                self._dump(hero)
+                self.count += 1
+
+    def _dump(self, hero: Dict) -> None:
+        item = json.dumps(hero, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        self.f.write(("\n  " if self.count == 0 else ",\n  ") + item)
+
+    def _write(self, hero: HeroRecord) -> None:
+        self._dump(hero.to_dict())
+
+    def _end(self) -> None:
+        self.f.write("\n]" if self.count else "]")
+
+
+class JsonlWriter(StreamingWriter):
+    def _begin(self, append: bool) -> None:
+        if append:
+            with self.path.open("r", encoding="utf-8") as src:
+                shutil.copyfileobj(src, self.f)
+
+    def _write(self, hero: HeroRecord) -> None:
+        self.f.write(json.dumps(hero.to_dict(), ensure_ascii=False) + "\n")
+
+
+class TalentsCsvWriter(StreamingWriter):
+    def _begin(self, append: bool) -> None:
+        self.w = csv.writer(self.f)
+        if append:
+            with self.path.open("r", encoding="utf-8", newline="") as src:
+                shutil.copyfileobj(src, self.f)
+        else:
+            self.w.writerow(TALENTS_CSV_FIELDS)
+
+    def _write(self, hero: HeroRecord) -> None:
+        self.w.writerows(hero.csv_rows())
+
+
+class ArrowTalentsWriter(StreamingWriter):
+    """
+    Tabla de talentos en formato columnar. Las filas de los héroes terminados
+    se acumulan ya por columna (una lista por campo, sin dicts por fila)
+    hasta BATCH_ROWS y se escriben como un row group (Parquet) o
+    record batch (Arrow IPC); con row groups de un solo héroe la compresión
+    casi no rinde y el archivo sale ~3x más grande. Los diccionarios de las
+    columnas del héroe crecen entre batches y cada uno reusa los valores ya
+    emitidos, así el archivo IPC solo agrega deltas.
+
+    El footer se escribe en close(): hasta entonces el .tmp no es legible.
+    """
+
+    BINARY = True
+    BATCH_ROWS = 4096
+
+    def _begin(self, append: bool) -> None:
+        self.pa = _import_pyarrow()
+        self.schema = talents_arrow_schema(self.pa)
+        self.dicts: Dict[str, Dict[str, int]] = {f: {} for f in TALENTS_DICT_FIELDS}
+        self.columns: List[List] = [[] for _ in TALENTS_CSV_FIELDS]
+        self.pending = 0
+        self.w = self._open_writer()
+        if append:
+            table = read_talents_table(self.path).to_pydict()
+            self.columns = [table[name] for name in TALENTS_CSV_FIELDS]
+            self.pending = len(self.columns[0])
+
+    @abstractmethod
+    def _open_writer(self):
+        """Writer de pyarrow sobre self.f (ParquetWriter o archivo IPC)"""
+
+    def _column(self, name: str, values: List):
+        pa = self.pa
+        if name in TALENTS_DICT_FIELDS:
+            seen = self.dicts[name]
+            indices = [None if v is None else seen.setdefault(v, len(seen)) for v in values]
+            return pa.DictionaryArray.from_arrays(
+                pa.array(indices, pa.int32()), pa.array(list(seen), pa.string())
+            )
+        return pa.array(values, self.schema.field(name).type)
+
+    def _flush_rows(self) -> None:
+        if not self.pending:
+            return
+        columns = self.columns
+        self.columns = [[] for _ in TALENTS_CSV_FIELDS]
+        self.pending = 0
+        batch = self.pa.record_batch(
+            [self._column(name, col) for name, col in zip(TALENTS_CSV_FIELDS, columns)],
+            schema=self.schema,
+        )
+        self.w.write_batch(batch)
+
+    def _write(self, hero: HeroRecord) -> None:
+        rows = hero.csv_rows()
+        for column, values in zip(self.columns, zip(*rows)):
+            column.extend(values)
+        self.pending += len(rows)
+        if self.pending >= self.BATCH_ROWS:
+            self._flush_rows()
+
+    def _end(self) -> None:
+        self._flush_rows()
+        self.w.close()
+
+
+class ParquetTalentsWriter(ArrowTalentsWriter):
+    def _open_writer(self):
+        return self.pa.parquet.ParquetWriter(self.f, self.schema, compression="zstd")
+
+
+class ArrowIpcTalentsWriter(ArrowTalentsWriter):
+    def _open_writer(self):
+        return self.pa.ipc.new_file(
+            self.f,
+            self.schema,
+            options=self.pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True),
+        )
+
+
+def _import_brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class HeroShardWriter:
+    """
+    Un JSON compacto por héroe en <dir>/<slug>.json, con hermanos .json.gz y
+    .json.br ya comprimidos (.br solo si brotli está instalado), más un
+    manifest.json chico con la lista de héroes, sus tamaños y hashes. El
+    dashboard carga el manifest y después solo el héroe que se abre.
+
+    Cada shard se escribe atómicamente apenas termina el héroe; el manifest
+    se reescribe en close(). Un shard cuyo contenido no cambió respecto del
+    manifest anterior no se toca (ni su fecha). Sin append, los shards que
+    no quedan en el manifest nuevo se borran.
+    """
+
+    MANIFEST = "manifest.json"
+    GZIP_LEVEL = 9
+    BROTLI_QUALITY = 11
+
+    def __init__(self, root: Path, append: bool = False):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.append = append
+        self.count = 0
+        self.unchanged = 0
+        self.closed = False
+        self._brotli = _import_brotli()
+        self.encodings = ["gz", "br"] if self._brotli else ["gz"]
+        if not self._brotli:
+            print("[!] brotli no está instalado: los shards se escriben sin .br")
+
+        previous = self._read_manifest()
+        self.previous: Dict[str, Dict] = {e["slug"]: e for e in previous}
+        # Con append, el manifest arranca con los héroes que ya estaban
+        self.entries: Dict[str, Dict] = dict(self.previous) if append else {}
+
+    def _read_manifest(self) -> List[Dict]:
+        path = self.root / self.MANIFEST
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))["heroes"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+
+    def _files(self, name: str) -> List[Path]:
+        return [self.root / name] + [self.root / f"{name}.{enc}" for enc in self.encodings]
+
+    def write_hero(self, hero: HeroRecord) -> None:
+        slug = hero.slug
+        data = json.dumps(
+            hero.to_dict(), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        digest = hashlib.sha1(data).hexdigest()
+        name = f"{slug}.json"
+
+        prev = self.previous.get(slug)
+        if (
+            prev
+            and prev.get("sha1") == digest
+            and all(f"{enc}_bytes" in prev for enc in self.encodings)
+            and all(p.exists() for p in self._files(name))
+        ):
+            entry = prev
+            self.unchanged += 1
+        else:
+            entry = {
+                "slug": slug,
+                "name": hero.hero.name,
+                "role": hero.hero.role,
+                "franchise": hero.hero.franchise,
+                "talents": len(hero.talents),
+                "file": name,
+                "sha1": digest,
+                "bytes": len(data),
+            }
+            # mtime=0: el .gz no cambia si el contenido no cambia
+            compressed = {"gz": gzip.compress(data, self.GZIP_LEVEL, mtime=0)}
+            if self._brotli:
+                compressed["br"] = self._brotli.compress(data, quality=self.BROTLI_QUALITY)
+            _write_atomic(self.root / name, data)
+            for enc, blob in compressed.items():
+                _write_atomic(self.root / f"{name}.{enc}", blob)
+                entry[f"{enc}_bytes"] = len(blob)
+
+        self.entries[slug] = entry
+        self.count += 1
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        manifest = {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "encodings": self.encodings,
+            "heroes": list(self.entries.values()),
+        }
+        _write_atomic(
+            self.root / self.MANIFEST,
+            json.dumps(manifest, ensure_ascii=False, indent=2) + "\n",
+        )
+        if not self.append:
+            keep = {p.name for e in self.entries.values() for p in self._files(e["file"])}
+            keep.add(self.MANIFEST)
+            for path in self.root.glob("*.json*"):
+                if path.name not in keep:
+                    path.unlink()
+        print(
+            f"[*] Shards: {self.count} héroes en {self.root} "
+            f"({self.unchanged} sin cambios), manifest con {len(self.entries)}"
+        )
+
+
+def _norm_value(value):
+    """Normaliza un valor para comparar: espacios colapsados en los textos"""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {k: _norm_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_norm_value(v) for v in value]
+    return value
+
+
+def record_sha1(record: Dict) -> str:
+    """Hash estable de un registro normalizado (orden de claves incluido)"""
+    data = json.dumps(_norm_value(record), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def _field_changes(old: Dict, new: Dict) -> Dict[str, Dict]:
+    changes = {}
+    for field in sorted(set(old) | set(new)):
+        a, b = _norm_value(old.get(field)), _norm_value(new.get(field))
+        if a != b:
+            changes[field] = {"old": old.get(field), "new": new.get(field)}
+    return changes
+
+
+def _talent_key(talent: Dict) -> str:
+    return talent.get("slug") or talent.get("url") or talent.get("name") or ""
+
+
+def iter_heroes(path: Path) -> Iterator[Dict]:
+    """
+    Héroes de una salida anterior (heroes.json, heroes.jsonl o su carpeta),
+    de a uno: el JSONL se lee línea por línea sin cargar el archivo entero.
+    """
+    if path.is_dir():
+        path = path / "heroes.jsonl" if (path / "heroes.jsonl").exists() else path / "heroes.json"
+    if path.suffix.lower() == ".jsonl":
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(data, list):
+        raise ValueError(f"{path} no es una lista de héroes")
+    yield from data
+
+
+def load_heroes(path: Path) -> List[Dict]:
+    """Héroes de una salida anterior: heroes.json, heroes.jsonl o su carpeta"""
+    return list(iter_heroes(path))
+
+
+class ChangeSetWriter:
+    """
+    Compara cada héroe terminado con el mismo héroe de una salida anterior
+    (--diff-against) y al cerrar escribe el change set: héroes nuevos,
+    eliminados y modificados; por héroe modificado, los cambios de campo de
+    su meta y los talentos agregados, quitados y modificados (con cambios
+    por campo). Los registros se comparan por el sha1 de su versión
+    normalizada (claves ordenadas, espacios colapsados).
+
+    Un héroe es "eliminado" si ya no está en la lista de héroes del sitio
+    (listed), y solo si la corrida no se filtró (--heroes, --limit, ...);
+    uno que sigue listado pero no se escribió (falló o el crawl se cortó)
+    queda en "missing". Tampoco cuentan como quitados los talentos cuya
+    descarga falló (failed_urls, que completa main() antes de cerrar).
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        previous_path: Path,
+        previous: List[Dict],
+        listed: Optional[Set[str]] = None,
+    ):
+        self.path = path
+        self.previous_path = previous_path
+        self.previous: Dict[str, Dict] = {
+            hero["slug"]: hero for hero in previous if hero.get("slug")
+        }
+        self.listed = listed
+        self.failed_urls: Set[str] = set()
+        self.count = 0
+        self.closed = False
+        self.seen: Set[str] = set()
+        self.added: List[str] = []
+        self.modified: Dict[str, Dict] = {}
+        self.unchanged = 0
+        self.talent_counts: Counter = Counter()
+        # Orden de talentos de los héroes modificados (por si solo cambió eso)
+        self.current_order: Dict[str, List[Dict]] = {}
+
+    def write_hero(self, record: HeroRecord) -> None:
+        # Las salidas anteriores son JSON: se compara contra la misma forma
+        hero = record.to_dict()
+        slug = record.slug
+        self.count += 1
+        self.seen.add(slug)
+        prev = self.previous.get(slug)
+        if prev is None:
+            self.added.append(slug)
+            self.talent_counts["added"] += len(hero.get("talents", []))
+            return
+        if record_sha1(prev) == record_sha1(hero):
+            self.unchanged += 1
+            return
+
+        change: Dict[str, Dict] = {}
+        self.current_order[slug] = hero.get("talents", [])
+        meta = _field_changes(
+            {k: v for k, v in prev.items() if k not in ("hero", "talents")},
+            {k: v for k, v in hero.items() if k not in ("hero", "talents")},
+        )
+        meta.update(_field_changes(prev.get("hero", {}), hero.get("hero", {})))
+        if meta:
+            change["hero"] = meta
+
+        old_t = {_talent_key(t): t for t in prev.get("talents", [])}
+        new_t = {_talent_key(t): t for t in hero.get("talents", [])}
+        talents: Dict = {
+            "added": [k for k in new_t if k not in old_t],
+            # Se filtran en close() contra las descargas fallidas
+            "removed": [(k, old_t[k].get("url")) for k in old_t if k not in new_t],
+            "modified": {
+                k: _field_changes(old_t[k], new_t[k])
+                for k in new_t
+                if k in old_t and record_sha1(old_t[k]) != record_sha1(new_t[k])
+            },
+        }
+        self.modified[slug] = {**change, "talents": talents}
+
+    def _finish_talents(self) -> None:
+        """Cierra los cambios de talentos de cada héroe modificado"""
+        for slug in list(self.modified):
+            change = self.modified[slug]
+            talents = change.pop("talents")
+            removed = [k for k, url in talents["removed"] if url not in self.failed_urls]
+            failed = [k for k, url in talents["removed"] if url in self.failed_urls]
+            talents["removed"] = removed
+            if failed:
+                talents["failed"] = failed
+            for kind in ("added", "removed", "modified"):
+                self.talent_counts[kind] += len(talents[kind])
+            if any(talents.values()):
+                change["talents"] = {k: v for k, v in talents.items() if v}
+            if not change:
+                if failed:
+                    # Solo faltan talentos cuya descarga falló: no es un cambio
+                    self.unchanged += 1
+                    del self.modified[slug]
+                    continue
+                # Solo cambió el orden de los talentos
+                change["talents"] = {
+                    "order": [_talent_key(t) for t in self.current_order.get(slug, [])]
+                }
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._finish_talents()
+        listed = self.listed
+        removed = [s for s in self.previous if s not in listed] if listed is not None else []
+        missing = (
+            [s for s in self.previous if s in listed and s not in self.seen]
+            if listed is not None
+            else []
+        )
+        for slug in removed:
+            self.talent_counts["removed"] += len(self.previous[slug].get("talents", []))
+        change_set = {
+            "previous": str(self.previous_path),
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "complete": listed is not None and not missing,
+            "summary": {
+                "heroes_added": len(self.added),
+                "heroes_removed": len(removed),
+                "heroes_modified": len(self.modified),
+                "heroes_unchanged": self.unchanged,
+                "heroes_missing": len(missing),
+                "talents_added": self.talent_counts["added"],
+                "talents_removed": self.talent_counts["removed"],
+                "talents_modified": self.talent_counts["modified"],
+            },
+            "heroes": {
+                "added": self.added,
+                "removed": removed,
+                "missing": missing,
+                "modified": self.modified,
+            },
+        }
+        _write_atomic(
+            self.path, json.dumps(change_set, ensure_ascii=False, indent=2) + "\n"
+        )
+        t = self.talent_counts
+        print(
+            f"[*] Cambios vs {self.previous_path}: {len(self.modified)} héroes modificados"
+            f"{' (' + ', '.join(self.modified) + ')' if self.modified else ''}, "
+            f"{len(self.added)} nuevos, {len(removed)} eliminados, {self.unchanged} sin cambios; "
+            f"talentos +{t['added']} -{t['removed']} ~{t['modified']} -> {self.path}"
+        )
+
+
+class OutputSink:
+    """Reparte cada héroe terminado entre todos los writers de salida"""
+
+    def __init__(self, writers: List[StreamingWriter]):
+        self.writers = writers
+
+    @property
+    def count(self) -> int:
+        return self.writers[0].count if self.writers else 0
+
+    def write_hero(self, hero: HeroRecord) -> None:
+        for w in self.writers:
+            w.write_hero(hero)
+
+    def close(self) -> None:
+        for w in self.writers:
+            w.close()
+
+
+OUTPUT_WRITERS = {
+    "json": JsonArrayWriter,
+    "jsonl": JsonlWriter,
+    "csv": TalentsCsvWriter,
+    "parquet": ParquetTalentsWriter,
+    "arrow": ArrowIpcTalentsWriter,
+}
+OUTPUT_SUFFIXES = (".json", ".jsonl", ".csv", ".parquet", ".arrow")
+# Formatos que necesitan pyarrow (opcional)
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+
+def open_outputs(
+    out_path: Path, fmt: str, append: bool = False, shards: bool = False
+) -> OutputSink:
+    """
+    Un archivo (.json/.jsonl/.csv/.parquet/.arrow) con el formato fmt, o una
+    carpeta con heroes.json, heroes.jsonl y talents.csv (más talents.parquet
+    o talents.arrow si fmt es uno de esos). Con shards, además un JSON por
+    héroe en <carpeta>/heroes/ (o junto al archivo).
+    """
+    extra = []
+    if shards:
+        shard_dir = (
+            out_path.parent / "heroes"
+            if out_path.suffix.lower() in OUTPUT_SUFFIXES
+            else out_path / "heroes"
+        )
+        extra.append(HeroShardWriter(shard_dir, append))
+
+    if out_path.suffix.lower() in OUTPUT_SUFFIXES:
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        return OutputSink([OUTPUT_WRITERS[fmt](out_path, append), *extra])
+
+    out_path.mkdir(parents=True, exist_ok=True)
+    writers: List[StreamingWriter] = [
+        JsonArrayWriter(out_path / "heroes.json", append),
+        JsonlWriter(out_path / "heroes.jsonl", append),
+        TalentsCsvWriter(out_path / "talents.csv", append),
+    ]
+    if fmt in COLUMNAR_FORMATS:
+        writers.append(OUTPUT_WRITERS[fmt](out_path / f"talents.{fmt}", append))
+    return OutputSink(writers + extra)
+
+
+def load_existing_hero_slugs_from_csv(csv_path: Path) -> Set[str]:
+    """Carga los slugs de héroes que ya están en el CSV"""
+    if not csv_path.exists():
+        return set()
+
+    existing_slugs = set()
+    try:
+        with csv_path.open("r", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                slug = row.get("hero_slug")
+                if slug:
+                    existing_slugs.add(slug)
+        print(f"[*] Encontrados {len(existing_slugs)} héroes existentes en CSV")
+    except Exception as e:
+        print(f"[!] Error al leer CSV existente: {e}")
+
+    return existing_slugs
+
+
+def load_existing_hero_slugs_from_json(json_path: Path) -> Set[str]:
+    """Carga los slugs de héroes que ya están en JSON/JSONL"""
+    if not json_path.exists():
+        return set()
+
+    existing_slugs = set()
+    try:
+        if json_path.suffix.lower() == ".jsonl":
+            with json_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        data = json.loads(line)
+                        slug = data.get("slug")
+                        if slug:
+                            existing_slugs.add(slug)
+        else:  # .json
+            data = json.loads(json_path.read_text(encoding="utf-8"))
+            if isinstance(data, list):
+                for hero in data:
+                    slug = hero.get("slug")
+                    if slug:
+                        existing_slugs.add(slug)
+
+        print(f"[*] Encontrados {len(existing_slugs)} héroes existentes en JSON")
+    except Exception as e:
+        print(f"[!] Error al leer JSON existente: {e}")
+
+    return existing_slugs
+
+
+def load_existing_hero_slugs_from_columnar(path: Path) -> Set[str]:
+    """Carga los slugs de héroes que ya están en un .parquet/.arrow"""
+    if not path.exists():
+        return set()
+
+    existing_slugs = set()
+    try:
+        column = read_talents_table(path, columns=["hero_slug"]).column("hero_slug")
+        existing_slugs = {slug for slug in column.to_pylist() if slug}
+        print(f"[*] Encontrados {len(existing_slugs)} héroes existentes en {path.suffix[1:]}")
+    except Exception as e:
+        print(f"[!] Error al leer {path.name} existente: {e}")
+
+    return existing_slugs
+
+
+# ----------------------------
+# Imágenes
+# ----------------------------
+
+IMAGE_EXTS = (".png", ".webp", ".jpg", ".jpeg", ".gif")
+
+
+def image_jobs(heroes: List[HeroRecord]) -> List[Dict]:
+    """Retratos de héroes e íconos de talentos a descargar, una vez por URL"""
+    jobs: Dict[str, Dict] = {}
+    for hero in heroes:
+        meta = hero.hero
+        url = meta.portrait_image_url
+        if url:
+            jobs.setdefault(
+                url,
+                {"kind": "heroes", "name": meta.name, "slug": hero.slug, "url": url},
+            )
+        for t in hero.talents:
+            url = t.icon_image_url
+            if url:
+                jobs.setdefault(
+                    url,
+                    {
+                        "kind": "talents",
+                        "name": t.name,
+                        "slug": t.slug,
+                        "hero": meta.name,
+                        "url": url,
+                    },
+                )
+    return list(jobs.values())
+
+
+class ImageStore:
+    """
+    Carpeta de imágenes: heroes/<archivo> (retratos) y talents/<archivo>
+    (íconos), con el nombre de archivo de la URL. El manifest
+    hero-images.manifest.json tiene el mismo formato que el de la raíz del
+    repo ({_comment, _instructions, heroes: [{name, slug, url}]}) más
+    file/sha1/bytes/etag por imagen y la lista "talents".
+
+    - Una imagen cuyo archivo sigue teniendo el sha1 del manifest no se
+      vuelve a descargar (con --revalidate se pide con If-None-Match).
+    - Bytes idénticos bajo otro nombre se guardan como hard link al
+      archivo que ya existe (copia si el filesystem no los soporta).
+    - Un archivo que ya tenía exactamente esos bytes no se reescribe.
+    """
+
+    MANIFEST = "hero-images.manifest.json"
+    KINDS = ("heroes", "talents")
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.stats: Counter = Counter()
+        self.entries: Dict[str, Dict] = {}
+        # sha1 -> archivo con esos bytes; archivo -> URL que lo ocupa
+        self.by_hash: Dict[str, Path] = {}
+        self.names: Dict[str, str] = {}
+        manifest = self._read_manifest()
+        for kind in self.KINDS:
+            for e in manifest.get(kind, []):
+                if e.get("url") and e.get("file"):
+                    self.entries[e["url"]] = {**e, "kind": kind}
+                    self.names[e["file"]] = e["url"]
+
+    def _read_manifest(self) -> Dict:
+        try:
+            data = json.loads((self.root / self.MANIFEST).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    @staticmethod
+    def _file_sha1(path: Path) -> Optional[str]:
+        try:
+            return hashlib.sha1(path.read_bytes()).hexdigest()
+        except OSError:
+            return None
+
+    def _file_for(self, job: Dict) -> str:
+        """Ruta relativa (kind/nombre) de la URL; única aunque se repita el nombre"""
+        url = job["url"]
+        name = re.sub(r"[^\w.-]+", "-", Path(urlparse(url).path).name) or "image"
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in IMAGE_EXTS:
+            stem, ext = name, ".png"
+        rel = f"{job['kind']}/{stem}{ext}"
+        if self.names.get(rel, url) != url:
+            rel = f"{job['kind']}/{stem}-{sha1(url)[:8]}{ext}"
+        self.names[rel] = url
+        return rel
+
+    def current(self, job: Dict) -> Optional[Dict]:
+        """Entrada del manifest si el archivo en disco sigue teniendo su sha1"""
+        entry = self.entries.get(job["url"])
+        if not entry:
+            return None
+        path = self.root / entry["file"]
+        if self._file_sha1(path) != entry.get("sha1"):
+            return None
+        self.by_hash.setdefault(entry["sha1"], path)
+        return entry
+
+    def keep(self, job: Dict, entry: Dict, reason: str) -> None:
+        self.entries[job["url"]] = {**entry, **job}
+        self.stats[reason] += 1
+
+    def save(self, job: Dict, data: bytes, etag: Optional[str]) -> None:
+        digest = hashlib.sha1(data).hexdigest()
+        prev = self.entries.get(job["url"])
+        rel = prev["file"] if prev else self._file_for(job)
+        path = self.root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        if self._file_sha1(path) == digest:
+            self.stats["unchanged"] += 1
+        elif digest in self.by_hash and self.by_hash[digest] != path:
+            tmp = path.with_name(path.name + ".tmp")
+            try:
+                os.link(self.by_hash[digest], tmp)
+            except OSError:
+                shutil.copyfile(self.by_hash[digest], tmp)
+            os.replace(tmp, path)
+            self.stats["deduped"] += 1
+        else:
+            _write_atomic(path, data)
+            self.stats["downloaded"] += 1
+        self.by_hash.setdefault(digest, path)
+
+        self.entries[job["url"]] = {
+            **job,
+            "file": rel,
+            "sha1": digest,
+            "bytes": len(data),
+            "etag": etag,
+        }
+
+    def fail(self, job: Dict, error: BaseException) -> None:
+        # La entrada anterior (si había) se conserva
+        self.stats["failed"] += 1
+        print(f"  [ERROR] imagen {job['url']}: {error}")
+
+    def close(self) -> None:
+        manifest: Dict = {
+            "_comment": (
+                "Imágenes descargadas por extract_heroesfire_wikibase.py --images: "
+                "retratos en heroes/ e íconos de talentos en talents/"
+            ),
+            "_instructions": (
+                "Generado automáticamente; 'file' es relativo a esta carpeta y 'sha1' "
+                "permite saltear las imágenes que no cambiaron"
+            ),
+        }
+        for kind in self.KINDS:
+            manifest[kind] = sorted(
+                (
+                    {k: v for k, v in e.items() if k != "kind"}
+                    for e in self.entries.values()
+                    if e["kind"] == kind
+                ),
+                key=lambda e: e["file"],
+            )
+        _write_atomic(
+            self.root / self.MANIFEST,
+            json.dumps(manifest, ensure_ascii=False, indent=2) + "\n",
+        )
+        parts = ", ".join(f"{n} {k}" for k, n in sorted(self.stats.items()))
+        print(f"[*] Imágenes en {self.root}: {parts or 'nada que hacer'}")
 
-        for hero in heroes_rows:
-            hmeta = hero.get("hero", {})
-            for t in hero.get("talents", []):
-                w.writerow(
-                    {
-                        "hero_name": hmeta.get("name"),
-                        "hero_slug": hero.get("slug"),
-                        "hero_role": hmeta.get("role"),
-                        "hero_franchise": hmeta.get("franchise"),
-                        "tier": t.get("tier"),
-                        "tier_index": t.get("tier_index"),
-                        "talent_name": t.get("name"),
-                        "talent_slug": t.get("slug"),
-                        "talent_url": t.get("url"),
-                        "talent_icon_image_url": t.get("icon_image_url"),
-                        "talent_description": t.get("description"),
-                        "modifies_ability": (t.get("modifies") or {}).get("ability"),
-                        "modifies_hotkey": (t.get("modifies") or {}).get("hotkey"),
-                    }
+
+def _import_pil():
+    try:
+        from PIL import Image, features
+    except ImportError:
+        return None
+    return Image, features
+
+
+def check_pillow() -> None:
+    """Falla temprano si se pide --optimize-images sin Pillow instalado"""
+    if _import_pil() is None:
+        raise SystemExit(
+            "[!] --optimize-images requiere instalar el paquete: pip install pillow"
+        )
+
+
+class IconOptimizer:
+    """
+    Post-proceso de los íconos de talentos descargados con --images, en
+    <DIR>/optimized/:
+
+    - icons/<nombre>.webp y .avif: el ícono recodificado a tamaño completo
+    - thumbs/<nombre>.webp: miniatura de thumb x thumb
+    - atlas/<héroe>.webp y .avif: sprite con las miniaturas de los talentos
+      del héroe, en su orden, de a COLUMNS por fila
+    - talent-atlas.json: posición de cada talento en su atlas, con las
+      mismas claves que talent-dict-optimized.json (con --talent-dict) o
+      <héroe>/<nombre> sin él
+
+    AVIF solo si el Pillow instalado lo soporta. Incremental: .state.json
+    guarda el sha1 de origen de cada ícono y de las entradas de cada atlas,
+    y solo se recodifica lo que cambió (todo, si cambian los parámetros).
+    También guarda los íconos de cada atlas en orden, así una corrida con
+    --heroes, --skip-existing o --append conserva en el mapa a los héroes
+    que no procesó (mientras su atlas siga en disco).
+    """
+
+    DIR = "optimized"
+    STATE = ".state.json"
+    MAP = "talent-atlas.json"
+    COLUMNS = 8
+    # Calidad por formato: AVIF 60 se ve como WebP 80 y pesa ~20% menos
+    QUALITY = {"webp": 80, "avif": 60}
+
+    def __init__(self, images_root: Path, thumb: int = 64):
+        self.Image, features = _import_pil()
+        self.images_root = images_root
+        self.root = images_root / self.DIR
+        self.thumb = thumb
+        self.formats = ["webp", "avif"] if features.check("avif") else ["webp"]
+        self.params = {
+            "thumb": thumb,
+            "columns": self.COLUMNS,
+            "quality": self.QUALITY,
+            "formats": self.formats,
+        }
+        self.stats: Counter = Counter()
+        try:
+            state = json.loads((self.root / self.STATE).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            state = {}
+        if state.get("params") != self.params:
+            state = {}
+        self.icons: Dict[str, str] = state.get("icons", {})
+        self.atlases: Dict[str, str] = state.get("atlas", {})
+        # slug -> {"name": nombre del héroe, "stems": íconos del atlas en orden}
+        self.heroes: Dict[str, Dict] = state.get("heroes", {})
+
+    def _save(self, img, rel: str, fmt: str) -> None:
+        buf = io.BytesIO()
+        img.save(buf, format=fmt.upper(), quality=self.QUALITY[fmt])
+        _write_atomic(self.root / rel, buf.getvalue())
+
+    def _icon(self, entry: Dict) -> str:
+        """Recodifica un ícono si cambió; devuelve su nombre (sin extensión)"""
+        stem = Path(entry["file"]).stem
+        outputs = [f"icons/{stem}.{fmt}" for fmt in self.formats] + [f"thumbs/{stem}.webp"]
+        if self.icons.get(entry["file"]) == entry["sha1"] and all(
+            (self.root / rel).exists() for rel in outputs
+        ):
+            self.stats["icons sin cambios"] += 1
+            return stem
+        with self.Image.open(self.images_root / entry["file"]) as src:
+            img = src.convert("RGBA")
+        for fmt in self.formats:
+            self._save(img, f"icons/{stem}.{fmt}", fmt)
+        thumb = img.resize((self.thumb, self.thumb), self.Image.LANCZOS)
+        self._save(thumb, f"thumbs/{stem}.webp", "webp")
+        self.icons[entry["file"]] = entry["sha1"]
+        self.stats["icons recodificados"] += 1
+        return stem
+
+    def _atlas(self, slug: str, entries: List[Dict], stems: List[str]) -> None:
+        digest = sha1(json.dumps([[e["file"], e["sha1"]] for e in entries]))
+        outputs = [f"atlas/{slug}.{fmt}" for fmt in self.formats]
+        if self.atlases.get(slug) == digest and all(
+            (self.root / rel).exists() for rel in outputs
+        ):
+            self.stats["atlas sin cambios"] += 1
+            return
+        size = self.thumb
+        rows = (len(stems) + self.COLUMNS - 1) // self.COLUMNS
+        sheet = self.Image.new(
+            "RGBA", (min(len(stems), self.COLUMNS) * size, rows * size), (0, 0, 0, 0)
+        )
+        for i, stem in enumerate(stems):
+            with self.Image.open(self.root / f"thumbs/{stem}.webp") as thumb:
+                sheet.paste(thumb, ((i % self.COLUMNS) * size, (i // self.COLUMNS) * size))
+        for fmt in self.formats:
+            self._save(sheet, f"atlas/{slug}.{fmt}", fmt)
+        self.atlases[slug] = digest
+        self.stats["atlas generados"] += 1
+
+    def run(
+        self,
+        store: "ImageStore",
+        hero_icons: Dict[str, Tuple[str, List[str]]],
+        talent_dict: Optional[Path] = None,
+    ) -> None:
+        """
+        hero_icons: slug del héroe -> (nombre, URLs de sus íconos en orden).
+        Los íconos que no están en el store (descarga fallida) se omiten.
+        """
+        # nombre de archivo -> [(héroe, slug, x, y)] (un talento puede ser de varios)
+        positions: Dict[str, List[Tuple[str, str, int, int]]] = {}
+        for slug, (hero_name, urls) in hero_icons.items():
+            entries: List[Dict] = []
+            for url in dict.fromkeys(urls):
+                entry = store.entries.get(url)
+                if entry and entry.get("sha1") and (store.root / entry["file"]).exists():
+                    entries.append(entry)
+            if not entries:
+                continue
+            stems = [self._icon(e) for e in entries]
+            self._atlas(slug, entries, stems)
+            self.heroes[slug] = {"name": hero_name or slug, "stems": stems}
+
+        # El mapa cubre todos los atlas en disco, no solo los de esta corrida
+        for slug in sorted(self.heroes):
+            if not all(
+                (self.root / f"atlas/{slug}.{fmt}").exists() for fmt in self.formats
+            ):
+                del self.heroes[slug]
+                self.atlases.pop(slug, None)
+                continue
+            hero = self.heroes[slug]
+            for i, stem in enumerate(hero["stems"]):
+                positions.setdefault(stem, []).append(
+                    (
+                        hero["name"],
+                        slug,
+                        (i % self.COLUMNS) * self.thumb,
+                        (i // self.COLUMNS) * self.thumb,
+                    )
                 )
 
+        coords: Dict[str, Dict] = {}
+        unmatched: List[str] = []
+        if talent_dict:
+            keys = json.loads(talent_dict.read_text(encoding="utf-8")).get("dict", {})
+            for key, image_path in keys.items():
+                found = positions.get(Path(image_path).stem)
+                if not found:
+                    unmatched.append(key)
+                    continue
+                # Las claves empiezan con el nombre del héroe ("AlarakExtendedLightning")
+                norm_key = key.lower()
+                hero, slug, x, y = next(
+                    (
+                        p
+                        for p in found
+                        if norm_key.startswith(re.sub(r"[^a-z0-9]", "", p[0].lower()))
+                    ),
+                    found[0],
+                )
+                coords[key] = {"atlas": slug, "x": x, "y": y}
+        else:
+            for stem, found in positions.items():
+                for _, slug, x, y in found:
+                    coords[f"{slug}/{stem}"] = {"atlas": slug, "x": x, "y": y}
+
+        talent_map = {
+            "metadata": {
+                "generated": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "size": self.thumb,
+                "columns": self.COLUMNS,
+                "formats": self.formats,
+                "path": "atlas/{atlas}.{format}",
+                "atlases": len(self.atlases),
+                "talents": len(coords),
+            },
+            "dict": coords,
+            "unmatched": unmatched,
+        }
+        _write_atomic(
+            self.root / self.MAP, json.dumps(talent_map, ensure_ascii=False, indent=2) + "\n"
+        )
+        state = {
+            "params": self.params,
+            "icons": self.icons,
+            "atlas": self.atlases,
+            "heroes": self.heroes,
+        }
+        _write_atomic(self.root / self.STATE, json.dumps(state))
+        parts = ", ".join(f"{n} {k}" for k, n in sorted(self.stats.items()))
+        print(
+            f"[*] Íconos optimizados en {self.root}: {parts or 'nada que hacer'}; "
+            f"{len(coords)} talentos en el mapa"
+            + (f", {len(unmatched)} sin ícono" if talent_dict else "")
+        )
 
-def load_existing_hero_slugs_from_csv(csv_path: Path) -> Set[str]:
-    """Carga los slugs de héroes que ya están en el CSV"""
-    if not csv_path.exists():
-        return set()
 
-    existing_slugs = set()
+async def download_images(
+    fetcher: AsyncFetcher, jobs: List[Dict], store: ImageStore, revalidate: bool = False
+) -> None:
+    """Descarga las imágenes en paralelo (hasta fetcher.concurrency en vuelo)"""
+    import asyncio
+
+    async def fetch(job: Dict) -> None:
+        entry = store.current(job)
+        if entry and not (revalidate and entry.get("etag")):
+            store.keep(job, entry, "present")
+            return
+        conditional = {"If-None-Match": entry["etag"]} if entry else {}
+        try:
+            got = await fetcher.aget_bytes(job["url"], conditional)
+        except Exception as e:
+            store.fail(job, e)
+            return
+        if got is None:
+            store.keep(job, entry, "not_modified")
+            return
+        data, headers = got
+        store.save(job, data, headers.get("ETag"))
+        log(f"  [img] {job['url']}")
+
+    await asyncio.gather(*(fetch(job) for job in jobs))
+
+
+# ----------------------------
+# Crawl
+# ----------------------------
+
+
+def build_hero_record(
+    hero_slug: str, at_url: str, hero_meta: HeroMeta, talents: List[Talent]
+) -> HeroRecord:
+    # Los talentos se comparten entre héroes: solo se crea uno nuevo cuando
+    # la página no decía de quién es
+    talents_sorted = sorted(
+        (t if t.hero else replace(t, hero=hero_meta.name) for t in talents),
+        key=lambda t: (
+            t.tier_index if t.tier_index is not None else 999,
+            (t.name or "").lower(),
+        ),
+    )
+
+    return HeroRecord(
+        slug=hero_slug,
+        hero=hero_meta,
+        abilities_talents_url=at_url,
+        talents=tuple(talents_sorted),
+    )
+
+
+def parse_hero_page(
+    html: Union[str, ParsedPage], page_url: str, hero_slug: str
+) -> Tuple[HeroMeta, List[str]]:
+    """Parsea la página abilities-talents: (meta del héroe, URLs de talentos)"""
+    page = as_page(html, page_url)
+    return (
+        parse_hero_meta_from_abilities_talents(page, page_url, hero_slug),
+        parse_talent_urls_from_abilities_talents(page, page_url),
+    )
+
+
+def _init_parse_worker(parser: str, base_url: str) -> None:
+    set_html_parser(parser)
+    set_base_url(base_url)
+
+
+class ParsePool:
+    """
+    Etapa de parseo en procesos separados (modo --parse-workers).
+
+    El HTML descargado entra por una cola acotada: submit() bloquea cuando ya hay
+    max_pending páginas esperando parser, así la descarga no acumula HTML sin límite.
+    """
+
+    def __init__(self, workers: int, max_pending: int = 0, parser: Optional[str] = None):
+        self.workers = workers
+        self.max_pending = max_pending or workers * 4
+        # Los workers usan el mismo backend HTML y el mismo host que el proceso principal
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_parse_worker,
+            initargs=(parser or _html_parser, BASE),
+        )
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._async_slots: Optional["asyncio.Semaphore"] = None
+
+    def submit(self, fn, *args) -> Future:
+        self._slots.acquire()
+        try:
+            fut = self.executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    async def arun(self, fn, *args):
+        import asyncio
+
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_pending)
+        async with self._async_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ParseStage:
+    """
+    Punto único de parseo del crawl: consulta el cache de registros y, si no
+    está, parsea en el proceso actual o en el ParsePool. Si hay journal, marca
+    cada URL parseada como 'done' con la clave de su registro.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[ParsePool] = None,
+        records: Optional[RecordCache] = None,
+        journal: Optional[CrawlJournal] = None,
+        talents: Optional[TalentStore] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.pool = pool
+        self.records = records
+        self.journal = journal
+        self.talents = talents
+        self.metrics = metrics or Metrics()
+
+    def talent(self, url: str, content_sha1: Optional[str]) -> Optional[Talent]:
+        """
+        Talento ya parseado, sin descargar ni parsear: del TalentStore (si el
+        HTML en cache no cambió) o, con --resume, del journal.
+        """
+        if self.talents:
+            record = self.talents.get(url, content_sha1)
+            if record is not None:
+                if self.journal:
+                    key = self.records and content_sha1 and self.records.key(
+                        parse_talent_page.__name__, content_sha1, (url,)
+                    )
+                    self.journal.done(url, key or None)
+                return record
+        return self.recall(url)
+
+    def recall(self, url: str):
+        """Registro de una URL terminada en la corrida anterior (solo con resume)"""
+        if not (self.journal and self.journal.resume and self.records):
+            return None
+        key = self.journal.result(url)
+        record = self.records.get(key) if key else None
+        if record is not None:
+            log(f"  [journal] {url}")
+        return record
+
+    def discover(self, urls: List[str], kind: str, hero: Optional[str] = None) -> None:
+        if self.journal:
+            self.journal.discover(urls, kind, hero)
+
+    def fail(self, url: str, error: BaseException) -> None:
+        if self.journal:
+            self.journal.fail(url, f"{type(error).__name__}: {error}")
+
+    def _done(
+        self,
+        key: Optional[str],
+        fn,
+        page: ParsedPage,
+        url: Optional[str],
+        result,
+        parsed: bool = True,
+    ) -> None:
+        if key and parsed:
+            self.records.put(key, fn.__name__, result)
+        # Se marca la URL pedida: page.url es la final si hubo un redirect
+        url = url or page.url
+        if self.journal and url:
+            self.journal.done(url, key)
+        if self.talents and url and fn is parse_talent_page:
+            self.talents.put(url, page.content_sha1, result)
+
+    def _key(self, fn, page: ParsedPage, fn_args: Tuple) -> Optional[str]:
+        if not self.records:
+            return None
+        return self.records.key(fn.__name__, page.content_sha1, fn_args)
+
+    def submit(self, fn, page: ParsedPage, *fn_args, url: Optional[str] = None):
+        """
+        Devuelve el registro, o un Future si se parsea en el pool. url es la
+        URL pedida (default: page.url); con ella se marcan journal y TalentStore.
+        """
+        key = self._key(fn, page, fn_args)
+        if key:
+            cached = self.records.get(key)
+            if cached is not None:
+                self._done(key, fn, page, url, cached, parsed=False)
+                return cached
+
+        if self.pool:
+            # Al pool solo viaja el HTML; el árbol se construye en el worker
+            t0 = time.perf_counter()
+            fut = self.pool.submit(fn, page.html, *fn_args)
+            fut.add_done_callback(
+                lambda f: self.metrics.observe("parse_pool", time.perf_counter() - t0)
+            )
+            fut.add_done_callback(
+                lambda f: f.exception() is None
+                and self._done(key, fn, page, url, f.result())
+            )
+            return fut
+
+        with self.metrics.time("parse"):
+            result = fn(page, *fn_args)
+        self._done(key, fn, page, url, result)
+        return result
+
+    async def arun(self, fn, page: ParsedPage, *fn_args, url: Optional[str] = None):
+        key = self._key(fn, page, fn_args)
+        if key:
+            cached = self.records.get(key)
+            if cached is not None:
+                self._done(key, fn, page, url, cached, parsed=False)
+                return cached
+
+        if self.pool:
+            with self.metrics.time("parse_pool"):
+                result = await self.pool.arun(fn, page.html, *fn_args)
+        else:
+            with self.metrics.time("parse"):
+                result = fn(page, *fn_args)
+        self._done(key, fn, page, url, result)
+        return result
+
+    def close(self) -> None:
+        if self.pool:
+            self.pool.close()
+        if self.records:
+            print(
+                f"[*] Cache de registros: {self.records.hits} hits, "
+                f"{self.records.misses} parseados"
+            )
+            self.metrics.inc("record_cache_hits", self.records.hits)
+            self.metrics.inc("record_cache_misses", self.records.misses)
+            self.records.close()
+        if self.talents:
+            print(
+                f"[*] Talentos: {self.talents.hits} reutilizados sin descargar, "
+                f"{self.talents.misses} procesados"
+            )
+            self.metrics.inc("talent_store_hits", self.talents.hits)
+            self.metrics.inc("talent_store_misses", self.talents.misses)
+            self.talents.close()
+        if self.journal:
+            self.journal.report()
+            self.journal.close()
+
+
+def cache_coverage(
+    fetcher: Fetcher, heroes: List[Tuple[str, str]], stage: ParseStage
+) -> Dict:
+    """
+    Cuánto del crawl de estos héroes se puede servir sin red (--offline):
+    páginas de habilidades en cache y, de cada una, sus talentos. La página
+    del héroe se parsea por el stage, así el crawl después la toma del cache
+    de registros.
+    """
+    missing_heroes: List[str] = []
+    missing_talents: Dict[str, List[str]] = {}
+    talents: Set[str] = set()
+    for hero_slug, hero_url in heroes:
+        at_url = build_abilities_talents_url(hero_url)
+        if fetcher.cached_sha1(at_url) is None:
+            missing_heroes.append(hero_slug)
+            continue
+        job = stage.submit(
+            parse_hero_page, fetcher.get_page(at_url), at_url, hero_slug, url=at_url
+        )
+        _, talent_urls = job.result() if isinstance(job, Future) else job
+        talents.update(talent_urls)
+        missing = [tu for tu in talent_urls if fetcher.cached_sha1(tu) is None]
+        if missing:
+            missing_talents[hero_slug] = missing
+
+    talents_missing = len({tu for urls in missing_talents.values() for tu in urls})
+    return {
+        "heroes": len(heroes),
+        "heroes_complete": len(heroes) - len(missing_heroes) - len(missing_talents),
+        "heroes_missing": missing_heroes,
+        "talents": len(talents),
+        "talents_cached": len(talents) - talents_missing,
+        "talents_missing": missing_talents,
+        "complete": not missing_heroes and not missing_talents,
+    }
+
+
+def print_coverage(coverage: Dict) -> None:
+    talents = coverage["talents"]
+    pct = coverage["talents_cached"] / talents if talents else 1.0
+    print(
+        f"[*] Cobertura del cache: {coverage['heroes_complete']}/{coverage['heroes']} héroes "
+        f"completos, {coverage['talents_cached']}/{talents} talentos ({pct:.1%})"
+    )
+    if coverage["heroes_missing"]:
+        print(
+            f"  sin página de habilidades: {', '.join(coverage['heroes_missing'][:10])}"
+            + (" ..." if len(coverage["heroes_missing"]) > 10 else "")
+        )
+    for hero_slug, urls in list(coverage["talents_missing"].items())[:10]:
+        names = ", ".join(u.rstrip("/").split("/")[-1] for u in urls)
+        print(f"  {hero_slug}: faltan {names}")
+    if len(coverage["talents_missing"]) > 10:
+        print(f"  ... y {len(coverage['talents_missing']) - 10} héroes más")
+
+
+def crawl_heroes(
+    fetcher: Fetcher,
+    heroes: List[Tuple[str, str]],
+    args: argparse.Namespace,
+    stage: Optional[ParseStage] = None,
+    emit: Optional[Callable[[HeroRecord], None]] = None,
+) -> Union[List[str], Tuple[List[HeroRecord], List[str]]]:
+    """
+    Crawl serial. Con emit, cada héroe se entrega apenas termina y se devuelven
+    solo los talentos fallidos; sin emit, devuelve (héroes, talentos fallidos).
+    """
+    stage = stage or ParseStage()
+    results: List[HeroRecord] = []
+    emit_hero = emit or results.append
+    # Talentos todavía en el pool; los terminados quedan en stage.talents
+    inflight: Dict[str, Future] = {}
+    failed_talents: List[str] = []
+    # Héroes descargados cuyos talentos siguen en el pool (se cierran en orden)
+    pending: Deque[
+        Tuple[str, str, HeroMeta, List[Tuple[str, Union[Talent, Future]]]]
+    ] = deque()
+
+    def finish_hero(
+        hero_slug: str,
+        at_url: str,
+        hero_meta: HeroMeta,
+        jobs: List[Tuple[str, Union[Talent, Future]]],
+    ) -> None:
+        talents: List[Talent] = []
+        for tu, job in jobs:
+            if not isinstance(job, Future):
+                talents.append(job)
+                continue
+            try:
+                t_data = job.result()
+            except Exception as e:
+                print(f"    [ERROR] Fallo al procesar talento {tu.split('/')[-1]}: {e}")
+                # Un talento compartido falla una vez por cada héroe que lo espera
+                if tu not in failed_talents:
+                    stage.fail(tu, e)
+                    failed_talents.append(tu)
+                if not args.skip_failed:
+                    raise
+                continue
+            talents.append(t_data)
+        emit_hero(build_hero_record(hero_slug, at_url, hero_meta, talents))
+
+    for i, (hero_slug, hero_url) in enumerate(heroes, 1 + args.start_from):
+        log(f"\n[{i}/{len(heroes)}] Procesando héroe: {hero_slug}", 1)
+
+        at_url = build_abilities_talents_url(hero_url)
+        job = stage.recall(at_url)
+        if job is None:
+            try:
+                at_page = fetcher.get_page(at_url)
+            except Exception as e:
+                print(f"  [ERROR] No se pudo obtener página de habilidades: {e}")
+                stage.fail(at_url, e)
+                if not args.skip_failed:
+                    raise
+                continue
+
+            # Hace falta la lista de talentos para seguir: se espera este resultado,
+            # mientras los talentos del héroe anterior siguen parseándose
+            job = stage.submit(parse_hero_page, at_page, at_url, hero_slug, url=at_url)
+        hero_meta, talent_urls = job.result() if isinstance(job, Future) else job
+        stage.discover(talent_urls, "talent", hero_slug)
+        log(f"  Encontrados {len(talent_urls)} talentos")
+
+        jobs: List[Tuple[str, Union[Talent, Future]]] = []
+        for j, tu in enumerate(talent_urls, 1):
+            log(f"  [{j}/{len(talent_urls)}] {tu.split('/')[-1]}")
+
+            job = inflight.get(tu) or stage.talent(tu, fetcher.cached_sha1(tu))
+            if job is None:
+                try:
+                    t_page = fetcher.get_page(tu)
+                    job = stage.submit(parse_talent_page, t_page, tu, url=tu)
+                except Exception as e:
+                    print(f"    [ERROR] Fallo al procesar talento: {e}")
+                    if tu not in failed_talents:
+                        stage.fail(tu, e)
+                        failed_talents.append(tu)
+                    if not args.skip_failed:
+                        raise
+                    continue
+                if isinstance(job, Future):
+                    inflight[tu] = job
+                    job.add_done_callback(lambda _, tu=tu: inflight.pop(tu, None))
+
+            jobs.append((tu, job))
+
+        pending.append((hero_slug, at_url, hero_meta, jobs))
+        # Deja un héroe en vuelo para solapar su parseo con la descarga del siguiente
+        while len(pending) > (1 if stage.pool else 0):
+            finish_hero(*pending.popleft())
+
+    while pending:
+        finish_hero(*pending.popleft())
+
+    return failed_talents if emit else (results, failed_talents)
+
+
+async def crawl_heroes_async(
+    fetcher: AsyncFetcher,
+    heroes: List[Tuple[str, str]],
+    args: argparse.Namespace,
+    stage: Optional[ParseStage] = None,
+    emit: Optional[Callable[[HeroRecord], None]] = None,
+) -> Union[List[str], Tuple[List[HeroRecord], List[str]]]:
+    """
+    Igual que crawl_heroes, pero todos los héroes y talentos se descargan en
+    paralelo (limitado por fetcher.concurrency y su RateBudget). El orden del
+    resultado es el mismo que el del modo serial: un héroe que termina antes
+    que los anteriores espera en `done` hasta que le toque.
+    """
+    import asyncio
+
+    # Un talento compartido por varios héroes se descarga una sola vez: mientras
+    # está en vuelo se comparte la tarea, después sale de stage.talents
+    talent_tasks: Dict[str, asyncio.Task] = {}
+    failed_talents: List[str] = []
+    stage = stage or ParseStage()
+    results: List[HeroRecord] = []
+    emit_hero = emit or results.append
+    done: Dict[int, Optional[HeroRecord]] = {}
+    next_index = 1 + args.start_from
+
+    def finish_hero(i: int, record: Optional[HeroRecord]) -> None:
+        nonlocal next_index
+        done[i] = record
+        while next_index in done:
+            ready = done.pop(next_index)
+            if ready is not None:
+                emit_hero(ready)
+            next_index += 1
+
+    async def fetch_talent(tu: str) -> Talent:
+        record = stage.talent(tu, fetcher.cached_sha1(tu))
+        if record is not None:
+            return record
+        t_page = await fetcher.aget_page(tu)
+        return await stage.arun(parse_talent_page, t_page, tu, url=tu)
+
+    async def process_hero(i: int, hero_slug: str, hero_url: str) -> None:
+        finish_hero(i, await crawl_hero(i, hero_slug, hero_url))
+
+    async def crawl_hero(i: int, hero_slug: str, hero_url: str) -> Optional[HeroRecord]:
+        at_url = build_abilities_talents_url(hero_url)
+        recalled = stage.recall(at_url)
+        if recalled is not None:
+            hero_meta, talent_urls = recalled
+        else:
+            try:
+                at_page = await fetcher.aget_page(at_url)
+            except Exception as e:
+                print(f"  [ERROR] {hero_slug}: no se pudo obtener página de habilidades: {e}")
+                stage.fail(at_url, e)
+                if not args.skip_failed:
+                    raise
+                return None
+
+            hero_meta, talent_urls = await stage.arun(
+                parse_hero_page, at_page, at_url, hero_slug, url=at_url
+            )
+        stage.discover(talent_urls, "talent", hero_slug)
+        log(f"[{i}/{len(heroes)}] {hero_slug}: {len(talent_urls)} talentos", 1)
+
+        for tu in talent_urls:
+            if tu not in talent_tasks:
+                task = asyncio.ensure_future(fetch_talent(tu))
+                task.add_done_callback(lambda _, tu=tu: talent_tasks.pop(tu, None))
+                talent_tasks[tu] = task
+
+        talents: List[Talent] = []
+        outcomes = await asyncio.gather(
+            *(talent_tasks.get(tu) or fetch_talent(tu) for tu in talent_urls),
+            return_exceptions=True,
+        )
+        for tu, outcome in zip(talent_urls, outcomes):
+            if isinstance(outcome, BaseException):
+                print(f"    [ERROR] {tu.split('/')[-1]}: fallo al procesar talento: {outcome}")
+                if tu not in failed_talents:
+                    stage.fail(tu, outcome)
+                    failed_talents.append(tu)
+                if not args.skip_failed:
+                    raise outcome
+                continue
+            talents.append(outcome)
+
+        return build_hero_record(hero_slug, at_url, hero_meta, talents)
+
+    await asyncio.gather(
+        *(
+            process_hero(i, hero_slug, hero_url)
+            for i, (hero_slug, hero_url) in enumerate(heroes, 1 + args.start_from)
+        )
+    )
+    return failed_talents if emit else (results, failed_talents)
+
+
+# ----------------------------
+# Cola de trabajo compartida (modo --queue)
+# ----------------------------
+
+class WorkQueue:
+    """
+    Cola de URLs compartida por varios procesos o máquinas, en un SQLite
+    sobre un volumen compartido.
+
+    El coordinador siembra una tarea por héroe (con su posición en la lista);
+    cada worker reclama tareas con un lease de `lease` segundos, que renueva
+    mientras trabaja. Una tarea de héroe agrega las de sus talentos (una sola
+    por URL aunque la compartan varios héroes). Si un worker muere, su lease
+    vence y otro retoma la tarea, hasta max_attempts veces. Una tarea que
+    falla después de los reintentos del Fetcher queda 'failed', igual que en
+    una corrida de un solo proceso.
+    Los registros parseados se guardan en la cola y el merge arma con ellos
+    la misma salida que una corrida de un solo proceso.
+
+    La tabla meta guarda el presupuesto de ritmo global (SharedRateBudget).
+    Usa el journal de rollback y no WAL: WAL necesita memoria compartida y no
+    funciona en volúmenes de red; los locks de archivo de SQLite sí.
+    """
+
+    STATUSES = ("pending", "leased", "done", "failed")
+
+    def __init__(self, path: Path, lease: float = 300.0, max_attempts: int = 3):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Transacciones explícitas: los reclamos van con BEGIN IMMEDIATE
+        self.db = sqlite3.connect(
+            str(path), timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self.db.execute("PRAGMA journal_mode=DELETE")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                hero TEXT,
+                idx INTEGER,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                lease_until REAL,
+                error TEXT,
+                result BLOB
+            )
+            """
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+    @contextmanager
+    def _tx(self):
+        """Transacción de escritura: toma el lock del archivo desde el principio"""
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.db
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+    def _meta(self, db, key: str, default: str = "") -> str:
+        row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, db, **values) -> None:
+        db.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(k, str(v)) for k, v in values.items()],
+        )
+
+    def seed(
+        self,
+        heroes: List[Tuple[str, str]],
+        min_sleep: float,
+        max_sleep: float,
+        resume: bool = False,
+    ) -> None:
+        """
+        Carga los héroes a crawlear y el presupuesto global. Sin resume la
+        cola se vacía; con resume se conservan las tareas terminadas y las
+        fallidas vuelven a 'pending'.
+        """
+        with self._tx() as db:
+            if resume:
+                db.execute(
+                    "UPDATE tasks SET status = 'pending', attempts = 0, error = NULL "
+                    "WHERE status = 'failed'"
+                )
+            else:
+                db.execute("DELETE FROM tasks")
+                db.execute("DELETE FROM meta")
+            db.executemany(
+                "INSERT OR IGNORE INTO tasks (url, kind, hero, idx) VALUES (?, 'hero', ?, ?)",
+                [
+                    (build_abilities_talents_url(hero_url), slug, i)
+                    for i, (slug, hero_url) in enumerate(heroes)
+                ],
+            )
+            self._set_meta(
+                db, seeded=1, min_sleep=max(0.0, min_sleep), max_sleep=max(0.0, max_sleep)
+            )
+
+    @property
+    def seeded(self) -> bool:
+        with self._lock:
+            return self._meta(self.db, "seeded") == "1"
+
+    def add_talents(self, urls: List[str], hero: str) -> None:
+        with self._tx() as db:
+            db.executemany(
+                "INSERT OR IGNORE INTO tasks (url, kind, hero) VALUES (?, 'talent', ?)",
+                [(u, hero) for u in urls],
+            )
+
+    def claim(self, owner: str) -> Optional[Tuple[str, str, str]]:
+        """Reclama la próxima tarea libre o con lease vencido: (url, kind, hero)"""
+        now = time.time()
+        with self._tx() as db:
+            # Leases vencidos sin intentos restantes: el worker murió con la tarea
+            db.execute(
+                "UPDATE tasks SET status = 'failed', owner = NULL, "
+                "error = COALESCE(error, 'lease vencido') "
+                "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = db.execute(
+                "SELECT url, kind, hero FROM tasks "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) "
+                "ORDER BY rowid LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE tasks SET status = 'leased', owner = ?, lease_until = ?, "
+                "attempts = attempts + 1 WHERE url = ?",
+                (owner, now + self.lease, row[0]),
+            )
+        return row
+
+    def renew(self, owner: str) -> None:
+        """Extiende los leases de las tareas que el worker sigue procesando"""
+        with self._tx() as db:
+            db.execute(
+                "UPDATE tasks SET lease_until = ? WHERE owner = ? AND status = 'leased'",
+                (time.time() + self.lease, owner),
+            )
+
+    def complete(self, url: str, value) -> None:
+        data = encode_record(value)
+        with self._tx() as db:
+            db.execute(
+                "UPDATE tasks SET status = 'done', owner = NULL, error = NULL, result = ? "
+                "WHERE url = ? AND status != 'done'",
+                (data, url),
+            )
+
+    def fail(self, url: str, error: str) -> None:
+        with self._tx() as db:
+            db.execute(
+                "UPDATE tasks SET status = 'failed', owner = NULL, error = ? "
+                "WHERE url = ? AND status != 'done'",
+                (error, url),
+            )
+
+    def release(self, owner: str) -> None:
+        """Devuelve a 'pending' las tareas de un worker que se detiene sin terminarlas"""
+        with self._tx() as db:
+            db.execute(
+                "UPDATE tasks SET status = 'pending', owner = NULL, attempts = attempts - 1 "
+                "WHERE owner = ? AND status = 'leased'",
+                (owner,),
+            )
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """{kind: {status: cantidad}}"""
+        out: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status"
+            ).fetchall()
+        for kind, status, n in rows:
+            out.setdefault(kind, dict.fromkeys(self.STATUSES, 0))[status] = n
+        return out
+
+    def drained(self) -> bool:
+        """Sembrada y sin tareas pendientes ni en proceso"""
+        with self._lock:
+            busy = self.db.execute(
+                "SELECT 1 FROM tasks WHERE status IN ('pending', 'leased') LIMIT 1"
+            ).fetchone()
+            return busy is None and self._meta(self.db, "seeded") == "1"
+
+    def heroes(self) -> List[Tuple[str, str, str, Optional[str], Optional[bytes]]]:
+        """Tareas de héroe en el orden de la lista: (slug, url, estado, error, registro)"""
+        with self._lock:
+            return self.db.execute(
+                "SELECT hero, url, status, error, result FROM tasks "
+                "WHERE kind = 'hero' ORDER BY idx"
+            ).fetchall()
+
+    def talents(self) -> Dict[str, Tuple[str, Optional[str], Optional[bytes]]]:
+        """{url: (estado, error, registro)} de todas las tareas de talento"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT url, status, error, result FROM tasks WHERE kind = 'talent'"
+            ).fetchall()
+        return {url: (status, error, result) for url, status, error, result in rows}
+
+    def budget(self) -> Tuple[float, float]:
+        """(min_sleep, max_sleep) del presupuesto global"""
+        with self._lock:
+            return (
+                float(self._meta(self.db, "min_sleep", "0")),
+                float(self._meta(self.db, "max_sleep", "0")),
+            )
+
+    def reserve_slot(self, min_s: float, max_s: float) -> Tuple[float, float, float]:
+        """
+        Reserva el próximo turno del presupuesto global: (espera, turno, intervalo).
+        Los turnos se guardan en hora de pared, la única común a todas las
+        máquinas (hace falta que tengan el reloj sincronizado).
+        """
+        with self._tx() as db:
+            now = time.time()
+            slot = max(now, float(self._meta(db, "next_slot", "0")))
+            interval = random.uniform(min_s, max_s)
+            self._set_meta(db, next_slot=slot + interval)
+        return slot - now, slot, interval
+
+    def refund_slot(self, slot: float, interval: float) -> None:
+        """Devuelve el turno solo si nadie reservó otro después (ver RateBudget.refund)"""
+        with self._tx() as db:
+            if float(self._meta(db, "next_slot", "0")) == slot + interval:
+                self._set_meta(db, next_slot=max(time.time(), slot))
+
+    def defer(self, seconds: float) -> None:
+        """Corre el próximo turno de todos (p.ej. el Retry-After de un 429)"""
+        with self._tx() as db:
+            next_slot = float(self._meta(db, "next_slot", "0"))
+            self._set_meta(db, next_slot=max(next_slot, time.time() + seconds))
+
+    def report(self) -> None:
+        print(f"[*] Cola de trabajo ({self.path}):")
+        for kind, counts in self.counts().items():
+            total = sum(counts.values())
+            detail = ", ".join(f"{counts[st]} {st}" for st in self.STATUSES)
+            print(f"  {kind:<12} {total:>5} URLs: {detail}")
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
+
+
+class SharedRateBudget:
+    """
+    RateBudget cuyo próximo turno vive en la WorkQueue: el ritmo
+    ~1 / media(min_s, max_s) req/s es el total de todos los workers, no el
+    de cada uno. Un Retry-After también frena a todos (defer).
+
+    Cada operación es una transacción SQLite que puede esperar el lock del
+    archivo: corren en un hilo para no frenar los requests en vuelo.
+    """
+
+    def __init__(self, queue: WorkQueue):
+        self.queue = queue
+        self.min_s, self.max_s = queue.budget()
+        self._deferring: Set = set()
+
+    @property
+    def requests_per_second(self) -> float:
+        mean = (self.min_s + self.max_s) / 2
+        return 1.0 / mean if mean > 0 else float("inf")
+
+    async def acquire(self) -> Optional[Tuple[float, float]]:
+        import asyncio
+
+        if self.max_s <= 0:
+            return None
+        delay, slot, interval = await asyncio.to_thread(
+            self.queue.reserve_slot, self.min_s, self.max_s
+        )
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return slot, interval
+
+    async def refund(self, reservation: Tuple[float, float]) -> None:
+        import asyncio
+
+        await asyncio.to_thread(self.queue.refund_slot, *reservation)
+
+    def defer(self, seconds: float) -> None:
+        """
+        Lo llama _failed_attempt, que es sync: la transacción queda en una
+        tarea de fondo (ver flush)
+        """
+        import asyncio
+
+        task = asyncio.ensure_future(asyncio.to_thread(self.queue.defer, seconds))
+        self._deferring.add(task)
+        task.add_done_callback(self._deferring.discard)
+
+    async def flush(self) -> None:
+        """Espera los defer pendientes, antes de cerrar la cola"""
+        import asyncio
+
+        if self._deferring:
+            await asyncio.gather(*self._deferring, return_exceptions=True)
+
+
+# Pausa de un worker sin tareas libres mientras otros terminan las suyas
+QUEUE_POLL_S = 0.5
+
+
+async def work_queue(
+    queue: WorkQueue, fetcher: AsyncFetcher, stage: ParseStage
+) -> Counter:
+    """
+    Worker: reclama tareas hasta que la cola se vacía, con hasta
+    fetcher.concurrency en vuelo y el presupuesto global de la cola.
+    Devuelve cuántas tareas terminó y cuántas fallaron.
+    """
+    import asyncio
+    import socket
+
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    budget = fetcher.budget = SharedRateBudget(queue)
+    done: Counter = Counter()
+
+    async def run(url: str, kind: str, hero: str):
+        if kind == "hero":
+            page = await fetcher.aget_page(url)
+            hero_meta, talent_urls = await stage.arun(
+                parse_hero_page, page, url, hero, url=url
+            )
+            await asyncio.to_thread(queue.add_talents, talent_urls, hero)
+            log(f"[{hero}] {len(talent_urls)} talentos", 1)
+            return hero_meta, talent_urls
+        record = stage.talent(url, fetcher.cached_sha1(url))
+        if record is None:
+            page = await fetcher.aget_page(url)
+            record = await stage.arun(parse_talent_page, page, url, url=url)
+        log(f"  [{hero}] {url.split('/')[-1]}")
+        return record
+
+    async def loop() -> None:
+        while True:
+            task = await asyncio.to_thread(queue.claim, owner)
+            if task is None:
+                if await asyncio.to_thread(queue.drained):
+                    return
+                await asyncio.sleep(QUEUE_POLL_S)
+                continue
+            url, kind, hero = task
+            try:
+                value = await run(url, kind, hero)
+            except Exception as e:
+                print(f"  [ERROR] {kind} {url.split('/')[-1]}: {e}")
+                done["failed"] += 1
+                await asyncio.to_thread(queue.fail, url, f"{type(e).__name__}: {e}")
+                continue
+            await asyncio.to_thread(queue.complete, url, value)
+            done[kind] += 1
+
+    async def heartbeat() -> None:
+        while True:
+            await asyncio.sleep(queue.lease / 3)
+            await asyncio.to_thread(queue.renew, owner)
+
+    beat = asyncio.ensure_future(heartbeat())
     try:
-        with csv_path.open("r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                slug = row.get("hero_slug")
-                if slug:
-                    existing_slugs.add(slug)
-        print(f"[*] Encontrados {len(existing_slugs)} héroes existentes en CSV")
-    except Exception as e:
-        print(f"[!] Error al leer CSV existente: {e}")
+        await asyncio.gather(*(loop() for _ in range(max(1, fetcher.concurrency))))
+        await budget.flush()
+    finally:
+        beat.cancel()
+        # Interrumpido (Ctrl-C, error): otro worker las toma sin esperar el lease
+        queue.release(owner)
+    return done
+
+
+def merge_queue(
+    queue: WorkQueue, args: argparse.Namespace, emit: Callable[[HeroRecord], None]
+) -> List[str]:
+    """
+    Arma los héroes con los registros de la cola, en el orden de la lista,
+    igual que crawl_heroes: sin --skip-failed el primer fallo corta.
+    Devuelve los talentos fallidos.
+    """
+    talents = queue.talents()
+    failed_talents: List[str] = []
+    for hero_slug, at_url, status, error, data in queue.heroes():
+        if status != "done":
+            print(f"  [ERROR] {hero_slug}: no se pudo obtener página de habilidades: {error}")
+            if not args.skip_failed:
+                raise RuntimeError(f"{at_url}: {error}")
+            continue
+        hero_meta, talent_urls = decode_record(parse_hero_page.__name__, data)
+
+        hero_talents: List[Talent] = []
+        for tu in talent_urls:
+            t_status, t_error, t_data = talents.get(tu, ("pending", None, None))
+            if t_status != "done":
+                print(f"    [ERROR] {tu.split('/')[-1]}: fallo al procesar talento: {t_error}")
+                if tu not in failed_talents:
+                    failed_talents.append(tu)
+                if not args.skip_failed:
+                    raise RuntimeError(f"{tu}: {t_error}")
+                continue
+            hero_talents.append(decode_record(parse_talent_page.__name__, t_data))
+        emit(build_hero_record(hero_slug, at_url, hero_meta, hero_talents))
+    return failed_talents
+
+
+# ----------------------------
+# Main
+# ----------------------------
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(value: str) -> float:
+    """'90', '30m', '12h', '7d' -> segundos"""
+    value = value.strip().lower()
+    unit = DURATION_UNITS.get(value[-1:])
+    try:
+        return float(value[:-1]) * unit if unit else float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Duración inválida: {value}")
+
+
+def cache_main(argv: List[str]) -> None:
+    """Subcomando "cache": export / import del cache HTML como un solo archivo"""
+    ap = argparse.ArgumentParser(
+        prog="extract_heroesfire_wikibase.py cache",
+        description="Empaqueta el cache HTML en un solo archivo o lo restaura.",
+    )
+    sub = ap.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Empaqueta el cache en un pack")
+    export.add_argument("pack", help="Archivo de salida (ej: heroesfire-cache.hfpack)")
+    export.add_argument("--cache-dir", default=".cache/heroesfire", help="Directorio cache HTML")
+    imp = sub.add_parser("import", help="Agrega al cache las páginas de un pack")
+    imp.add_argument("pack", help="Pack creado con 'cache export'")
+    imp.add_argument("--cache-dir", default=".cache/heroesfire", help="Directorio cache HTML")
+    imp.add_argument(
+        "--cache-compression",
+        choices=CACHE_COMPRESSIONS,
+        default="auto",
+        help="Compresión de las páginas importadas",
+    )
+    stats = sub.add_parser("stats", help="Resume el contenido del cache (solo lectura)")
+    stats.add_argument("--cache-dir", default=".cache/heroesfire", help="Directorio cache HTML")
+    stats.add_argument("--cache-pack", default="", help="Resumir también este pack")
+    stats.add_argument("--json", action="store_true", help="Imprime el resumen como JSON")
+    args = ap.parse_args(argv)
+
+    if args.command == "stats":
+        try:
+            summary = cache_stats(
+                Path(args.cache_dir), Path(args.cache_pack) if args.cache_pack else None
+            )
+        except (OSError, ValueError) as e:
+            ap.error(str(e))
+        if args.json:
+            print(json.dumps(summary, ensure_ascii=False, indent=2))
+        else:
+            print_cache_stats(summary)
+        return
+
+    if args.command == "export":
+        cache = HtmlCache(Path(args.cache_dir), read_only=True)
+        try:
+            pages, size = CachePack.export(cache, Path(args.pack))
+        finally:
+            cache.close()
+        print(f"[✓] {pages} páginas ({size / 1e6:.1f} MB) empaquetadas en {args.pack}")
+        return
+
+    try:
+        pack = CachePack(Path(args.pack))
+    except (OSError, ValueError) as e:
+        ap.error(str(e))
+    cache = HtmlCache(Path(args.cache_dir), compression=args.cache_compression)
+    try:
+        imported, skipped = cache.import_pack(pack)
+        cache.train_dict()
+    finally:
+        pack.close()
+        cache.close()
+    print(
+        f"[✓] {imported} páginas importadas a {args.cache_dir} "
+        f"({skipped} ya estaban con una descarga igual o más nueva)"
+    )
+
+
+def _sqlite_rows(path: Path, table: str) -> Optional[int]:
+    """Filas de una tabla de un SQLite del cache, abierto solo lectura (None si no está)"""
+    if not path.exists():
+        return None
+    try:
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            db.close()
+    except sqlite3.Error:
+        return None
+
+
+def cache_stats(root: Path, pack_path: Optional[Path] = None) -> Dict:
+    """
+    Resumen del cache sin modificarlo: el manifest y los demás SQLite se
+    abren en modo solo lectura y no se crea nada si el directorio está vacío
+    (HtmlCache crearía el manifest al abrirlo).
+    """
+    summary: Dict = {"cache_dir": str(root), "codecs": {}, "pages": 0, "size": 0, "raw_size": 0}
+    manifest = root / HtmlCache.MANIFEST
+    if manifest.exists():
+        db = sqlite3.connect(f"file:{manifest}?mode=ro", uri=True)
+        try:
+            for codec, pages, size, raw_size in db.execute(
+                "SELECT codec, COUNT(*), SUM(size), SUM(raw_size) FROM pages GROUP BY codec"
+            ):
+                summary["codecs"][codec] = {"pages": pages, "size": size, "raw_size": raw_size}
+                summary["pages"] += pages
+                summary["size"] += size
+                summary["raw_size"] += raw_size
+            oldest, newest = db.execute(
+                "SELECT MIN(fetched_at), MAX(fetched_at) FROM pages"
+            ).fetchone()
+            summary["oldest"], summary["newest"] = oldest, newest
+        finally:
+            db.close()
+
+    legacy = [p.stat().st_size for p in HtmlCache.legacy_files(root)]
+    summary["legacy"] = {"pages": len(legacy), "size": sum(legacy)}
+    dicts = [p.stat().st_size for p in root.glob(HtmlCache.DICT_GLOB)] if root.is_dir() else []
+    summary["zstd_dicts"] = {"count": len(dicts), "size": sum(dicts)}
+
+    summary["stores"] = {}
+    stores = [(root / RecordCache.FILE, "records"), (root / TalentStore.FILE, "talents")]
+    if root.is_dir():
+        stores += [(path, "urls") for path in sorted(root.glob(CrawlJournal.FILE_PATTERN))]
+    for path, table in stores:
+        if path.exists():
+            summary["stores"][path.name] = {
+                "size": path.stat().st_size,
+                "rows": _sqlite_rows(path, table),
+            }
+
+    if pack_path:
+        pack = CachePack(pack_path)
+        try:
+            codecs: Counter = Counter()
+            size = raw_size = 0
+            for i in range(pack.count):
+                _, _, length, raw, codec, _, _ = pack._record(i)
+                codecs[CachePack.CODECS[codec]] += 1
+                size += length
+                raw_size += raw
+        finally:
+            pack.close()
+        summary["pack"] = {
+            "path": str(pack_path),
+            "pages": sum(codecs.values()),
+            "codecs": dict(codecs),
+            "size": size,
+            "raw_size": raw_size,
+            "file_size": pack_path.stat().st_size,
+        }
+    return summary
+
+
+def print_cache_stats(summary: Dict) -> None:
+    def mb(n: int) -> str:
+        return f"{n / 1e6:.1f} MB"
+
+    def when(ts: Optional[float]) -> str:
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)) if ts else "-"
+
+    print(f"[cache] {summary['cache_dir']}")
+    if summary["pages"]:
+        ratio = summary["raw_size"] / summary["size"] if summary["size"] else 0
+        print(
+            f"  páginas           {summary['pages']:8d}  {mb(summary['size'])} en disco, "
+            f"{mb(summary['raw_size'])} sin comprimir ({ratio:.1f}x)"
+        )
+        for codec, c in sorted(summary["codecs"].items()):
+            print(f"    {codec:<15} {c['pages']:8d}  {mb(c['size'])}")
+        print(f"  descargadas       {when(summary['oldest'])} .. {when(summary['newest'])}")
+    else:
+        print("  páginas                  0  (sin manifest)")
+    legacy = summary["legacy"]
+    if legacy["pages"]:
+        print(
+            f"  archivos planos   {legacy['pages']:8d}  {mb(legacy['size'])} "
+            "(layout anterior; se migran con --cache-migrate)"
+        )
+    dicts = summary["zstd_dicts"]
+    if dicts["count"]:
+        print(f"  diccionarios zstd {dicts['count']:8d}  {dicts['size'] / 1e3:.0f} KB")
+    for name, store in summary["stores"].items():
+        rows = "?" if store["rows"] is None else store["rows"]
+        print(f"  {name:<17} {rows:>8}  {mb(store['size'])}")
+    pack = summary.get("pack")
+    if pack:
+        codecs = ", ".join(f"{n} {c}" for c, n in sorted(pack["codecs"].items()))
+        print(
+            f"[cache] pack {pack['path']}: {pack['pages']} páginas ({codecs}), "
+            f"{mb(pack['file_size'])}, {mb(pack['raw_size'])} sin comprimir"
+        )
+
+
+def export_main(argv: List[str]) -> None:
+    """
+    Subcomando "export": convierte una salida existente (heroes.json,
+    heroes.jsonl o su carpeta) a otro formato con los mismos writers del
+    crawl. No abre el cache ni importa requests, bs4 ni asyncio.
+    """
+    ap = argparse.ArgumentParser(
+        prog="extract_heroesfire_wikibase.py export",
+        description="Convierte una salida existente a JSON, JSONL, CSV, Parquet o Arrow.",
+    )
+    ap.add_argument("src", help="heroes.jsonl, heroes.json o la carpeta de una salida anterior")
+    ap.add_argument(
+        "--out",
+        required=True,
+        help="Archivo (.json/.jsonl/.csv/.parquet/.arrow) o carpeta de salida",
+    )
+    ap.add_argument(
+        "--format",
+        choices=["auto", *OUTPUT_WRITERS],
+        default="auto",
+        help="Formato de salida (auto = según la extensión de --out)",
+    )
+    ap.add_argument(
+        "--shards", action="store_true", help="Además escribe un JSON por héroe en <out>/heroes/"
+    )
+    args = ap.parse_args(argv)
 
-    return existing_slugs
+    src, out_path = Path(args.src), Path(args.out)
+    if not src.exists():
+        ap.error(f"No existe {src}")
+    fmt = args.format
+    if fmt == "auto":
+        fmt = (
+            out_path.suffix.lower().lstrip(".")
+            if out_path.suffix.lower() in OUTPUT_SUFFIXES
+            else "json"
+        )
+    columnar = fmt if fmt in COLUMNAR_FORMATS else out_path.suffix.lower()[1:]
+    if columnar in COLUMNAR_FORMATS:
+        check_pyarrow(columnar)
+    # Los writers escriben en <archivo>.tmp y renombran al cerrar, así que
+    # --out puede ser la misma salida que se está leyendo
+    sink = open_outputs(out_path, fmt, shards=args.shards)
+    try:
+        for data in iter_heroes(src):
+            sink.write_hero(HeroRecord.from_dict(data))
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"[!] No se pudo leer {src}: {e}")
+    finally:
+        sink.close()
+    print(f"[✓] {sink.count} héroes exportados a {out_path}")
+
+
+def select_heroes(
+    fetcher: Fetcher,
+    stage: ParseStage,
+    args: argparse.Namespace,
+    out_path: Path,
+    wanted: List[str],
+) -> List[Tuple[str, str]]:
+    """Lista de héroes del sitio con los filtros de la línea de comandos aplicados"""
+    print(f"[*] Obteniendo lista de héroes...")
+    stage.discover([HEROES_LIST_URL], "heroes_list")
+    # Con --resume la lista sale del journal: los índices no se corren aunque
+    # el sitio haya agregado héroes
+    job = stage.recall(HEROES_LIST_URL)
+    if job is None:
+        try:
+            list_page = fetcher.get_page(HEROES_LIST_URL)
+        except CacheMiss as e:
+            stage.close()
+            raise SystemExit(f"[!] {e}")
+        job = stage.submit(parse_heroes_list, list_page, url=HEROES_LIST_URL)
+    heroes = job.result() if isinstance(job, Future) else job
+    print(f"[*] Encontrados {len(heroes)} héroes")
 
+    if wanted:
+        heroes = [h for h in heroes if h[0] in wanted]
+        print(f"[*] Filtrando a {len(heroes)} héroes específicos")
 
-def load_existing_hero_slugs_from_json(json_path: Path) -> Set[str]:
-    """Carga los slugs de héroes que ya están en JSON/JSONL"""
-    if not json_path.exists():
-        return set()
+    # Skip existing heroes if requested
+    existing_slugs: Set[str] = set()
+    if args.skip_existing:
+        # Determinar qué archivo verificar
+        if out_path.suffix.lower() in OUTPUT_SUFFIXES:
+            check_path = out_path
+        else:
+            # Es una carpeta, verificar los archivos dentro
+            check_path = out_path / "talents.csv"
+            if not check_path.exists():
+                check_path = out_path / "heroes.json"
+            if not check_path.exists():
+                check_path = out_path / "heroes.jsonl"
 
-    existing_slugs = set()
-    try:
-        if json_path.suffix.lower() == ".jsonl":
-            with json_path.open("r", encoding="utf-8") as f:
-                for line in f:
-                    if line.strip():
-                        data = json.loads(line)
-                        slug = data.get("slug")
-                        if slug:
-                            existing_slugs.add(slug)
-        else:  # .json
-            data = json.loads(json_path.read_text(encoding="utf-8"))
-            if isinstance(data, list):
-                for hero in data:
-                    slug = hero.get("slug")
-                    if slug:
-                        existing_slugs.add(slug)
+        if check_path.exists():
+            if check_path.suffix.lower() == ".csv":
+                existing_slugs = load_existing_hero_slugs_from_csv(check_path)
+            elif check_path.suffix.lower() in (".json", ".jsonl"):
+                existing_slugs = load_existing_hero_slugs_from_json(check_path)
+            else:
+                existing_slugs = load_existing_hero_slugs_from_columnar(check_path)
 
-        print(f"[*] Encontrados {len(existing_slugs)} héroes existentes en JSON")
-    except Exception as e:
-        print(f"[!] Error al leer JSON existente: {e}")
+            if existing_slugs:
+                before_count = len(heroes)
+                heroes = [h for h in heroes if h[0] not in existing_slugs]
+                skipped = before_count - len(heroes)
+                print(
+                    f"[*] Saltando {skipped} héroes existentes, quedan {len(heroes)} por procesar"
+                )
 
-    return existing_slugs
+    if args.limit and args.limit > 0:
+        heroes = heroes[: args.limit]
+        print(f"[*] Limitando a {len(heroes)} héroes")
 
+    if args.start_from > 0:
+        heroes = heroes[args.start_from :]
+        print(f"[*] Comenzando desde héroe #{args.start_from}")
 
-# ----------------------------
-# Main
-# ----------------------------
+    return heroes
 
 
-def main():
+def crawl_main(argv: List[str], command: str = "crawl") -> Optional[Metrics]:
+    """
+    Subcomando "crawl" (el default): lista de héroes, páginas y talentos,
+    parseo y salida. "parse" es el mismo camino forzado a --offline: arma la
+    salida desde el cache HTML (o un pack) sin ir a la red.
+    """
+    if command == "parse":
+        description = (
+            "Arma la salida desde el cache HTML (o --cache-pack) sin ir a la red; "
+            "equivale a 'crawl --offline'."
+        )
+    else:
+        description = "Extrae héroes + talentos desde HeroesFire HotS WikiBase."
     ap = argparse.ArgumentParser(
-        description="Extrae héroes + talentos desde HeroesFire HotS WikiBase."
+        prog=f"extract_heroesfire_wikibase.py {command}",
+        description=description,
+        epilog=(
+            "Subcomandos: crawl (default, se puede omitir), parse (desde el cache, sin red), "
+            "export (convierte una salida existente a otros formatos) y cache "
+            "(export / import / stats); ver '<subcomando> -h'."
+        ),
     )
     ap.add_argument(
         "--out",
-        required=True,
         help="Ruta de salida: carpeta o archivo (.json/.jsonl/.csv)",
     )
     ap.add_argument(
@@ -663,15 +5739,181 @@ def main():
         "--max-sleep", type=float, default=4.0, help="Sleep máximo entre requests"
     )
     ap.add_argument("--timeout", type=float, default=30.0, help="Timeout HTTP")
+    ap.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help=(
+            "Requests en paralelo (1 = modo serial). Con N > 1, --min-sleep/--max-sleep "
+            "pasan a ser un presupuesto global de requests/segundo compartido"
+        ),
+    )
+    ap.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default="requests",
+        help=(
+            "Cliente HTTP: requests (HTTP/1.1, una conexión por request en vuelo) o "
+            "http2 (httpx, requests multiplexados por una conexión al sitio; "
+            "necesita pip install 'httpx[http2]')"
+        ),
+    )
+    ap.add_argument(
+        "--max-connections",
+        type=int,
+        default=0,
+        help=(
+            "Tope del pool de conexiones del transporte (0 = --concurrency con requests, "
+            "4 con http2: una por host)"
+        ),
+    )
+    ap.add_argument(
+        "--adaptive-rps",
+        type=float,
+        default=0,
+        help=(
+            "Ritmo adaptativo (AIMD) con techo de N req/s: reemplaza a --min-sleep/--max-sleep "
+            "y al backoff fijo, respeta Retry-After y con --concurrency ajusta también los "
+            "requests en vuelo hasta ese techo (0 = desactivado)"
+        ),
+    )
     ap.add_argument(
         "--cache-dir", default=".cache/heroesfire", help="Directorio cache HTML"
     )
     ap.add_argument("--no-cache", action="store_true", help="Desactiva cache")
+    ap.add_argument(
+        "--cache-compression",
+        choices=CACHE_COMPRESSIONS,
+        default="auto",
+        help="Compresión del cache HTML (auto = zstd si está instalado, si no gzip)",
+    )
+    ap.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=0,
+        help="Tamaño máximo del cache en MB; se eliminan las páginas menos usadas (0 = sin límite)",
+    )
+    ap.add_argument(
+        "--max-age",
+        type=parse_duration,
+        default=None,
+        help="Antigüedad máxima de una página en cache (ej: 3600, 12h, 7d); sin esto, el cache no vence",
+    )
+    ap.add_argument(
+        "--revalidate",
+        action="store_true",
+        help=(
+            "Revalida las páginas vencidas (o todas, sin --max-age) con ETag/Last-Modified; "
+            "un 304 cuenta como hit de cache"
+        ),
+    )
+    ap.add_argument(
+        "--cache-pack",
+        default="",
+        help=(
+            "Pack de cache (ver 'cache export') que se lee por mmap como segundo nivel, "
+            "después de --cache-dir (con --no-cache, solo el pack)"
+        ),
+    )
+    ap.add_argument(
+        "--offline",
+        action="store_true",
+        help=(
+            "No usa la red: reporta la cobertura del cache para los héroes pedidos y "
+            "falla si falta alguna página (con --skip-failed, las que faltan cuentan como fallidas)"
+        ),
+    )
+    ap.add_argument(
+        "--no-record-cache",
+        action="store_true",
+        help="No reutiliza registros ya parseados (fuerza a parsear todo el HTML)",
+    )
+    ap.add_argument(
+        "--cache-migrate",
+        action="store_true",
+        help=(
+            "Convierte los <sha1>.html planos del cache al layout comprimido antes de "
+            "empezar (los borra: sobre el cache versionado deja cambios en el repo)"
+        ),
+    )
+    ap.add_argument(
+        "--parser",
+        choices=HTML_PARSERS,
+        default="html.parser",
+        help="Backend HTML para todos los parsers (lxml y selectolax son opcionales y más rápidos)",
+    )
+    ap.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        help="Procesos dedicados al parseo de HTML (0 = parsear en el proceso principal)",
+    )
     ap.add_argument(
         "--max-retries", type=int, default=8, help="Máximo de reintentos por URL"
     )
     ap.add_argument(
-        "--format", choices=["auto", "json", "jsonl", "csv"], default="auto"
+        "--format",
+        choices=["auto", *OUTPUT_WRITERS],
+        default="auto",
+        help=(
+            "Formato de salida; parquet y arrow (Arrow IPC) escriben la tabla de talentos "
+            "en columnas y requieren pyarrow. Con --out carpeta se agregan a los archivos de siempre"
+        ),
+    )
+    ap.add_argument(
+        "--shards",
+        action="store_true",
+        help=(
+            "Además escribe un JSON compacto por héroe en <out>/heroes/ con manifest.json "
+            "y versiones .gz/.br ya comprimidas, para que el dashboard cargue un héroe a la vez"
+        ),
+    )
+    ap.add_argument(
+        "--images",
+        default=None,
+        metavar="DIR",
+        help=(
+            "Después del crawl descarga retratos e íconos de talentos de los héroes "
+            "escritos a DIR (heroes/, talents/ y hero-images.manifest.json)"
+        ),
+    )
+    ap.add_argument(
+        "--image-concurrency",
+        type=int,
+        default=4,
+        help="Descargas de imágenes en paralelo (mismo ritmo y reintentos que las páginas)",
+    )
+    ap.add_argument(
+        "--optimize-images",
+        action="store_true",
+        help=(
+            "Con --images, convierte los íconos de talentos a WebP/AVIF, genera miniaturas "
+            "y un atlas por héroe en DIR/optimized/ (incremental; requiere Pillow)"
+        ),
+    )
+    ap.add_argument(
+        "--thumb-size", type=int, default=64, help="Lado de las miniaturas y celdas del atlas (px)"
+    )
+    ap.add_argument(
+        "--talent-dict",
+        default=None,
+        help=(
+            "talent-dict-optimized.json del dashboard: el mapa de coordenadas del atlas "
+            "usa sus mismas claves"
+        ),
+    )
+    ap.add_argument(
+        "--diff-against",
+        default=None,
+        help=(
+            "Salida anterior (heroes.json, heroes.jsonl o su carpeta) contra la que se "
+            "compara cada héroe; escribe un change set con los cambios por campo"
+        ),
+    )
+    ap.add_argument(
+        "--changes",
+        default=None,
+        help="Ruta del change set (default: <out>/changes.json o <out>.changes.json)",
     )
     ap.add_argument(
         "--skip-failed",
@@ -694,149 +5936,399 @@ def main():
         action="store_true",
         help="Agregar al archivo existente en vez de sobrescribir",
     )
-    args = ap.parse_args()
+    ap.add_argument(
+        "--journal",
+        default=None,
+        help=(
+            "Base SQLite con el estado de cada URL del crawl "
+            "(default: <cache-dir>/crawl-<hash de --out>.sqlite, uno por salida)"
+        ),
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Retoma la corrida anterior según el journal: las URLs terminadas salen "
+            "del cache de registros y solo se procesan las pendientes y fallidas"
+        ),
+    )
+    ap.add_argument(
+        "--progress",
+        action="store_true",
+        help=(
+            "Muestra el estado del journal (por tipo de URL y fallidas) y sale: el de --out, "
+            "o sin --out el usado más recientemente; con --queue, el de la cola"
+        ),
+    )
+    ap.add_argument(
+        "--queue",
+        default=None,
+        help=(
+            "Cola de trabajo SQLite (en un volumen compartido) para repartir el crawl entre "
+            "varios procesos o máquinas, con un presupuesto de ritmo global; ver --role"
+        ),
+    )
+    ap.add_argument(
+        "--role",
+        choices=("coordinator", "worker", "merge"),
+        default="coordinator",
+        help=(
+            "Con --queue: coordinator siembra la cola con los héroes (y su --min-sleep/"
+            "--max-sleep como presupuesto global), trabaja como un worker más y al vaciarse "
+            "la cola escribe --out; worker solo procesa tareas hasta que no quedan (si la cola "
+            "todavía no está sembrada, espera al coordinador); merge "
+            "solo escribe --out desde una cola ya terminada"
+        ),
+    )
+    ap.add_argument(
+        "--lease",
+        type=parse_duration,
+        default=300.0,
+        help="Con --queue, cuánto dura el reclamo de una tarea sin renovar (ej: 300, 5m)",
+    )
+    ap.add_argument(
+        "--base-url",
+        default=BASE,
+        help="Host a crawlear (p.ej. http://127.0.0.1:8765 con heroesfire_standin_server.py)",
+    )
+    ap.add_argument(
+        "--verbosity",
+        type=int,
+        choices=(0, 1, 2),
+        default=2,
+        help="Detalle en consola: 0 = solo avisos y resumen, 1 = por héroe, 2 = por URL",
+    )
+    ap.add_argument(
+        "--report",
+        default=None,
+        help="Escribe un reporte JSON de la corrida (contadores y latencias por fase)",
+    )
+    ap.add_argument(
+        "--prom-textfile",
+        default=None,
+        help="Escribe las métricas en formato Prometheus (textfile collector)",
+    )
+    args = ap.parse_args(argv)
+    if command == "parse":
+        args.offline = True
 
-    out_path = Path(args.out)
-    cache_dir = None if args.no_cache else Path(args.cache_dir)
+    set_verbosity(args.verbosity)
+    set_base_url(args.base_url)
+    set_html_parser(args.parser)
+    check_html_parser(args.parser)
 
-    fetcher = Fetcher(
+    cache_dir = None if args.no_cache else Path(args.cache_dir)
+    journal_path = None
+    if args.journal:
+        journal_path = Path(args.journal)
+    elif cache_dir and args.out:
+        journal_path = CrawlJournal.default_path(cache_dir, args.out)
+    elif cache_dir and args.progress:
+        journal_path = CrawlJournal.latest(cache_dir)
+
+    if args.progress and args.queue:
+        if not Path(args.queue).exists():
+            ap.error(f"--queue: no existe {args.queue}")
+        queue = WorkQueue(Path(args.queue))
+        queue.report()
+        queue.close()
+        return
+    if args.progress:
+        if not journal_path or not journal_path.exists():
+            ap.error("no hay journal de crawl (ver --journal/--cache-dir)")
+        journal = CrawlJournal(journal_path, resume=True)
+        journal.report()
+        journal.close()
+        return
+    if not args.out and not (args.queue and args.role == "worker"):
+        ap.error("--out es obligatorio")
+    if args.resume and not journal_path and not args.queue:
+        ap.error("--resume necesita un journal (--journal o cache habilitado)")
+
+    # Un worker de la cola no escribe salida: la escribe el coordinador (o merge)
+    out_path = Path(args.out or ".")
+    columnar = args.format if args.format in COLUMNAR_FORMATS else out_path.suffix.lower()[1:]
+    if columnar in COLUMNAR_FORMATS:
+        check_pyarrow(columnar)
+    previous_heroes: List[Dict] = []
+    if args.diff_against:
+        try:
+            previous_heroes = load_heroes(Path(args.diff_against))
+        except (OSError, ValueError) as e:
+            ap.error(f"--diff-against: no se pudo leer {args.diff_against}: {e}")
+    if args.optimize_images:
+        if not args.images:
+            ap.error("--optimize-images necesita --images DIR")
+        check_pillow()
+    if args.transport == "http2":
+        check_http2()
+    if args.max_connections < 0:
+        ap.error("--max-connections no puede ser negativo")
+    if args.cache_pack and not Path(args.cache_pack).is_file():
+        ap.error(f"--cache-pack: no existe {args.cache_pack}")
+    if args.offline:
+        if not cache_dir and not args.cache_pack:
+            ap.error("--offline necesita el cache (--cache-dir) o --cache-pack")
+        if args.images:
+            ap.error("--images descarga de la red: no se puede usar con --offline")
+    if args.queue:
+        if args.adaptive_rps:
+            ap.error(
+                "--adaptive-rps ajusta el ritmo de un solo proceso: con --queue el "
+                "presupuesto global es --min-sleep/--max-sleep del coordinador"
+            )
+        # Un worker puede arrancar antes que el coordinador: espera la siembra
+        if args.role == "merge" and not Path(args.queue).exists():
+            ap.error(f"--queue: no existe {args.queue}")
+
+    # Los workers de la cola siempre son async: el turno global se espera con await
+    use_async = args.concurrency > 1 or args.queue
+    fetcher_cls = AsyncFetcher if use_async else Fetcher
+    fetcher_kwargs = {"concurrency": max(1, args.concurrency)} if use_async else {}
+    fetcher = fetcher_cls(
         min_sleep=args.min_sleep,
         max_sleep=args.max_sleep,
         timeout=args.timeout,
         cache_dir=cache_dir,
         no_cache=args.no_cache,
         max_retries=args.max_retries,
+        cache_compression=args.cache_compression,
+        cache_max_bytes=int(args.cache_max_mb * 1024 * 1024),
+        max_age=args.max_age,
+        revalidate=args.revalidate,
+        adaptive_rps=args.adaptive_rps,
+        cache_pack=Path(args.cache_pack) if args.cache_pack else None,
+        offline=args.offline,
+        transport=args.transport,
+        max_connections=args.max_connections,
+        **fetcher_kwargs,
     )
+    if fetcher.pack:
+        print(f"[*] Pack de cache: {fetcher.pack.count} páginas en {args.cache_pack}")
+
+    if args.cache_migrate and fetcher.cache:
+        migrated = fetcher.cache.migrate_legacy()
+        print(
+            f"[*] Cache: {migrated} páginas migradas al layout comprimido "
+            f"({fetcher.cache.total_bytes / 1e6:.1f} MB)"
+        )
 
-    print(f"[*] Obteniendo lista de héroes...")
-    heroes_html = fetcher.get(HEROES_LIST_URL)
-    heroes = parse_heroes_list(heroes_html)
-    print(f"[*] Encontrados {len(heroes)} héroes")
-
-    wanted = [x.strip() for x in args.heroes.split(",") if x.strip()]
-    if wanted:
-        heroes = [h for h in heroes if h[0] in wanted]
-        print(f"[*] Filtrando a {len(heroes)} héroes específicos")
-
-    # Skip existing heroes if requested
-    existing_slugs: Set[str] = set()
-    if args.skip_existing:
-        # Determinar qué archivo verificar
-        if out_path.suffix.lower() in (".json", ".jsonl", ".csv"):
-            check_path = out_path
-        else:
-            # Es una carpeta, verificar los archivos dentro
-            check_path = out_path / "talents.csv"
-            if not check_path.exists():
-                check_path = out_path / "heroes.json"
-            if not check_path.exists():
-                check_path = out_path / "heroes.jsonl"
-
-        if check_path.exists():
-            if check_path.suffix.lower() == ".csv":
-                existing_slugs = load_existing_hero_slugs_from_csv(check_path)
-            elif check_path.suffix.lower() in (".json", ".jsonl"):
-                existing_slugs = load_existing_hero_slugs_from_json(check_path)
-
-            if existing_slugs:
-                before_count = len(heroes)
-                heroes = [h for h in heroes if h[0] not in existing_slugs]
-                skipped = before_count - len(heroes)
-                print(
-                    f"[*] Saltando {skipped} héroes existentes, quedan {len(heroes)} por procesar"
-                )
-
-    if args.limit and args.limit > 0:
-        heroes = heroes[: args.limit]
-        print(f"[*] Limitando a {len(heroes)} héroes")
-
-    if args.start_from > 0:
-        heroes = heroes[args.start_from :]
-        print(f"[*] Comenzando desde héroe #{args.start_from}")
-
-    results: List[Dict] = []
-    talent_cache: Dict[str, Dict] = {}
-    failed_talents: List[str] = []
+    stage = ParseStage(
+        pool=(
+            ParsePool(args.parse_workers, parser=args.parser)
+            if args.parse_workers > 0
+            else None
+        ),
+        records=(
+            RecordCache(cache_dir / RecordCache.FILE)
+            if cache_dir and not args.no_record_cache
+            else None
+        ),
+        # Con --queue el estado de cada URL vive en la cola
+        journal=(
+            CrawlJournal(journal_path, resume=args.resume)
+            if journal_path and not args.queue
+            else None
+        ),
+        # Sin cache en disco, el store queda solo en memoria (dedup dentro de la corrida)
+        talents=TalentStore(
+            cache_dir / TalentStore.FILE
+            if cache_dir and not args.no_record_cache
+            else None
+        ),
+        metrics=fetcher.metrics,
+    )
 
-    for i, (hero_slug, hero_url) in enumerate(heroes, 1 + args.start_from):
-        print(f"\n[{i}/{len(heroes)}] Procesando héroe: {hero_slug}")
+    import asyncio
 
-        at_url = build_abilities_talents_url(hero_url)
+    queue = WorkQueue(Path(args.queue), lease=args.lease) if args.queue else None
+    if queue and args.role == "worker":
+        if not queue.seeded:
+            print(f"[*] Esperando que el coordinador siembre {args.queue}...")
+            while not queue.seeded:
+                time.sleep(QUEUE_POLL_S)
+        min_s, max_s = queue.budget()
+        print(f"[*] Worker de {args.queue} (ritmo global: {min_s:g}-{max_s:g}s entre requests)")
         try:
-            at_html = fetcher.get(at_url)
-        except Exception as e:
-            print(f"  [ERROR] No se pudo obtener página de habilidades: {e}")
-            if not args.skip_failed:
-                raise
-            continue
-
-        hero_meta = parse_hero_meta_from_abilities_talents(at_html, at_url, hero_slug)
-        talent_urls = parse_talent_urls_from_abilities_talents(at_html, at_url)
-        print(f"  Encontrados {len(talent_urls)} talentos")
-
-        talents: List[Dict] = []
-        for j, tu in enumerate(talent_urls, 1):
-            print(f"  [{j}/{len(talent_urls)}] {tu.split('/')[-1]}")
-
-            if tu in talent_cache:
-                t_data = dict(talent_cache[tu])
-            else:
-                try:
-                    t_html = fetcher.get(tu)
-                    t_data = parse_talent_page(t_html, tu)
-                    talent_cache[tu] = dict(t_data)
-                except Exception as e:
-                    print(f"    [ERROR] Fallo al procesar talento: {e}")
-                    failed_talents.append(tu)
-                    if not args.skip_failed:
-                        raise
-                    continue
+            done = asyncio.run(fetcher.closing(work_queue(queue, fetcher, stage)))
+            print(
+                f"[*] Tareas: {done['hero']} héroes, {done['talent']} talentos, "
+                f"{done['failed']} fallidas"
+            )
+        finally:
+            fetcher.close()
+            stage.close()
+            queue.report()
+            queue.close()
+            print(f"[*] Métricas: {fetcher.metrics.summary()}")
+            if args.report:
+                fetcher.metrics.write_report(Path(args.report), args=vars(args))
+                print(f"[*] Reporte: {args.report}")
+            if args.prom_textfile:
+                fetcher.metrics.write_prometheus(Path(args.prom_textfile))
+        return fetcher.metrics
 
-            if not t_data.get("hero"):
-                t_data["hero"] = hero_meta.get("name")
-
-            talents.append(t_data)
+    wanted = [x.strip() for x in args.heroes.split(",") if x.strip()]
+    if queue and args.role == "merge":
+        # Los héroes ya están en la cola, con el orden y filtros del coordinador
+        heroes = [
+            (slug, at_url.rsplit("/", 1)[0]) for slug, at_url, *_ in queue.heroes()
+        ]
+        print(f"[*] {len(heroes)} héroes en la cola {args.queue}")
+    else:
+        heroes = select_heroes(fetcher, stage, args, out_path, wanted)
 
-        talents_sorted = sorted(
-            talents,
-            key=lambda x: (
-                x.get("tier_index") if x.get("tier_index") is not None else 999,
-                (x.get("name") or "").lower(),
-            ),
-        )
+    stage.discover(
+        [build_abilities_talents_url(hero_url) for _, hero_url in heroes], "hero"
+    )
 
-        results.append(
-            {
-                "slug": hero_slug,
-                "hero": hero_meta,
-                "abilities_talents_url": at_url,
-                "talents": talents_sorted,
-            }
-        )
+    if queue and args.role == "coordinator":
+        queue.seed(heroes, args.min_sleep, args.max_sleep, resume=args.resume)
+        print(f"[*] Cola {args.queue}: {len(heroes)} héroes sembrados")
+    elif queue and not queue.drained():
+        queue.report()
+        stage.close()
+        queue.close()
+        raise SystemExit("[!] --role merge: la cola todavía tiene tareas sin terminar")
+
+    coverage: Optional[Dict] = None
+    if args.offline and not (queue and args.role == "merge"):
+        coverage = cache_coverage(fetcher, heroes, stage)
+        print_coverage(coverage)
+        if not coverage["complete"] and not args.skip_failed:
+            stage.close()
+            raise SystemExit(
+                "[!] --offline: faltan páginas en el cache (ver arriba); "
+                "con --skip-failed se sigue sin ellas"
+            )
 
-    # Salida
     fmt = args.format
     if fmt == "auto":
         fmt = (
             out_path.suffix.lower().lstrip(".")
-            if out_path.suffix.lower() in (".json", ".jsonl", ".csv")
+            if out_path.suffix.lower() in OUTPUT_SUFFIXES
             else "json"
         )
 
-    if out_path.suffix.lower() in (".json", ".jsonl", ".csv"):
-        if fmt == "json":
-            write_json(out_path, results)
-        elif fmt == "jsonl":
-            write_jsonl(out_path, results)
-        elif fmt == "csv":
-            write_talents_csv(out_path, results)
-        print(f"\n[✓] Datos guardados en: {out_path}")
-    else:
-        out_path.mkdir(parents=True, exist_ok=True)
-        write_json(out_path / "heroes.json", results)
-        write_jsonl(out_path / "heroes.jsonl", results)
-        write_talents_csv(out_path / "talents.csv", results)
-        print(f"\n[✓] Datos guardados en: {out_path}/")
+    # Cada héroe se escribe apenas termina; si el crawl se corta, la salida
+    # queda cerrada y válida con los héroes completos hasta ese momento
+    # La salida anterior ya se leyó al validar los argumentos: puede ser la
+    # misma ruta que --out
+    changes: Optional[ChangeSetWriter] = None
+    if args.diff_against:
+        if args.changes:
+            changes_path = Path(args.changes)
+        elif out_path.suffix.lower() in OUTPUT_SUFFIXES:
+            changes_path = out_path.with_name(out_path.stem + ".changes.json")
+        else:
+            changes_path = out_path / "changes.json"
+        filtered = wanted or args.limit or args.start_from or args.skip_existing
+        changes = ChangeSetWriter(
+            changes_path,
+            Path(args.diff_against),
+            previous_heroes,
+            listed=None if filtered else {slug for slug, _ in heroes},
+        )
+
+    sink = open_outputs(out_path, fmt, append=args.append, shards=args.shards)
+    if changes:
+        sink.writers.append(changes)
+    metrics = fetcher.metrics
+
+    # Imágenes de los héroes escritos, una vez por URL, y los íconos de
+    # cada héroe en orden (para los atlas)
+    images: Dict[str, Dict] = {}
+    hero_icons: Dict[str, Tuple[str, List[str]]] = {}
+
+    def emit(hero: HeroRecord) -> None:
+        with metrics.time("write"):
+            sink.write_hero(hero)
+        if args.images:
+            for job in image_jobs([hero]):
+                images.setdefault(job["url"], job)
+            hero_icons[hero.slug] = (
+                hero.hero.name,
+                [t.icon_image_url for t in hero.talents if t.icon_image_url],
+            )
+
+    failed_talents: List[str] = []
+    try:
+        if queue:
+            if args.role == "coordinator":
+                # Trabaja como un worker más hasta que la cola se vacía (también
+                # espera las tareas de los demás workers)
+                asyncio.run(fetcher.closing(work_queue(queue, fetcher, stage)))
+                queue.report()
+            failed_talents = merge_queue(queue, args, emit)
+        elif args.concurrency > 1:
+            failed_talents = asyncio.run(
+                fetcher.closing(crawl_heroes_async(fetcher, heroes, args, stage, emit))
+            )
+        else:
+            failed_talents = crawl_heroes(fetcher, heroes, args, stage, emit)
+        if fetcher.cache:
+            # Al final y no durante el crawl: entrenar y recomprimir frena todo
+            fetcher.cache.train_dict()
+        if args.images:
+            print(f"[*] Descargando {len(images)} imágenes a {args.images}...")
+            image_fetcher = AsyncFetcher(
+                min_sleep=args.min_sleep,
+                max_sleep=args.max_sleep,
+                timeout=args.timeout,
+                cache_dir=None,
+                no_cache=True,
+                max_retries=args.max_retries,
+                adaptive_rps=args.adaptive_rps,
+                metrics=metrics,
+                transport=args.transport,
+                max_connections=args.max_connections,
+                concurrency=args.image_concurrency,
+            )
+            store = ImageStore(Path(args.images))
+            try:
+                asyncio.run(
+                    image_fetcher.closing(
+                        download_images(
+                            image_fetcher, list(images.values()), store, args.revalidate
+                        )
+                    )
+                )
+            finally:
+                image_fetcher.close()
+                store.close()
+            if args.optimize_images:
+                IconOptimizer(Path(args.images), args.thumb_size).run(
+                    store,
+                    hero_icons,
+                    Path(args.talent_dict) if args.talent_dict else None,
+                )
+    finally:
+        fetcher.close()
+        stage.close()
+        if queue:
+            queue.close()
+        if changes:
+            changes.failed_urls = set(failed_talents)
+        sink.close()
+        metrics.inc("heroes_written", sink.count)
+        metrics.inc("talents_failed", len(failed_talents))
+        print(f"[*] Métricas: {metrics.summary()}")
+        if fetcher.pacer:
+            print(f"[*] Ritmo adaptativo: {fetcher.pacer.summary()}")
+        # También en corridas interrumpidas: el reporte dice hasta dónde llegó
+        if args.report:
+            metrics.write_report(
+                Path(args.report),
+                args=vars(args),
+                heroes_written=sink.count,
+                failed_talents=failed_talents,
+                adaptive_rate=fetcher.pacer.to_dict() if fetcher.pacer else None,
+                cache_coverage=coverage,
+            )
+            print(f"[*] Reporte: {args.report}")
+        if args.prom_textfile:
+            metrics.write_prometheus(Path(args.prom_textfile))
+        print(f"\n[✓] {sink.count} héroes guardados en: {out_path}")
 
     if failed_talents:
         print(f"\n[!] Advertencia: {len(failed_talents)} talentos fallaron:")
@@ -845,6 +6337,26 @@ def main():
         if len(failed_talents) > 10:
             print(f"  ... y {len(failed_talents) - 10} más")
 
+    return metrics
+
+
+# Subcomandos; sin ninguno, los argumentos son los de "crawl"
+COMMANDS = ("crawl", "parse", "export", "cache")
+
+
+def main(argv: Optional[List[str]] = None) -> Optional[Metrics]:
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv[:1] and argv[0] in COMMANDS else "crawl"
+    if argv[:1] == [command]:
+        argv = argv[1:]
+    if command == "cache":
+        cache_main(argv)
+        return None
+    if command == "export":
+        export_main(argv)
+        return None
+    return crawl_main(argv, command)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Servidor local que imita a HeroesFire para probar el crawler sin tocar el sitio
+
+Sirve las páginas del cache HTML bajo las mismas rutas que BASE
+(/hots/wiki/heroes, /hots/wiki/talents/<slug>, ...) e inyecta las fallas
+que el Fetcher tiene que manejar: latencia, 429 (con Retry-After), ráfagas
+de 5xx y bot walls cortos. Responde ETag y 304 a If-None-Match.
+
+Habla HTTP/1.1 y, en el mismo puerto, HTTP/2 directo (h2c con prior
+knowledge, como --transport http2 contra una URL http://) si el paquete h2
+está instalado. Cada stream HTTP/2 se responde en su propio hilo, así que la
+latencia inyectada no frena al resto de la conexión.
+
+Uso:
+    python heroesfire_standin_server.py --port 8765 --latency 0.05 --rate-429 0.02
+    python extract_heroesfire_wikibase.py --base-url http://127.0.0.1:8765 \\
+        --no-cache --out /tmp/hf
+
+GET /_stats devuelve los contadores del servidor en JSON.
+Para una prueba de carga completa ver loadtest_heroesfire.py.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from extract_heroesfire_wikibase import BASE, BOT_WALL_PHRASE, HtmlCache
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+except ImportError:
+    h2 = None
+
+# Bot wall sin contenido real: el Fetcher lo detecta y reintenta
+BOT_WALL_HTML = f"""<!DOCTYPE html>
+<html>
+<head><title>HeroesFire</title></head>
+<body>
+<div class="vote-box"><p>{BOT_WALL_PHRASE}</p></div>
+</body>
+</html>
+"""
+
+
+@dataclass
+class Faults:
+    """Fallas inyectadas por el servidor"""
+
+    # Latencia por respuesta: latency ± jitter segundos
+    latency: float = 0.0
+    jitter: float = 0.0
+    # Probabilidad de responder 429 y Retry-After que se anuncia
+    rate_429: float = 0.0
+    retry_after: int = 1
+    # Cada burst_5xx_every requests, los siguientes burst_len responden 503
+    burst_5xx_every: int = 0
+    burst_len: int = 3
+    # Probabilidad de servir un bot wall en lugar de la página
+    bot_wall_rate: float = 0.0
+    seed: Optional[int] = None
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: Tuple[str, int], cache_dir: Path, faults: Faults):
+        super().__init__(addr, StandinHandler)
+        self.cache = HtmlCache(cache_dir, read_only=True)
+        self.faults = faults
+        self.rng = random.Random(faults.seed)
+        self.stats: Counter = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_fault(self) -> Optional[str]:
+        """Decide qué falla (si alguna) recibe el request actual"""
+        f = self.faults
+        with self.lock:
+            n = self.stats["requests"]
+            self.stats["requests"] += 1
+            if f.burst_5xx_every and n % f.burst_5xx_every >= f.burst_5xx_every - f.burst_len:
+                return "503"
+            if f.rate_429 and self.rng.random() < f.rate_429:
+                return "429"
+            if f.bot_wall_rate and self.rng.random() < f.bot_wall_rate:
+                return "bot_wall"
+        return None
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] += 1
+
+    def respond(
+        self, path: str, if_none_match: Optional[str] = None
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """Respuesta a un GET, la misma en HTTP/1.1 y HTTP/2: (status, headers, cuerpo)"""
+        if path == "/_stats":
+            body = json.dumps(
+                {"faults": asdict(self.faults), "stats": dict(self.stats)}, indent=2
+            ).encode("utf-8")
+            return 200, {"Content-Type": "application/json"}, body
+
+        status, headers, body = self._respond_page(path, if_none_match)
+        self.count(str(status))
+        return status, headers, body
+
+    def _respond_page(
+        self, path: str, if_none_match: Optional[str]
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        f = self.faults
+        if f.latency or f.jitter:
+            time.sleep(max(0.0, f.latency + self.rng.uniform(-f.jitter, f.jitter)))
+
+        fault = self.next_fault()
+        if fault == "503":
+            return 503, {}, b"Service Unavailable"
+        if fault == "429":
+            return 429, {"Retry-After": str(f.retry_after)}, b"Too Many Requests"
+        if fault == "bot_wall":
+            self.count("bot_wall")
+            return 200, {"Content-Type": "text/html"}, BOT_WALL_HTML.encode("utf-8")
+
+        html = self.cache.get(BASE + path)
+        if html is None:
+            return 404, {}, b"Not Found"
+
+        # Los links absolutos del sitio real apuntan a este servidor
+        body = html.replace(BASE, self.base_url).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if if_none_match == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"Content-Type": "text/html; charset=utf-8", "ETag": etag}, body
+
+
+# Lo primero que manda un cliente HTTP/2 con prior knowledge (RFC 9113 §3.4)
+H2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+
+
+class H2Session:
+    """
+    Una conexión HTTP/2: el hilo de la conexión lee frames y cada request
+    se responde en un hilo propio. El estado de h2 y el socket se comparten
+    bajo un Condition, que también despierta a los que esperan ventana de
+    control de flujo para seguir mandando el cuerpo.
+    """
+
+    def __init__(self, server: StandinServer, sock: socket.socket):
+        self.server = server
+        self.sock = sock
+        self.conn = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False, header_encoding="utf-8")
+        )
+        self.cond = threading.Condition()
+        self.closed = False
+        self.reset: set = set()
+
+    def _flush(self) -> None:
+        data = self.conn.data_to_send()
+        if data:
+            self.sock.sendall(data)
+
+    def run(self) -> None:
+        self.server.count("h2_connections")
+        with self.cond:
+            self.conn.initiate_connection()
+            self._flush()
+        try:
+            while not self.closed:
+                data = self.sock.recv(65536)
+                if not data:
+                    break
+                with self.cond:
+                    for event in self.conn.receive_data(data):
+                        if isinstance(event, h2.events.RequestReceived):
+                            headers = dict(event.headers)
+                            threading.Thread(
+                                target=self._respond,
+                                args=(event.stream_id, headers),
+                                daemon=True,
+                            ).start()
+                        elif isinstance(event, h2.events.StreamReset):
+                            self.reset.add(event.stream_id)
+                        elif isinstance(event, h2.events.ConnectionTerminated):
+                            self.closed = True
+                    self._flush()
+                    self.cond.notify_all()
+        except (OSError, h2.exceptions.ProtocolError):
+            pass
+        finally:
+            with self.cond:
+                self.closed = True
+                self.cond.notify_all()
+
+    def _respond(self, stream_id: int, request_headers: Dict[str, str]) -> None:
+        self.server.count("http2")
+        status, headers, body = self.server.respond(
+            request_headers.get(":path", "/"), request_headers.get("if-none-match")
+        )
+        response_headers = [(":status", str(status)), ("content-length", str(len(body)))]
+        response_headers += [(k.lower(), v) for k, v in headers.items()]
+        with self.cond:
+            try:
+                if self.closed or stream_id in self.reset:
+                    return
+                self.conn.send_headers(stream_id, response_headers, end_stream=not body)
+                self._flush()
+                sent = 0
+                while sent < len(body):
+                    if self.closed or stream_id in self.reset:
+                        return
+                    window = min(
+                        self.conn.local_flow_control_window(stream_id),
+                        self.conn.max_outbound_frame_size,
+                    )
+                    if window <= 0:
+                        self.cond.wait()
+                        continue
+                    chunk = body[sent : sent + window]
+                    sent += len(chunk)
+                    self.conn.send_data(stream_id, chunk, end_stream=sent == len(body))
+                    self._flush()
+            except (OSError, h2.exceptions.ProtocolError):
+                self.closed = True
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server: StandinServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        if h2 is not None and self._is_h2():
+            H2Session(self.server, self.connection).run()
+            return
+        self.server.count("http1_connections")
+        super().handle()
+
+    def _is_h2(self) -> bool:
+        """¿La conexión arranca con el preface de HTTP/2? (sin consumirlo)"""
+        while True:
+            peek = self.connection.recv(len(H2_PREFACE), socket.MSG_PEEK)
+            if not peek or not H2_PREFACE.startswith(peek):
+                return False
+            if len(peek) == len(H2_PREFACE):
+                return True
+            time.sleep(0.001)
+
+    def do_GET(self):
+        status, headers, body = self.server.respond(
+            self.path, self.headers.get("If-None-Match")
+        )
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+def start_server(
+    cache_dir: Path, faults: Faults, host: str = "127.0.0.1", port: int = 0
+) -> StandinServer:
+    """Arranca el servidor en un hilo (port=0 elige un puerto libre)"""
+    server = StandinServer((host, port), cache_dir, faults)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_fault_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument(
+        "--cache-dir", default=".cache/heroesfire", help="Cache HTML a servir"
+    )
+    ap.add_argument("--latency", type=float, default=0.0, help="Latencia por respuesta (s)")
+    ap.add_argument("--jitter", type=float, default=0.0, help="Variación de la latencia (s)")
+    ap.add_argument(
+        "--rate-429", type=float, default=0.0, help="Probabilidad de responder 429"
+    )
+    ap.add_argument(
+        "--retry-after", type=int, default=1, help="Retry-After de los 429 (s)"
+    )
+    ap.add_argument(
+        "--burst-5xx-every",
+        type=int,
+        default=0,
+        help="Cada N requests, una ráfaga de 503 (0 = nunca)",
+    )
+    ap.add_argument(
+        "--burst-len", type=int, default=3, help="Largo de cada ráfaga de 503"
+    )
+    ap.add_argument(
+        "--bot-wall-rate",
+        type=float,
+        default=0.0,
+        help="Probabilidad de servir un bot wall corto",
+    )
+    ap.add_argument("--seed", type=int, default=None, help="Semilla de las fallas")
+
+
+def faults_from_args(args: argparse.Namespace) -> Faults:
+    return Faults(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        burst_5xx_every=args.burst_5xx_every,
+        burst_len=args.burst_len,
+        bot_wall_rate=args.bot_wall_rate,
+        seed=args.seed,
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Servidor local que replica HeroesFire desde el cache HTML."
+    )
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    add_fault_args(ap)
+    args = ap.parse_args()
+
+    server = StandinServer((args.host, args.port), Path(args.cache_dir), faults_from_args(args))
+    print(f"[*] Sirviendo {args.cache_dir} en {server.base_url} (Ctrl-C para salir)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"[*] Stats: {dict(server.stats)}")
+
+
+if __name__ == "__main__":
+    main()
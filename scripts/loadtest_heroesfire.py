@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Prueba de carga de punta a punta del crawler contra el servidor local
+
+Levanta heroesfire_standin_server.py en un hilo (o usa uno externo con
+--server), corre el main() completo de extract_heroesfire_wikibase.py
+contra él y reporta tiempo total, requests/segundo, reintentos y cuánto
+del tiempo se fue en dormir, en esperar la red y en trabajo propio.
+
+Los argumentos después de "--" pasan tal cual al crawler:
+    python loadtest_heroesfire.py --latency 0.05 --rate-429 0.02 -- --concurrency 4
+    python loadtest_heroesfire.py --burst-5xx-every 100 -- --heroes abathur,alarak
+    python loadtest_heroesfire.py --server http://127.0.0.1:8765 -- --limit 5
+    python loadtest_heroesfire.py --rate-429 0.05 --retry-after 2 -- --concurrency 8 --adaptive-rps 20
+    python loadtest_heroesfire.py --latency 0.3 -- --concurrency 16 --transport http2
+
+Por defecto el crawler corre sin cache propio (--no-cache) y sin sleeps de
+cortesía (--min-sleep 0 --max-sleep 0); se pueden pisar después de "--".
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import urllib.request
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from typing import Dict, List
+
+import extract_heroesfire_wikibase as hf
+from heroesfire_standin_server import add_fault_args, faults_from_args, start_server
+
+
+def server_stats(base_url: str) -> Dict[str, int]:
+    with urllib.request.urlopen(f"{base_url}/_stats", timeout=10) as resp:
+        return json.loads(resp.read())["stats"]
+
+
+def main():
+    argv = sys.argv[1:]
+    crawler_args: List[str] = []
+    if "--" in argv:
+        i = argv.index("--")
+        argv, crawler_args = argv[:i], argv[i + 1 :]
+
+    ap = argparse.ArgumentParser(
+        description="Corre el crawler completo contra el servidor local y mide el throughput."
+    )
+    ap.add_argument(
+        "--server", default="", help="Usar un servidor ya levantado en esta URL"
+    )
+    ap.add_argument(
+        "--quiet",
+        action="store_true",
+        help="No muestra la salida del crawler, solo el reporte",
+    )
+    add_fault_args(ap)
+    args = ap.parse_args(argv)
+
+    server = None
+    if args.server:
+        base_url = args.server.rstrip("/")
+    else:
+        server = start_server(Path(args.cache_dir), faults_from_args(args))
+        base_url = server.base_url
+    print(f"[*] Servidor: {base_url}")
+    before = server_stats(base_url)
+
+    with tempfile.TemporaryDirectory(prefix="hf-loadtest-") as out:
+        crawler_argv = [
+            "--base-url",
+            base_url,
+            "--out",
+            out,
+            "--no-cache",
+            "--min-sleep",
+            "0",
+            "--max-sleep",
+            "0",
+            *crawler_args,
+        ]
+        print(f"[*] Crawler: {' '.join(crawler_argv)}")
+
+        t0 = time.perf_counter()
+        cpu0 = time.process_time()
+        log = StringIO()
+        if args.quiet:
+            with redirect_stdout(log):
+                metrics = hf.main(crawler_argv)
+        else:
+            metrics = hf.main(crawler_argv)
+        wall = time.perf_counter() - t0
+        cpu = time.process_time() - cpu0
+
+    after = server_stats(base_url)
+    if server:
+        server.shutdown()
+    served = {k: after.get(k, 0) - before.get(k, 0) for k in after}
+
+    print("\n[*] Resultado de la prueba de carga")
+    print(f"  tiempo total      {wall:8.1f} s")
+    if metrics is None:
+        return
+    requests_ = int(metrics.get("requests"))
+    print(f"  requests          {requests_:8d}  ({requests_ / wall:.1f} req/s)")
+    print(
+        f"  servidor          {served.get('requests', 0):8d}  "
+        + ", ".join(
+            f"{served[k]} {k}"
+            for k in sorted(served)
+            if k not in ("requests",) and served[k]
+        )
+    )
+    causes = ", ".join(
+        f"{int(metrics.get('retries', cause=c))} {c}"
+        for c in ("429", "5xx", "bot_wall", "timeout", "error")
+    )
+    print(f"  reintentos        {int(metrics.get('retries')):8d}  ({causes})")
+    print(f"  fallidos          {int(metrics.get('failures')):8d}")
+    print(f"  MB recibidos      {metrics.get('bytes_received') / 1e6:8.1f}")
+
+    slept = metrics.seconds("politeness") + metrics.seconds("backoff")
+    network = metrics.seconds("network")
+    print(
+        f"  dormido           {slept:8.1f} s  ({slept / wall:.0%} del total; "
+        f"cortesía {metrics.seconds('politeness'):.1f}s, backoff {metrics.seconds('backoff'):.1f}s)"
+    )
+    print(f"  esperando red     {network:8.1f} s  (p95 {metrics.phases['network'].quantile(0.95):.3f}s)")
+    waited = slept + network
+    if waited <= wall:
+        print(f"  trabajo           {wall - waited:8.1f} s  (parseo, cache, escritura)")
+    else:
+        # Con --concurrency las esperas se solapan y suman más que el total
+        print(f"  esperas solapadas {waited / wall:8.1f} x  el tiempo total")
+    print(f"  CPU               {cpu:8.1f} s  (cliente + servidor salvo --server)")
+    cuts = ", ".join(
+        f"{int(v)} {dict(labels).get('cause')}"
+        for (name, labels), v in sorted(metrics.counters.items())
+        if name == "rate_cuts"
+    )
+    if cuts:
+        print(f"  recortes de ritmo {int(metrics.get('rate_cuts')):8d}  ({cuts})")
+
+if __name__ == "__main__":
+    main()